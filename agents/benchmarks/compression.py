@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Response Compression Benchmark
+
+Measures bytes on the wire and server CPU time per compression level for
+the service's largest payloads: a /process response carrying the
+ten-node DEX Aggregator workflow, and a finished execution status from
+the stand-in backend. Brotli levels are included when the ``brotli``
+package is installed.
+
+Usage:
+    python benchmarks/compression.py --iterations 200
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from api.backend_client import DeFiBackendClient
+from api.standin import StandInConfig, standin_transport
+from service.encoding import CompressionConfig, available_encodings, compress
+from workflow.generator import WorkflowGenerator
+
+GZIP_LEVELS = (1, 3, 6, 9)
+BROTLI_QUALITIES = (1, 4, 6, 9, 11)
+
+
+def _serialize(payload) -> bytes:
+    # Same serialization as the API responses
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+async def _payloads():
+    requirements = {'pattern': 'DEX Aggregator', 'tokens': ['ETH', 'USDC'], 'user_intent': 'Swap ETH to USDC'}
+    workflow = await WorkflowGenerator().generate_workflow(requirements)
+    process_response = {
+        'conversation_id': 'benchmark',
+        'message': 'I\'ve analyzed your request and created a DEX Aggregator workflow with 10 nodes.',
+        'requirements': requirements,
+        'workflow': workflow,
+        'executionId': None,
+        'needs_approval': True,
+        'suggestions': ['Approve this workflow to generate the canvas']
+    }
+
+    client = DeFiBackendClient(transport=standin_transport(StandInConfig(step_duration=(0.0, 0.001))))
+    execution_id = (await client.execute_workflow(workflow))['executionId']
+    status = await client.wait_for_completion(execution_id, timeout=30, poll_interval=0.05)
+    await client.close()
+    return {'process_response': _serialize(process_response), 'execution_status': _serialize(status)}
+
+
+def _measure(body: bytes, encoding: str, level: int, iterations: int):
+    config = CompressionConfig(gzip_level=level, brotli_quality=level)
+    started = time.process_time()
+    for _ in range(iterations):
+        compressed = compress(body, encoding, config)
+    cpu = (time.process_time() - started) / iterations
+    return {
+        'encoding': encoding,
+        'level': level,
+        'bytes': len(compressed),
+        'ratio': round(len(body) / len(compressed), 2),
+        'cpu_us': round(cpu * 1e6, 1)
+    }
+
+
+def run_benchmark(iterations: int):
+    payloads = asyncio.run(_payloads())
+    levels = [('gzip', level) for level in GZIP_LEVELS]
+    if 'br' in available_encodings():
+        levels += [('br', quality) for quality in BROTLI_QUALITIES]
+    results = []
+    for name, body in payloads.items():
+        rows = [_measure(body, encoding, level, iterations) for encoding, level in levels]
+        results.append({'payload': name, 'identity_bytes': len(body), 'levels': rows})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200, help="Compressions per level, for CPU timing")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.iterations)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    if 'br' not in available_encodings():
+        print("brotli is not installed; showing gzip only (pip install brotli)\n")
+    for result in results:
+        print(f"{result['payload']}: {result['identity_bytes']} bytes uncompressed")
+        print(f"{'encoding':>10} {'level':>6} {'bytes':>8} {'ratio':>7} {'cpu_us':>9}")
+        for r in result['levels']:
+            print(f"{r['encoding']:>10} {r['level']:>6} {r['bytes']:>8} {r['ratio']:>7} {r['cpu_us']:>9}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
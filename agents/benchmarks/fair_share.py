@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Fair-Share Scheduling Benchmark
+
+Measures interactive request latency on the job queue while another
+tenant floods it with batch work. Each scenario replays the same traffic:
+interactive users submit requests at a steady rate, optionally alongside a
+batch tenant submitting a large backlog at once. The handler sleeps for a
+fixed time, standing in for LLM analysis.
+
+Scenarios:
+    idle        interactive traffic only
+    fifo        with batch load, everything in one tenant and class (arrival order)
+    fair_share  with batch load, batch as its own tenant in the bulk class
+
+Usage:
+    python benchmarks/fair_share.py --workers 4 --batch 400
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from service.fairshare import BULK, DEFAULT_TENANT, INTERACTIVE
+from service.jobs import JobQueue, JobQueueConfig
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def _scenario(name: str, workers: int, batch: int, interactive: int, rate: float, service_time: float):
+    async def handler(payload):
+        await asyncio.sleep(service_time)
+
+    queue = JobQueue(handler, JobQueueConfig(workers=workers, max_queue=batch + interactive + 1,
+                                             max_queue_wait=float('inf')))
+    await queue.start()
+    if name != 'idle':
+        fair = name == 'fair_share'
+        for i in range(batch):
+            queue.submit(('batch', i), tenant='importer' if fair else DEFAULT_TENANT,
+                         traffic_class=BULK if fair else INTERACTIVE)
+
+    latencies = []
+
+    async def user_request(i):
+        started = time.perf_counter()
+        job = queue.submit(('interactive', i))
+        await queue.wait(job.id)
+        latencies.append(time.perf_counter() - started)
+
+    requests = []
+    for i in range(interactive):
+        requests.append(asyncio.create_task(user_request(i)))
+        await asyncio.sleep(1.0 / rate)
+    await asyncio.gather(*requests)
+    await queue.stop()
+    return {
+        'scenario': name,
+        'interactive_p50_ms': round(_percentile(latencies, 0.5) * 1000, 1),
+        'interactive_p95_ms': round(_percentile(latencies, 0.95) * 1000, 1),
+        'interactive_max_ms': round(max(latencies) * 1000, 1)
+    }
+
+
+def run_benchmark(workers: int, batch: int, interactive: int, rate: float, service_time: float):
+    return [
+        asyncio.run(_scenario(name, workers, batch, interactive, rate, service_time))
+        for name in ('idle', 'fifo', 'fair_share')
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4, help="Job queue workers")
+    parser.add_argument("--batch", type=int, default=400, help="Batch jobs submitted at once")
+    parser.add_argument("--interactive", type=int, default=50, help="Interactive requests")
+    parser.add_argument("--rate", type=float, default=50.0, help="Interactive requests per second")
+    parser.add_argument("--service-time", type=float, default=0.01, help="Seconds each job takes")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.workers, args.batch, args.interactive, args.rate, args.service_time)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'scenario':>12} {'p50_ms':>9} {'p95_ms':>9} {'max_ms':>9}")
+    for r in results:
+        print(f"{r['scenario']:>12} {r['interactive_p50_ms']:>9} {r['interactive_p95_ms']:>9} "
+              f"{r['interactive_max_ms']:>9}")
+
+
+if __name__ == "__main__":
+    main()
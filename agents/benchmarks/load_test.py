@@ -0,0 +1,491 @@
+#!/usr/bin/env python3
+"""
+Agent Service Load Test
+
+Drives the FastAPI service end to end with many concurrent conversations
+and reports throughput, latency percentiles and error rate per endpoint,
+memory (RSS) over time, and requests per CPU-second, the throughput one
+core sustains.
+
+The LLM is the stand-in (``AI_PROVIDER=standin``): it answers with the
+rule-based analysis after ``--llm-latency`` seconds. The backend is the
+stand-in from ``api.standin`` with ``--backend-latency`` per request.
+
+Modes:
+    asgi     the app runs in this process behind an in-process ASGI transport
+             (CPU and RSS include the load generator)
+    uvicorn  the app runs under ``uvicorn --workers N`` and the stand-in backend
+             as a separate server; CPU and RSS are the service's own
+
+Conversations arrive as a Poisson process at ``--rate`` per second for
+``--duration`` seconds. Each one follows a script picked from ``--mix``:
+a list of steps, each one of
+
+    {"process": "<user message>"}    POST /process (following a 202 to /jobs/{id})
+    {"approve": true}                POST /approve-workflow
+    {"poll": N, "interval": S}       GET /executions/{id} N times, revalidating with ETags
+    {"think": S}                     pause S seconds
+
+Built-in scripts are listed in SCRIPTS; ``--scripts file.json`` adds or
+replaces scripts by name.
+
+Usage:
+    python benchmarks/load_test.py --rate 20 --duration 30 --mix swap=5,browse=3,chat=2
+    python benchmarks/load_test.py --mode uvicorn --workers 2 --rate 50 --llm-latency 0.5 1.5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+sys.path.append(SRC)
+
+import httpx
+import structlog
+
+SCRIPTS = {
+    'swap': [
+        {'process': 'Create a swap application for ETH and USDC'},
+        {'process': 'Add slippage protection and gas optimization to the swap'},
+        {'approve': True},
+        {'poll': 5, 'interval': 0.5}
+    ],
+    'bridge': [
+        {'process': 'Build a cross-chain bridge moving USDC from Ethereum to Polygon'},
+        {'approve': True},
+        {'poll': 10, 'interval': 0.5}
+    ],
+    'browse': [
+        {'process': 'make a portfolio tracker'},
+        {'think': 1.0},
+        {'process': 'also add a limit order for WBTC'}
+    ],
+    'chat': [
+        {'process': 'hello'},
+        {'process': 'what can you do?'}
+    ]
+}
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def _parse_mix(text: str, scripts):
+    mix = {}
+    for item in text.split(','):
+        name, _, weight = item.partition('=')
+        if name.strip() not in scripts:
+            raise SystemExit(f"Unknown script {name.strip()!r}; available: {', '.join(scripts)}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _process_tree(pid: int):
+    """pid and its descendants (Linux /proc)"""
+    pids, pending = [], [pid]
+    while pending:
+        current = pending.pop()
+        pids.append(current)
+        try:
+            with open(f"/proc/{current}/task/{current}/children") as f:
+                pending.extend(int(child) for child in f.read().split())
+        except OSError:
+            pass
+    return pids
+
+
+def _rss_mb(pids) -> float:
+    total = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1])
+                        break
+        except OSError:
+            pass
+    if not total and pids == [os.getpid()]:
+        # No /proc (macOS): fall back to the peak, in bytes there and kilobytes on Linux
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+    return round(total / 1024, 1)
+
+
+def _cpu_seconds(pids) -> float:
+    if pids == [os.getpid()]:
+        return time.process_time()
+    ticks = os.sysconf('SC_CLK_TCK')
+    total = 0.0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+            total += (int(fields[11]) + int(fields[12])) / ticks  # utime, stime
+        except OSError:
+            pass
+    return total
+
+
+class LoadStats:
+    """Per-endpoint latencies and errors, plus periodic resource samples"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.statuses = defaultdict(int)
+        self.samples = []
+        # /process turns answered 202: submission to job completion
+        self.deferred_turns = []
+        self.conversations = {'started': 0, 'finished': 0, 'aborted': 0}
+
+    def record(self, endpoint: str, seconds: float, status: int) -> None:
+        self.latencies[endpoint].append(seconds)
+        self.statuses[status] += 1
+        if status >= 400 or status == 0:
+            self.errors[endpoint] += 1
+
+    def report(self, elapsed: float, cpu_seconds: float):
+        endpoints = {}
+        for endpoint, values in sorted(self.latencies.items()):
+            endpoints[endpoint] = {
+                'requests': len(values),
+                'throughput_rps': round(len(values) / elapsed, 2),
+                'error_rate': round(self.errors[endpoint] / len(values), 4),
+                'p50_ms': round(_percentile(values, 0.50) * 1000, 1),
+                'p95_ms': round(_percentile(values, 0.95) * 1000, 1),
+                'p99_ms': round(_percentile(values, 0.99) * 1000, 1),
+                'mean_ms': round(statistics.fmean(values) * 1000, 1)
+            }
+        total = sum(len(values) for values in self.latencies.values())
+        deferred = None
+        if self.deferred_turns:
+            deferred = {
+                'turns': len(self.deferred_turns),
+                'p50_ms': round(_percentile(self.deferred_turns, 0.50) * 1000, 1),
+                'p95_ms': round(_percentile(self.deferred_turns, 0.95) * 1000, 1),
+                'p99_ms': round(_percentile(self.deferred_turns, 0.99) * 1000, 1)
+            }
+        return {
+            'elapsed_seconds': round(elapsed, 2),
+            'requests': total,
+            'throughput_rps': round(total / elapsed, 2),
+            'error_rate': round(sum(self.errors.values()) / total, 4) if total else 0.0,
+            'cpu_seconds': round(cpu_seconds, 2),
+            # Requests one fully busy core would serve per second at this mix
+            'requests_per_cpu_second': round(total / cpu_seconds, 1) if cpu_seconds else None,
+            'conversations': dict(self.conversations),
+            'statuses': {str(k): v for k, v in sorted(self.statuses.items())},
+            'endpoints': endpoints,
+            'deferred_turns': deferred,
+            'rss_mb': self.samples
+        }
+
+
+class Conversation:
+    """Runs one script against the service"""
+
+    def __init__(self, client: httpx.AsyncClient, stats: LoadStats, headers, job_poll: float):
+        self.client = client
+        self.stats = stats
+        self.headers = headers
+        self.job_poll = job_poll
+        self.conversation_id = None
+        self.tracking_id = None
+        self.execution_id = None
+        self.etag = None
+
+    async def _call(self, endpoint: str, method: str, url: str, **kwargs) -> httpx.Response:
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, headers={**self.headers, **kwargs.pop('headers', {})},
+                                                 **kwargs)
+        except httpx.HTTPError:
+            self.stats.record(endpoint, time.perf_counter() - started, 0)
+            raise
+        self.stats.record(endpoint, time.perf_counter() - started, response.status_code)
+        return response
+
+    async def run(self, script) -> bool:
+        for step in script:
+            if 'process' in step:
+                ok = await self._process(step['process'])
+            elif 'approve' in step:
+                ok = await self._approve()
+            elif 'poll' in step:
+                ok = await self._poll(int(step['poll']), float(step.get('interval', 0.5)))
+            else:
+                await asyncio.sleep(float(step.get('think', 0)))
+                ok = True
+            if not ok:
+                return False
+        return True
+
+    async def _process(self, message: str) -> bool:
+        body = {'request': message}
+        if self.conversation_id:
+            body['conversation_id'] = self.conversation_id
+        started = time.perf_counter()
+        response = await self._call('process', 'POST', '/process', json=body)
+        if response.status_code == 202:
+            # Slower than PROCESS_WAIT: poll the job; the turn's latency runs until it completes
+            job_id = response.json()['id']
+            while True:
+                await asyncio.sleep(self.job_poll)
+                job = (await self._call('job', 'GET', f"/jobs/{job_id}")).json()
+                if job['status'] in ('completed', 'failed'):
+                    break
+            self.stats.deferred_turns.append(time.perf_counter() - started)
+            if job['status'] == 'failed':
+                return False
+            result = job['result']
+        elif response.status_code == 200:
+            result = response.json()
+        else:
+            return False
+        self.conversation_id = result['conversation_id']
+        return True
+
+    async def _approve(self) -> bool:
+        response = await self._call('approve', 'POST', '/approve-workflow',
+                                    json={'conversation_id': self.conversation_id})
+        if response.status_code != 200:
+            return False
+        data = response.json()
+        self.tracking_id = data.get('trackingId')
+        self.execution_id = data.get('executionId')
+        return True
+
+    async def _poll(self, count: int, interval: float) -> bool:
+        for _ in range(count):
+            if self.execution_id is None:
+                if self.tracking_id is None:
+                    # Nothing was submitted (e.g. a conversational turn); nothing to poll
+                    return True
+                response = await self._call('approval', 'GET', f"/approvals/{self.tracking_id}")
+                if response.status_code == 200:
+                    approval = response.json()
+                    if approval['status'] == 'failed':
+                        return True
+                    self.execution_id = approval.get('executionId')
+            else:
+                headers = {'If-None-Match': self.etag} if self.etag else {}
+                response = await self._call('execution', 'GET', f"/executions/{self.execution_id}",
+                                            headers=headers)
+                if response.status_code == 200:
+                    self.etag = response.headers.get('etag')
+                    if response.json().get('status') in ('completed', 'failed', 'cancelled'):
+                        return True
+            await asyncio.sleep(interval)
+        return True
+
+
+async def _drive(client: httpx.AsyncClient, args, scripts, mix, pids):
+    stats = LoadStats()
+    rng = random.Random(args.seed)
+    names, weights = list(mix), list(mix.values())
+    tasks = set()
+    in_flight = 0
+
+    async def conversation(index: int):
+        nonlocal in_flight
+        in_flight += 1
+        stats.conversations['started'] += 1
+        headers = {'X-Tenant-ID': f"tenant-{index % args.tenants}"} if args.tenants > 1 else {}
+        try:
+            ok = await Conversation(client, stats, headers, args.job_poll).run(scripts[rng.choices(names, weights)[0]])
+        except (httpx.HTTPError, KeyError, ValueError):
+            ok = False
+        finally:
+            in_flight -= 1
+        stats.conversations['finished' if ok else 'aborted'] += 1
+
+    async def sample():
+        while True:
+            stats.samples.append({
+                't': round(time.perf_counter() - started, 1),
+                'rss_mb': _rss_mb(pids()),
+                'in_flight': in_flight,
+                'requests': sum(len(v) for v in stats.latencies.values())
+            })
+            await asyncio.sleep(args.sample_interval)
+
+    started = time.perf_counter()
+    cpu_started = _cpu_seconds(pids())
+    sampler = asyncio.create_task(sample())
+    index = 0
+    while time.perf_counter() - started < args.duration:
+        if in_flight < args.max_in_flight:
+            task = asyncio.create_task(conversation(index))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            index += 1
+        await asyncio.sleep(rng.expovariate(args.rate))
+    if tasks:
+        await asyncio.wait(tasks, timeout=args.drain_timeout)
+    elapsed = time.perf_counter() - started
+    cpu = _cpu_seconds(pids()) - cpu_started
+    sampler.cancel()
+    stats.samples.append({'t': round(elapsed, 1), 'rss_mb': _rss_mb(pids()), 'in_flight': in_flight,
+                          'requests': sum(len(v) for v in stats.latencies.values())})
+    return stats.report(elapsed, cpu)
+
+
+def _service_env(args, workdir: str):
+    return {
+        'AI_PROVIDER': 'standin',
+        'STANDIN_LLM_LATENCY': f"{args.llm_latency[0]},{args.llm_latency[1]}",
+        'STANDIN_LLM_SEED': str(args.seed),
+        'OUTBOX_PATH': os.path.join(workdir, 'outbox.sqlite3'),
+        'CONVERSATION_STORE_PATH': os.path.join(workdir, 'conversations.sqlite3'),
+        'CONVERSATION_HISTORY_DIR': os.path.join(workdir, 'history'),
+        'JOB_WORKERS': str(args.job_workers),
+        'JOB_MAX_QUEUE': str(args.job_max_queue),
+        # The load generator plays the trusted proxy that sets tenants
+        'TENANT_HEADER': 'X-Tenant-ID'
+    }
+
+
+async def _run_asgi(args, scripts, mix, workdir: str):
+    from api.standin import StandInConfig, standin_transport
+
+    os.environ.update(_service_env(args, workdir))
+    import main
+
+    backend = standin_transport(StandInConfig(latency=tuple(args.backend_latency), seed=args.seed))
+    main.state = main.AppState(backend_transport=backend)
+    main.state.log_pipeline.stream = open(os.devnull, 'w')
+    await main.state.initialize()
+    try:
+        await main.state.warmup.wait(timeout=30)
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://agent', timeout=args.timeout) as client:
+            return await _drive(client, args, scripts, mix, lambda: [os.getpid()])
+    finally:
+        await main.state.shutdown()
+
+
+async def _wait_ready(url: str, process: subprocess.Popen, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise SystemExit(f"{url} exited with status {process.returncode}")
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise SystemExit(f"{url} did not become ready within {timeout}s")
+
+
+async def _run_uvicorn(args, scripts, mix, workdir: str):
+    backend_port, service_port = _free_port(), _free_port()
+    env = {**os.environ, **_service_env(args, workdir), 'BACKEND_URL': f"http://127.0.0.1:{backend_port}"}
+    if args.workers > 1:
+        # Every worker must see every conversation
+        env['CONVERSATION_SHARED_PATH'] = os.path.join(workdir, 'shared.sqlite3')
+    quiet = {'cwd': SRC, 'env': env, 'stdout': subprocess.DEVNULL, 'stderr': subprocess.DEVNULL}
+    backend = subprocess.Popen([sys.executable, '-m', 'api.standin', '--port', str(backend_port),
+                                '--latency', *map(str, args.backend_latency), '--seed', str(args.seed)], **quiet)
+    service = subprocess.Popen([sys.executable, '-m', 'uvicorn', 'main:app', '--port', str(service_port),
+                                '--workers', str(args.workers), '--no-access-log', '--log-level', 'warning'],
+                               **quiet)
+    try:
+        await _wait_ready(f"http://127.0.0.1:{backend_port}/api/health", backend)
+        await _wait_ready(f"http://127.0.0.1:{service_port}/ready", service)
+        limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{service_port}", timeout=args.timeout,
+                                     limits=limits) as client:
+            return await _drive(client, args, scripts, mix, lambda: _process_tree(service.pid))
+    finally:
+        for process in (service, backend):
+            process.send_signal(signal.SIGINT)
+        for process in (service, backend):
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def run_benchmark(args):
+    scripts = dict(SCRIPTS)
+    if args.scripts:
+        with open(args.scripts, encoding='utf-8') as f:
+            scripts.update(json.load(f))
+    mix = _parse_mix(args.mix, scripts)
+    # The service logs every turn; render as usual but discard
+    structlog.configure(logger_factory=structlog.PrintLoggerFactory(open(os.devnull, 'w')))
+    with tempfile.TemporaryDirectory(prefix='agent-load-') as workdir:
+        run = _run_uvicorn if args.mode == 'uvicorn' else _run_asgi
+        result = asyncio.run(run(args, scripts, mix, workdir))
+    return {'mode': args.mode, 'rate': args.rate, 'mix': mix, 'cpu_count': os.cpu_count(), **result}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=("asgi", "uvicorn"), default="asgi", help="How the service is run")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--rate", type=float, default=10.0, help="New conversations per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds during which conversations start")
+    parser.add_argument("--mix", default="swap=5,browse=3,chat=2", help="Script weights, name=weight,...")
+    parser.add_argument("--scripts", help="JSON file of additional {name: [steps]} scripts")
+    parser.add_argument("--tenants", type=int, default=1, help="Spread conversations over this many tenants")
+    parser.add_argument("--llm-latency", type=float, nargs=2, default=(0.5, 1.5), metavar=("MIN", "MAX"))
+    parser.add_argument("--backend-latency", type=float, nargs=2, default=(0.005, 0.02), metavar=("MIN", "MAX"))
+    parser.add_argument("--job-workers", type=int, default=32, help="JOB_WORKERS for the service")
+    parser.add_argument("--job-max-queue", type=int, default=1000, help="JOB_MAX_QUEUE for the service")
+    parser.add_argument("--max-in-flight", type=int, default=1000, help="Cap on concurrent conversations")
+    parser.add_argument("--job-poll", type=float, default=0.25, help="Seconds between /jobs polls after a 202")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout")
+    parser.add_argument("--drain-timeout", type=float, default=60.0, help="Seconds to let conversations finish")
+    parser.add_argument("--sample-interval", type=float, default=1.0, help="Seconds between RSS samples")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    result = run_benchmark(args)
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    print(f"{result['mode']}: {result['requests']} requests in {result['elapsed_seconds']}s, "
+          f"{result['throughput_rps']} req/s, error rate {result['error_rate']}, "
+          f"{result['requests_per_cpu_second']} req per CPU-second")
+    print(f"conversations: {result['conversations']}\n")
+    print(f"{'endpoint':>18} {'requests':>9} {'rps':>8} {'errors':>7} {'p50_ms':>9} {'p95_ms':>9} {'p99_ms':>9}")
+    for name, r in result['endpoints'].items():
+        print(f"{name:>18} {r['requests']:>9} {r['throughput_rps']:>8} {r['error_rate']:>7} "
+              f"{r['p50_ms']:>9} {r['p95_ms']:>9} {r['p99_ms']:>9}")
+    if result['deferred_turns']:
+        d = result['deferred_turns']
+        print(f"\n{d['turns']} turns answered 202; completion p50 {d['p50_ms']}ms, p95 {d['p95_ms']}ms, "
+              f"p99 {d['p99_ms']}ms")
+    print(f"\n{'t':>6} {'rss_mb':>8} {'in_flight':>10} {'requests':>9}")
+    for sample in result['rss_mb']:
+        print(f"{sample['t']:>6} {sample['rss_mb']:>8} {sample['in_flight']:>10} {sample['requests']:>9}")
+
+
+if __name__ == "__main__":
+    main()
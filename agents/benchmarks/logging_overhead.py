@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Logging Overhead Benchmark
+
+Measures the time the event loop spends in log calls per /process turn
+with workflow execution: the events WorkflowGenerator and
+DeFiBackendClient emit for one turn, logged with the ten-node DEX
+Aggregator workflow, writing to a file. An optional per-write delay
+imitates a slow stdout consumer (a full pipe to a log shipper).
+
+Scenarios:
+    sync_debug      structlog defaults (render and write on the loop, every level) with the
+                    workflow pretty-printed eagerly, as the service logged before the pipeline
+    sync_info       structlog defaults at info level, workflow serialized only for debug
+    queued          the log pipeline: events queued on the loop, rendered and written by a thread
+    queued_sampled  the log pipeline keeping 1 in 10 of the per-turn info events
+
+Usage:
+    python benchmarks/logging_overhead.py --turns 5000
+    python benchmarks/logging_overhead.py --turns 500 --sink-delay 0.001
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+import structlog
+
+from service.logs import LogConfig, LogPipeline
+from workflow.generator import WorkflowGenerator
+
+TURN_EVENTS = ("Generating workflow", "Workflow generated", "Executing workflow", "Workflow execution started")
+
+
+class _SlowFile:
+    """File whose writes take at least *delay* seconds, like a pipe nobody is draining fast enough"""
+
+    def __init__(self, f, delay: float):
+        self.f = f
+        self.delay = delay
+
+    def write(self, text):
+        if self.delay:
+            time.sleep(self.delay)
+        return self.f.write(text)
+
+    def flush(self):
+        self.f.flush()
+
+
+def _turn(generator_log, client_log, workflow, eager_dump: bool):
+    """The log calls of one turn, with the arguments the service passes"""
+    generator_log.info("Generating workflow", pattern='DEX Aggregator')
+    generator_log.info("Workflow generated", workflow_id=workflow['id'], node_count=len(workflow['nodes']),
+                       edge_count=len(workflow['edges']))
+    client_log.info("Executing workflow", workflow_id=workflow['id'], idempotency_key='4f7c2a9e')
+    if eager_dump:
+        client_log.debug("Sending workflow definition", workflow=json.dumps(workflow, indent=2))
+    elif client_log.is_enabled_for(logging.DEBUG):
+        client_log.debug("Sending workflow definition", workflow=json.dumps(workflow, separators=(',', ':')))
+    client_log.info("Workflow execution started", execution_id='exec-1')
+
+
+def _scenario(name: str, workflow, turns: int, sink_delay: float):
+    with tempfile.TemporaryFile('w+') as f:
+        sink = _SlowFile(f, sink_delay)
+        pipeline = None
+        if name.startswith('sync'):
+            level = logging.DEBUG if name == 'sync_debug' else logging.INFO
+            structlog.reset_defaults()
+            structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(level),
+                                logger_factory=structlog.PrintLoggerFactory(sink))
+        else:
+            rates = {event: 0.1 for event in TURN_EVENTS} if name == 'queued_sampled' else {}
+            pipeline = LogPipeline(LogConfig(level='info', sample_rates=rates, queue_size=100000), stream=sink)
+            pipeline.install()
+            pipeline.start()
+        generator_log = structlog.get_logger().bind(component="WorkflowGenerator")
+        client_log = structlog.get_logger().bind(component="BackendClient", base_url="http://localhost:3001")
+
+        async def run():
+            per_turn = []
+            for _ in range(turns):
+                started = time.perf_counter()
+                _turn(generator_log, client_log, workflow, eager_dump=name == 'sync_debug')
+                per_turn.append(time.perf_counter() - started)
+                await asyncio.sleep(0)
+            return per_turn
+
+        per_turn = asyncio.run(run())
+        drained_at = time.perf_counter()
+        stats = None
+        if pipeline is not None:
+            pipeline.stop(timeout=600)
+            stats = pipeline.stats()
+        drain = time.perf_counter() - drained_at
+        ordered = sorted(per_turn)
+        return {
+            'scenario': name,
+            'loop_us_per_turn': round(statistics.fmean(per_turn) * 1e6, 1),
+            'loop_p99_us': round(ordered[int(0.99 * (len(ordered) - 1))] * 1e6, 1),
+            'loop_max_us': round(ordered[-1] * 1e6, 1),
+            'loop_total_ms': round(sum(per_turn) * 1000, 1),
+            'drain_ms': round(drain * 1000, 1),
+            'written': stats['written'] if stats else None,
+            'dropped': stats['dropped'] if stats else None,
+            'sampled_out': sum(stats['sampled_out'].values()) if stats else None
+        }
+
+
+def run_benchmark(turns: int, sink_delay: float):
+    structlog.configure(logger_factory=structlog.PrintLoggerFactory(open(os.devnull, 'w')))
+    workflow = asyncio.run(WorkflowGenerator().generate_workflow(
+        {'pattern': 'DEX Aggregator', 'tokens': ['ETH', 'USDC'], 'user_intent': 'Swap ETH to USDC'}))
+    try:
+        return [_scenario(name, workflow, turns, sink_delay)
+                for name in ('sync_debug', 'sync_info', 'queued', 'queued_sampled')]
+    finally:
+        structlog.reset_defaults()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=5000, help="Turns to log per scenario")
+    parser.add_argument("--sink-delay", type=float, default=0.0, help="Seconds each write to the log file takes")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.turns, args.sink_delay)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'scenario':>15} {'us/turn':>9} {'p99_us':>9} {'max_us':>9} {'loop_ms':>9} {'drain_ms':>9} "
+          f"{'written':>8} {'sampled':>8}")
+    for r in results:
+        print(f"{r['scenario']:>15} {r['loop_us_per_turn']:>9} {r['loop_p99_us']:>9} {r['loop_max_us']:>9} "
+              f"{r['loop_total_ms']:>9} {r['drain_ms']:>9} {str(r['written']):>8} {str(r['sampled_out']):>8}")
+
+
+if __name__ == "__main__":
+    main()
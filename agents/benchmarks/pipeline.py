@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Agent Pipeline Micro-Benchmarks
+
+Times the CPU-bound hot paths of a /process turn in isolation, without an
+LLM or backend:
+
+    fallback_analysis    rule-based analysis of conversational, single- and multi-intent prompts
+    recognize_entities   token and chain recognition with the bundled lists and with 10k listed tokens
+    extract_json         JSON extraction from realistic and adversarial model completions
+    generate_workflow    workflow generation for each template pattern and a custom node list
+    validate_workflow    validation of chained workflows of 10 to 10k nodes
+    canvas_positions     canvas layout of 10 to 10k nodes
+
+Each case is calibrated to run for about ``--min-time`` seconds per round;
+the median of ``--rounds`` rounds is reported per call. Log output is
+rendered as usual but discarded.
+
+Results can be written as JSON with ``--output`` and compared with a stored
+baseline using ``--baseline``; the script exits with status 1 if any case
+is more than ``--threshold`` slower than its baseline. Baselines are only
+comparable on the machine that recorded them; refresh the stored one with
+``--output benchmarks/pipeline_baseline.json`` after intended changes.
+
+Usage:
+    python benchmarks/pipeline.py --baseline benchmarks/pipeline_baseline.json
+    python benchmarks/pipeline.py --filter validate_workflow --output results.json
+"""
+
+import argparse
+import asyncio
+import copy
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+import structlog
+
+from agents.architecture_mapper import ArchitectureMapperAgent
+from agents.entities import EntityIndex
+from workflow.generator import NODE_LABELS, TEMPLATE_PATTERNS, WorkflowGenerator
+
+SIZES = (10, 100, 1000, 10000)
+
+PROMPTS = {
+    'conversational': "hey, how's it going?",
+    'single_intent': 'make a portfolio tracker',
+    'multi_intent': ('Bridge USDC from Ethereum to Arbitrum, swap half of it to WBTC with slippage protection, '
+                     'then place a limit order to sell ETH on Polygon and monitor gas and MEV exposure'),
+}
+
+_REQUIREMENTS = {
+    'pattern': 'DEX Aggregator', 'tokens': ['ETH', 'USDC'], 'features': ['slippage protection'],
+    'chains': ['ethereum'], 'user_intent': 'Swap ETH to USDC',
+    'suggested_nodes': ['walletConnector', 'tokenSelector', 'oneInchQuote', 'oneInchSwap']
+}
+
+
+def _completions():
+    answer = json.dumps(_REQUIREMENTS)
+    return {
+        'plain': answer,
+        'markdown_fenced': f"Here is the analysis you asked for:\n\n```json\n{json.dumps(_REQUIREMENTS, indent=2)}\n```\n"
+                           "Let me know if you want changes.",
+        # Adversarial: long prose with no JSON, stray braces around the answer, deep nesting
+        'no_json_50kb': 'The user wants to swap tokens. ' * 1600,
+        'stray_braces': '{not json} ' * 200 + answer + ' {trailing}',
+        'nested_depth_200': '{"a":' * 200 + '1' + '}' * 200,
+    }
+
+
+def _chained_workflow(size: int):
+    node_types = list(NODE_LABELS)
+    nodes = [{'id': f"{node_types[i % len(node_types)]}-{i}", 'type': node_types[i % len(node_types)],
+              'data': {'label': '', 'config': {}}} for i in range(size)]
+    edges = [{'id': f"edge-{i}", 'source': nodes[i]['id'], 'target': nodes[i + 1]['id']} for i in range(size - 1)]
+    return {'id': 'benchmark', 'name': 'Benchmark', 'nodes': nodes, 'edges': edges}
+
+
+def _large_index(count: int = 10000) -> EntityIndex:
+    index = EntityIndex.load()
+    index.add_tokens([{'chainId': 1, 'address': '0x%040x' % i, 'symbol': f'TKN{i}', 'name': f'Token Number {i}',
+                       'decimals': 18} for i in range(count)])
+    return index
+
+
+def _extract_json(text):
+    # Completions without usable JSON raise; that path is part of what is measured
+    try:
+        return ArchitectureMapperAgent._extract_json(text)
+    except (ValueError, json.JSONDecodeError):
+        return None
+
+
+def _cases():
+    """Yield ``(group, name, callable, is_async, setup)``; setup builds fresh arguments outside the timing"""
+    agent = ArchitectureMapperAgent()
+    generator = WorkflowGenerator()
+
+    for name, prompt in PROMPTS.items():
+        yield 'fallback_analysis', name, agent._fallback_analysis, False, lambda prompt=prompt: (prompt,)
+
+    for index_name, index in (('bundled', EntityIndex.load()), ('10k tokens', _large_index())):
+        yield 'recognize_entities', f"multi_intent, {index_name}", index.recognize, False, \
+            lambda: (PROMPTS['multi_intent'],)
+
+    for name, text in _completions().items():
+        yield 'extract_json', name, _extract_json, False, lambda text=text: (text,)
+
+    patterns = {pattern: {'pattern': pattern, 'tokens': ['ETH', 'USDC']} for pattern in TEMPLATE_PATTERNS}
+    patterns['Custom (all nodes)'] = {'pattern': 'Custom DeFi Application', 'tokens': ['ETH', 'USDC'],
+                                      'features': ['limit orders'], 'suggested_nodes': list(NODE_LABELS)}
+    for name, requirements in patterns.items():
+        yield 'generate_workflow', name, generator.generate_workflow, True, lambda r=requirements: (r,)
+
+    for size in SIZES:
+        workflow = _chained_workflow(size)
+        yield 'validate_workflow', f"{size} nodes", generator.validate_workflow, True, lambda w=workflow: (w,)
+
+    for size in SIZES:
+        # Layout mutates the nodes, so every call gets a fresh copy of ones without positions or labels
+        bare = [{'id': node['id'], 'type': node['type']} for node in _chained_workflow(size)['nodes']]
+        yield 'canvas_positions', f"{size} nodes", generator._add_canvas_positions, False, \
+            lambda bare=bare: (copy.deepcopy(bare),)
+
+
+def _time_calls(func, is_async: bool, arguments) -> float:
+    """Run func over each argument tuple; returns elapsed seconds"""
+    if is_async:
+        async def run():
+            started = time.perf_counter()
+            for args in arguments:
+                await func(*args)
+            return time.perf_counter() - started
+        return asyncio.run(run())
+    started = time.perf_counter()
+    for args in arguments:
+        func(*args)
+    return time.perf_counter() - started
+
+
+def _measure(func, is_async: bool, setup, rounds: int, min_time: float):
+    # Calibrate: grow the call count until one round takes at least min_time
+    number = 1
+    while True:
+        elapsed = _time_calls(func, is_async, [setup() for _ in range(number)])
+        if elapsed >= min_time or number >= 1_000_000:
+            break
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9) * 1.2))
+    samples = []
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(rounds):
+            arguments = [setup() for _ in range(number)]
+            samples.append(_time_calls(func, is_async, arguments) / number)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return {
+        'calls_per_round': number,
+        'median_us': round(statistics.median(samples) * 1e6, 3),
+        'min_us': round(min(samples) * 1e6, 3),
+        'stdev_us': round(statistics.pstdev(samples) * 1e6, 3)
+    }
+
+
+def run_benchmark(rounds: int, min_time: float, only=None):
+    structlog.configure(logger_factory=structlog.PrintLoggerFactory(open(os.devnull, 'w')))
+    results = []
+    for group, name, func, is_async, setup in _cases():
+        if only and not any(f in f"{group}/{name}" for f in only):
+            continue
+        results.append({'case': f"{group}/{name}", **_measure(func, is_async, setup, rounds, min_time)})
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'results': results
+    }
+
+
+def compare(results, baseline, threshold: float):
+    """
+    Compare median times with a baseline
+
+    Returns:
+        One row per case present in both, with ``ratio`` (current / baseline)
+        and ``regressed`` set when the ratio exceeds ``1 + threshold``
+    """
+    previous = {r['case']: r for r in baseline['results']}
+    rows = []
+    for result in results['results']:
+        before = previous.get(result['case'])
+        if before is None or not before['median_us']:
+            continue
+        ratio = result['median_us'] / before['median_us']
+        rows.append({'case': result['case'], 'baseline_us': before['median_us'], 'median_us': result['median_us'],
+                     'ratio': round(ratio, 3), 'regressed': ratio > 1 + threshold})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=5, help="Timed rounds per case")
+    parser.add_argument("--min-time", type=float, default=0.05, help="Minimum seconds per round")
+    parser.add_argument("--filter", action="append", help="Only run cases containing this text (repeatable)")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="Compare with results previously written by --output")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Slowdown over the baseline that counts as a regression (0.25 = 25%%)")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.rounds, args.min_time, args.filter)
+    comparison = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            comparison = compare(results, json.load(f), args.threshold)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+
+    if args.json:
+        print(json.dumps({**results, 'comparison': comparison} if comparison is not None else results, indent=2))
+    else:
+        ratios = {row['case']: row for row in comparison or []}
+        print(f"{'case':<42} {'median_us':>11} {'min_us':>11} {'calls':>8}" + (f" {'vs_base':>8}" if ratios else ''))
+        for r in results['results']:
+            line = f"{r['case']:<42} {r['median_us']:>11} {r['min_us']:>11} {r['calls_per_round']:>8}"
+            row = ratios.get(r['case'])
+            if row is not None:
+                line += f" {row['ratio']:>7}x" + ('  REGRESSED' if row['regressed'] else '')
+            print(line)
+
+    if comparison and any(row['regressed'] for row in comparison):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
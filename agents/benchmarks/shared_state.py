@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Shared Conversation State Benchmark
+
+Measures conversation update throughput against a shared SQLite store as
+the number of worker processes grows. Each worker replays the store
+traffic of /process turns: read the conversation, then apply the turn
+with a compare-and-swap update.
+
+Usage:
+    python benchmarks/shared_state.py --workers 1,2,4,8 --turns 2000
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from store.shared import SharedConversationStore, SQLiteKV
+
+
+def _new_conversation():
+    return {"history": [], "current_requirements": None, "current_workflow": None}
+
+
+async def _replay(path: str, turns: int, conversations: int, concurrency: int, seed: int):
+    store = SharedConversationStore(SQLiteKV(path), max_attempts=50)
+    rng = random.Random(seed)
+    remaining = turns
+
+    async def client():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            conversation_id = f"conv-{rng.randrange(conversations)}"
+            await store.get(conversation_id)
+            message = {"role": "user", "content": "swap 1 ETH to USDC", "timestamp": time.time()}
+
+            def apply(context):
+                # Keep contexts at a realistic, bounded size
+                context["history"] = (context["history"] + [message])[-20:]
+                context["current_requirements"] = {"pattern": "DEX Aggregator", "tokens": ["ETH", "USDC"]}
+
+            await store.update(conversation_id, apply, default=_new_conversation)
+
+    await asyncio.gather(*[client() for _ in range(concurrency)])
+    stats = store.stats()
+    await store.close()
+    return stats
+
+
+def _worker(path, turns, conversations, concurrency, seed, results):
+    results.put(asyncio.run(_replay(path, turns, conversations, concurrency, seed)))
+
+
+def run_benchmark(workers: int, turns: int, conversations: int, concurrency: int) -> dict:
+    """Run *turns* conversation turns per worker across *workers* processes"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "shared.sqlite3")
+        SQLiteKV(path).close()  # create the schema before workers race for it
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(target=_worker, args=(path, turns, conversations, concurrency, seed, results))
+            for seed in range(workers)
+        ]
+        started = time.perf_counter()
+        for process in processes:
+            process.start()
+        stats = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - started
+
+    total = turns * workers
+    conflicts = sum(s['conflicts'] for s in stats)
+    return {
+        'workers': workers,
+        'turns': total,
+        'elapsed': round(elapsed, 3),
+        'turns_per_second': round(total / elapsed, 1),
+        'conflicts': conflicts,
+        'conflict_ratio': round(conflicts / total, 4)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4,8", help="Comma-separated worker process counts")
+    parser.add_argument("--turns", type=int, default=2000, help="Conversation turns per worker")
+    parser.add_argument("--conversations", type=int, default=200, help="Distinct conversations")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent requests per worker")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = [
+        run_benchmark(int(n), args.turns, args.conversations, args.concurrency)
+        for n in args.workers.split(",")
+    ]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'workers':>8} {'turns/s':>10} {'elapsed':>9} {'conflicts':>10}")
+    for r in results:
+        print(f"{r['workers']:>8} {r['turns_per_second']:>10} {r['elapsed']:>8}s {r['conflicts']:>10}")
+
+
+if __name__ == "__main__":
+    main()
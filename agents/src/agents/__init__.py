@@ -1,3 +1,5 @@
 from .architecture_mapper import ArchitectureMapperAgent
+from .entities import EntityIndex, TokenInfo, default_index
+from .routing import ModelRouter, RoutingConfig
 
-__all__ = ["ArchitectureMapperAgent"]
\ No newline at end of file
+__all__ = ["ArchitectureMapperAgent", "EntityIndex", "ModelRouter", "RoutingConfig", "TokenInfo", "default_index"]
\ No newline at end of file
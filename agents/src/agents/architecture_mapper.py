@@ -3,14 +3,26 @@ from __future__ import annotations
 import json
 import re
 import asyncio
+import time
 from dataclasses import dataclass, asdict
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
-from agno.agent import Agent
-from agno.models.anthropic import Claude
-from agno.models.openai import OpenAIChat
+from api.node_catalog import KNOWN_NODE_TYPES, NodeCatalogIndex
+from service.metrics import FALLBACK_ANALYSIS, stage
+from service.tracing import traced
+from .entities import default_index
+from .routing import FAST, ModelRouter, RoutingConfig
 
-# NOTE: If your agno installation names or import paths differ, adjust accordingly.
+# NOTE: agno and the provider SDKs are imported in initialize(), and only the selected
+# provider's, so importing this module stays cheap. If your agno installation names or
+# import paths differ, adjust them there.
+
+_FALLBACK_LLM_ERROR = FALLBACK_ANALYSIS.labels("llm_error")
+_FALLBACK_INVALID_JSON = FALLBACK_ANALYSIS.labels("invalid_json")
+_FALLBACK_LLM_UNAVAILABLE = FALLBACK_ANALYSIS.labels("llm_unavailable")
+
+# analyze_request appends the recent conversation to the prompt after this marker
+HISTORY_MARKER = "\n\nConversation history:\n"
 
 @dataclass
 class NodeSpec:
@@ -55,25 +67,54 @@ class ArchitectureMapperAgent:
         provider: str = "openai",  # Changed default to OpenAI
         model_id: str = "gpt-4o-mini",  # Using available OpenAI model instead of GPT-5-nano
         temperature: float = 0.0,
+        routing: Optional[RoutingConfig] = None,
+        node_index: Optional[Callable[[], Optional[NodeCatalogIndex]]] = None,
     ) -> None:
         self.provider = provider
         self.model_id = model_id
         self.temperature = temperature
+        # model_id is the strong model; routing can send simple requests to a faster one
+        self.router = ModelRouter(routing)
+        # Returns the backend's node catalog, if loaded; suggested nodes outside it are a model error
+        self._node_index = node_index
         self._agent = None
-        
+        self._fast_agent = None
+
+    @property
+    def ready(self) -> bool:
+        """True once the LLM agent is loaded; until then requests use the rule-based analysis"""
+        return self._agent is not None
+
     async def initialize(self) -> None:
-        """Initialize the agno agent - required before use"""
+        """Load the agno agent; the provider SDK import runs in a thread so the event loop keeps serving"""
+        self._agent, self._fast_agent = await asyncio.to_thread(self._build_agents)
+
+    def _build_agents(self) -> Tuple[Any, Any]:
+        strong = self._build_agent(self.model_id)
+        fast_model_id = self.router.config.fast_model_id
+        fast = self._build_agent(fast_model_id) if fast_model_id and fast_model_id != self.model_id else None
+        return strong, fast
+
+    def _build_agent(self, model_id: str):
+        if self.provider.lower() == "standin":
+            # Load tests: simulated latency, rule-based answers, no SDK or API key
+            from .standin import StandInLLM, StandInLLMConfig
+            return StandInLLM(self._fallback_analysis, StandInLLMConfig.from_env())
+
         # Initialize underlying LLM via agno-agi.
         if self.provider.lower() == "openai":
             # Use OpenAI GPT model
-            model = OpenAIChat(id=self.model_id, temperature=self.temperature)
+            from agno.models.openai import OpenAIChat
+            model = OpenAIChat(id=model_id, temperature=self.temperature)
         elif self.provider.lower() == "anthropic" or self.provider.lower() == "claude":
             # Use Anthropic Claude model
-            model = Claude(id=self.model_id, temperature=self.temperature)
+            from agno.models.anthropic import Claude
+            model = Claude(id=model_id, temperature=self.temperature)
         else:
-            raise ValueError(f"Unsupported provider: {self.provider}. Use 'openai' or 'anthropic'")
+            raise ValueError(f"Unsupported provider: {self.provider}. Use 'openai', 'anthropic' or 'standin'")
 
-        self._agent = Agent(
+        from agno.agent import Agent
+        return Agent(
             model=model,
             instructions=self._system_prompt(),
             name="ArchitectureMapperAgent",
@@ -143,6 +184,26 @@ class ArchitectureMapperAgent:
             "Respond ONLY with valid JSON (no markdown)."
         )
 
+    async def warm_up(self) -> bool:
+        """
+        Open the provider SDK's pooled connection with a cheap authenticated request
+        (listing models), so the first analysis skips the TLS handshake
+
+        Returns:
+            False if the agent is not loaded or its model exposes no async client
+        """
+        warmed = False
+        for agent in (self._agent, self._fast_agent):
+            get_client = getattr(getattr(agent, 'model', None), 'get_async_client', None)
+            if get_client is None:
+                continue
+            # The SDK client is cached on the model and reused by agent.arun
+            await get_client().models.list()
+            warmed = True
+        return warmed
+
+    @traced("analyze_request")
+    @stage("analyze_request")
     async def analyze_request(self, user_input: str, context: Dict[str, Any] = None) -> Dict[str, Any]:
         """
         Analyze user's natural language request and extract DeFi requirements
@@ -155,39 +216,85 @@ class ArchitectureMapperAgent:
             Structured requirements dictionary
         """
         if not self._agent:
-            raise RuntimeError("Agent not initialized. Call initialize() first.")
+            # The LLM stack is still loading (or failed to); serve with the rule-based analysis
+            _FALLBACK_LLM_UNAVAILABLE.inc()
+            return self._fallback_analysis(user_input, context)
         
         # Prepare input with context if available
         enhanced_input = user_input
         if context and context.get("history"):
             # Add conversation history for context
-            history_context = "\n\nConversation history:\n"
+            history_context = HISTORY_MARKER
             for msg in context["history"][-3:]:  # Last 3 messages for context
                 role = msg.get("role", "unknown")
                 content = msg.get("content", "")
                 history_context += f"{role}: {content}\n"
             enhanced_input = f"{user_input}{history_context}"
-        
+
+        tier, _ = self.router.route(user_input, context)
+        agent = self._fast_agent if tier == FAST and self._fast_agent is not None else self._agent
+        started = time.perf_counter()
+        requirements, outcome = await self._run_agent(agent, enhanced_input)
+        escalated = False
+        if agent is not self._agent and (outcome != "ok" or self._validation_error(requirements)):
+            # The fast model failed or gave an unusable answer; ask the strong model
+            escalated = True
+            requirements, outcome = await self._run_agent(self._agent, enhanced_input)
+        self.router.record(tier, outcome, time.perf_counter() - started, escalated)
+
+        if outcome == "error":
+            # Fallback to mock analysis if agno fails
+            _FALLBACK_LLM_ERROR.inc()
+            return self._fallback_analysis(user_input, context)
+        if outcome == "invalid":
+            # Fallback if JSON parsing fails
+            _FALLBACK_INVALID_JSON.inc()
+            return self._fallback_analysis(user_input, context)
+        return requirements
+
+    async def _run_agent(self, agent, enhanced_input: str) -> Tuple[Optional[Dict[str, Any]], str]:
+        """
+        Run one model and parse its answer
+
+        Returns:
+            ``(requirements, "ok")``, or ``(None, "error")`` / ``(None, "invalid")`` if the call or parsing failed
+        """
         # Run the agent - this might be sync or async depending on agno version
         try:
-            if hasattr(self._agent, 'arun'):
+            if hasattr(agent, 'arun'):
                 # Async version
-                messages = await self._agent.arun(enhanced_input)
+                messages = await agent.arun(enhanced_input)
             else:
                 # Sync version - run in executor to avoid blocking
-                messages = await asyncio.to_thread(self._agent.run, enhanced_input)
-        except Exception as e:
-            # Fallback to mock analysis if agno fails
-            return self._fallback_analysis(user_input, context)
+                messages = await asyncio.to_thread(agent.run, enhanced_input)
+        except Exception:
+            return None, "error"
 
         content = "".join([m.content for m in messages]) if isinstance(messages, list) else str(messages)
 
         try:
             data = self._extract_json(content)
-            return self._normalize_requirements(data)
-        except (json.JSONDecodeError, ValueError) as e:
-            # Fallback if JSON parsing fails
-            return self._fallback_analysis(user_input, context)
+            return self._normalize_requirements(data), "ok"
+        except (json.JSONDecodeError, ValueError, AttributeError):
+            return None, "invalid"
+
+    def _validation_error(self, requirements: Dict[str, Any]) -> Optional[str]:
+        """Why a model's requirements can't be used as they are, or None if they can"""
+        pattern = requirements.get('pattern')
+        if not isinstance(pattern, str) or not pattern:
+            return "missing pattern"
+        for key in ('tokens', 'features', 'chains', 'suggested_nodes'):
+            if not isinstance(requirements.get(key), list):
+                return f"{key} is not a list"
+        nodes = requirements['suggested_nodes']
+        if pattern != 'conversational' and not nodes:
+            return "no suggested nodes"
+        index = self._node_index() if self._node_index is not None else None
+        known = index if index else KNOWN_NODE_TYPES
+        unknown = [node for node in nodes if node not in known]
+        if unknown:
+            return f"unknown node types {unknown}"
+        return None
 
     async def map_user_idea(self, user_input: str) -> NodeFlow:
         """Legacy method for backward compatibility - converts to new format"""
@@ -238,6 +345,8 @@ class ArchitectureMapperAgent:
             
         return base_params
         
+    @traced("fallback_analysis")
+    @stage("fallback_analysis")
     def _fallback_analysis(self, user_input: str, context: Dict[str, Any] = None) -> Dict[str, Any]:
         """Fallback analysis when agno is not available"""
         input_lower = user_input.lower().strip()
@@ -274,8 +383,7 @@ class ArchitectureMapperAgent:
             'chain', 'chains', 'cross-chain', 'portfolio', 'dashboard',
             'wallet', 'wallets', 'connect', 'yield', 'farming', 'staking',
             'liquidity', 'pool', 'lend', 'lending', 'borrow', 'borrowing',
-            'eth', 'ethereum', 'usdc', 'usdt', 'bitcoin', 'btc', 'wbtc',
-            'polygon', 'arbitrum', 'optimism', 'avalanche'
+            'bitcoin', 'btc'
         ]
         
         # Build/create action words
@@ -284,8 +392,12 @@ class ArchitectureMapperAgent:
             'generate', 'construct', 'setup', 'configure'
         ]
         
+        # Tokens and chains are matched as whole words ("eth" is not in "method")
+        entities = default_index().recognize(user_input)
+
         # Check if input has clear DeFi intent first
-        has_defi_keyword = any(defi_word in input_lower for defi_word in defi_keywords)
+        has_defi_keyword = bool(entities.tokens or entities.chains) or \
+            any(defi_word in input_lower for defi_word in defi_keywords)
         has_action_keyword = any(action_word in input_lower for action_word in action_keywords)
         
         # If it has both DeFi keywords AND action keywords, it's definitely a DeFi request
@@ -330,13 +442,6 @@ class ArchitectureMapperAgent:
             pattern = "Custom DeFi Application"
             suggested_nodes = ['walletConnector', 'tokenSelector']
             
-        # Extract tokens
-        tokens = []
-        token_patterns = ['eth', 'usdc', 'usdt', 'wbtc', 'dai', 'uni', 'link']
-        for token in token_patterns:
-            if token in input_lower:
-                tokens.append(token.upper())
-                
         # Extract features
         features = []
         if 'slippage' in input_lower:
@@ -352,9 +457,9 @@ class ArchitectureMapperAgent:
             
         return {
             'pattern': pattern,
-            'tokens': tokens or ['ETH', 'USDC'],
+            'tokens': entities.tokens or ['ETH', 'USDC'],
             'features': features,
-            'chains': ['ethereum'],
+            'chains': entities.chains or ['ethereum'],
             'user_intent': user_input,
             'suggested_nodes': suggested_nodes
         }
@@ -371,6 +476,7 @@ class ArchitectureMapperAgent:
         }
 
     @staticmethod
+    @stage("extract_json")
     def _extract_json(text: str) -> Dict[str, Any]:
         """Extract the first JSON object found in *text* and return it as a dict."""
         match = re.search(r"\{[\s\S]*\}", text)
@@ -0,0 +1,272 @@
+"""
+Entity Recognition
+
+Finds tokens and chains in free text using standard token lists
+(tokenlists.org format) and chain lists (chainid.network ``chains.json``
+format) loaded from local disk. Symbols, token names and chain names are
+indexed in a word trie, and addresses and chain IDs in hash maps, so one
+pass over the input finds every mention in time proportional to its
+length, however many tokens are loaded. Matches respect word boundaries:
+"eth" is found in "swap ETH" but not in "method" or "ethereum".
+"""
+
+import json
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+import structlog
+
+logger = structlog.get_logger()
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+DEFAULT_TOKEN_LIST = os.path.join(DATA_DIR, 'tokenlist.json')
+DEFAULT_CHAIN_LIST = os.path.join(DATA_DIR, 'chains.json')
+
+# Address 1inch and most aggregators use for a chain's native currency
+NATIVE_ADDRESS = '0xEeeeeEeeeEeEeeEeEeEeeEEEeeeeEeeeeeeeEEeE'
+
+# Words: addresses, or alphanumerics with inner dots ("USDC.e"), optionally cashtagged ("$ETH")
+_WORD = re.compile(r'0x[0-9a-fA-F]{40}\b|\$?[A-Za-z0-9]+(?:\.[A-Za-z0-9]+)*')
+
+# Everyday words that are also token symbols or names somewhere; matched only when written
+# with a capital letter or as a cashtag ("LINK", "Base", "$GAS"), never in lowercase prose
+_COMMON_WORDS = frozenset('''
+a about after all also an and any app apple ape are as at auto back base best bid bit block bond book bot
+bridge build buy by can cash chain change claim coin core cover create dash data day deal defi dex do dog
+dollar dot down earn easy edge energy every fair farm fast fee fi find fire first flow for free from fuel
+fund game gas get gift go gold good grid grow hash have help high hold home hot hub i if in index info it
+just keep key kind know last layer lend life light like limit link live loan lock long loop low make map
+market max me meta mint moon more move my near need net new next nft node not now of off on one only open
+or order own pay peer people pie pool power price pro protocol pump quick rain rate real rise road
+rocket safe sand save send set share shift ship signal smart so solid spell stable stake star step store
+sun super swap sync tag the time to token top trade trust turbo up us use value vault via volt wall wallet
+want wave way we web win wise with work world yield you your zero
+'''.split())
+
+# Match priorities at equal length: an explicit symbol beats a chain name beats a token name
+_SYMBOL, _CHAIN, _NAME = 3, 2, 1
+
+
+@dataclass(frozen=True, slots=True)
+class TokenInfo:
+    symbol: str
+    name: str
+    chain_id: int
+    address: str
+    decimals: int
+
+
+@dataclass(frozen=True, slots=True)
+class ChainInfo:
+    chain_id: int
+    key: str  # canonical lowercase name used in requirements, e.g. "ethereum", "bsc"
+    name: str
+    native: Optional[TokenInfo]
+
+
+@dataclass
+class Entities:
+    """Mentions found in a text, each once, in order of first appearance"""
+    tokens: List[str] = field(default_factory=list)
+    chains: List[str] = field(default_factory=list)
+    addresses: List[TokenInfo] = field(default_factory=list)
+
+
+def _words(text: str) -> List[str]:
+    return [w.lower().lstrip('$') for w in _WORD.findall(text)]
+
+
+class EntityIndex:
+    """
+    Token and chain indexes built from token lists and a chain list.
+
+    The phrase trie maps sequences of lowercase words to candidates
+    ``(priority, kind, value)``; at each input word the longest phrase
+    wins, then the highest priority. Phrases are at most a few words long,
+    so recognition is linear in the input.
+    """
+
+    def __init__(self):
+        # Why the configured lists could not be loaded, when this index was built from fallbacks
+        self.load_error: Optional[str] = None
+        self._trie: Dict[str, Any] = {}
+        self._max_words = 1
+        self.chains: Dict[int, ChainInfo] = {}
+        self._chain_keys: Dict[str, int] = {}
+        # symbol (upper case) -> chain ID -> token
+        self._symbols: Dict[str, Dict[int, TokenInfo]] = {}
+        # lowercase address -> tokens with that address, on any chain
+        self._addresses: Dict[str, List[TokenInfo]] = {}
+
+    @classmethod
+    def load(cls, token_lists: Iterable[str] = (DEFAULT_TOKEN_LIST,),
+             chain_list: str = DEFAULT_CHAIN_LIST) -> "EntityIndex":
+        """Build an index from token list and chain list files"""
+        index = cls()
+        with open(chain_list, encoding='utf-8') as f:
+            index.add_chains(json.load(f))
+        for path in token_lists:
+            with open(path, encoding='utf-8') as f:
+                index.add_tokens(json.load(f)['tokens'])
+        return index
+
+    @classmethod
+    def from_env(cls) -> "EntityIndex":
+        paths = os.getenv("TOKEN_LISTS")
+        return cls.load(
+            [p.strip() for p in paths.split(',') if p.strip()] if paths else (DEFAULT_TOKEN_LIST,),
+            os.getenv("CHAIN_LIST", DEFAULT_CHAIN_LIST)
+        )
+
+    def add_chains(self, chains: List[Dict[str, Any]]) -> None:
+        """
+        Index chains.json entries. An optional ``aliases`` list (not part of
+        the standard format) adds names; its first entry becomes the key.
+        """
+        for spec in chains:
+            chain_id = int(spec['chainId'])
+            aliases = [a.lower() for a in spec.get('aliases', [])]
+            name = spec['name']
+            # "Ethereum Mainnet" -> "ethereum", "Arbitrum One" -> "arbitrum"
+            short = re.sub(r'\s+(mainnet|one|c-chain)$', '', name, flags=re.IGNORECASE).lower()
+            key = aliases[0] if aliases else short
+            currency = spec.get('nativeCurrency')
+            native = TokenInfo(currency['symbol'], currency['name'], chain_id, NATIVE_ADDRESS,
+                               int(currency.get('decimals', 18))) if currency else None
+            self.chains[chain_id] = ChainInfo(chain_id, key, name, native)
+            for alias in {name.lower(), short, *aliases}:
+                self._chain_keys.setdefault(' '.join(_words(alias)), chain_id)
+                self._add_phrase(alias, (_CHAIN, 'chain', key))
+            if native is not None:
+                self._add_symbol(native)
+                self._add_phrase(native.name, (_NAME, 'token', native.symbol))
+
+    def add_tokens(self, tokens: List[Dict[str, Any]]) -> None:
+        """Index token list entries; the first entry for a symbol on a chain wins"""
+        for spec in tokens:
+            token = TokenInfo(spec['symbol'], spec.get('name', spec['symbol']), int(spec['chainId']),
+                              spec['address'], int(spec.get('decimals', 18)))
+            self._add_symbol(token)
+            self._addresses.setdefault(token.address.lower(), []).append(token)
+            if token.name.lower() != token.symbol.lower():
+                self._add_phrase(token.name, (_NAME, 'token', token.symbol))
+
+    def _add_symbol(self, token: TokenInfo) -> None:
+        self._symbols.setdefault(token.symbol.upper(), {}).setdefault(token.chain_id, token)
+        self._add_phrase(token.symbol, (_SYMBOL, 'token', token.symbol))
+
+    def _add_phrase(self, phrase: str, candidate: Tuple[int, str, str]) -> None:
+        words = _words(phrase)
+        if not words:
+            return
+        node = self._trie
+        for word in words:
+            node = node.setdefault(word, {})
+        candidates = node.setdefault('', [])
+        if not any(c[1:] == candidate[1:] for c in candidates):
+            candidates.append(candidate)
+        self._max_words = max(self._max_words, len(words))
+
+    def recognize(self, text: str) -> Entities:
+        """Find tokens, chains and token addresses mentioned in *text*, in one pass"""
+        found = Entities()
+        raws = _WORD.findall(text)
+        words = [raw.lower().lstrip('$') for raw in raws]
+        trie, max_words = self._trie, self._max_words
+        i, count = 0, len(words)
+        while i < count:
+            node = trie.get(words[i])
+            if node is None:
+                if words[i][:2] == '0x' and len(words[i]) == 42:
+                    for token in self._addresses.get(words[i], ()):
+                        found.addresses.append(token)
+                        if token.symbol not in found.tokens:
+                            found.tokens.append(token.symbol)
+                i += 1
+                continue
+            best, length = None, 0
+            for j in range(i, min(count, i + max_words)):
+                if j > i:
+                    node = node.get(words[j])
+                    if node is None:
+                        break
+                candidates = node.get('')
+                if candidates and (j > i or self._allowed(raws[i])):
+                    best, length = max(candidates), j - i + 1
+            if best is None:
+                i += 1
+                continue
+            _, kind, value = best
+            target = found.tokens if kind == 'token' else found.chains
+            if value not in target:
+                target.append(value)
+            i += length
+        return found
+
+    @staticmethod
+    def _allowed(raw: str) -> bool:
+        # A one-word match that is an everyday word needs a capital letter or a cashtag
+        return raw[0] == '$' or not raw.islower() or raw.lower() not in _COMMON_WORDS
+
+    def chain_id(self, chain: Union[str, int]) -> Optional[int]:
+        """Chain ID for a chain name, alias or numeric ID"""
+        if isinstance(chain, int):
+            return chain
+        if chain.isdigit():
+            return int(chain)
+        return self._chain_keys.get(' '.join(_words(chain)))
+
+    def resolve(self, symbol: str, chain: Union[str, int]) -> Optional[TokenInfo]:
+        """The token with *symbol* on *chain*, including the chain's native currency"""
+        chain_id = self.chain_id(chain)
+        token = self._symbols.get(symbol.upper(), {}).get(chain_id)
+        if token is None and chain_id in self.chains:
+            native = self.chains[chain_id].native
+            if native is not None and native.symbol.upper() == symbol.upper():
+                return native
+        return token
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'symbols': len(self._symbols),
+            'tokens': sum(len(by_chain) for by_chain in self._symbols.values()),
+            'chains': len(self.chains),
+            'addresses': len(self._addresses)
+        }
+
+
+_default: Optional[EntityIndex] = None
+_default_lock = threading.Lock()
+
+
+def default_index() -> EntityIndex:
+    """
+    The process-wide index, loaded from TOKEN_LISTS and CHAIN_LIST on first use
+
+    If those can't be loaded, the bundled lists are used instead (or, failing
+    that too, an empty index) and the error is kept in ``load_error``. The
+    result is cached either way, so a bad path is read once, not per request.
+    """
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = _load_default()
+    return _default
+
+
+def _load_default() -> EntityIndex:
+    try:
+        return EntityIndex.from_env()
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    logger.error("Failed to load token or chain lists, using the bundled ones", error=error)
+    try:
+        index = EntityIndex.load()
+    except Exception as e:
+        logger.error("Failed to load the bundled token and chain lists", error=str(e))
+        index = EntityIndex()
+    index.load_error = error
+    return index
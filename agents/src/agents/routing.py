@@ -0,0 +1,132 @@
+"""
+Model Routing
+
+Scores how complex a request is from cheap local signals (length, tokens
+and chains mentioned, distinct intents, conversation depth) and picks the
+model tier to analyze it with: simple single-intent prompts go to a fast
+model, multi-chain strategies to the strong one. Requests the fast model
+gets wrong are escalated to the strong model.
+"""
+
+import os
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from service.metrics import ROUTED_ANALYSES, ROUTED_ANALYSIS_SECONDS
+from .entities import default_index
+
+FAST = 'fast'
+STRONG = 'strong'
+
+_INTENTS = {
+    'swap': ('swap', 'exchange', 'trade'),
+    'limit_order': ('limit order', 'limit-order', 'limit orders'),
+    'bridge': ('bridge', 'cross-chain', 'cross chain'),
+    'portfolio': ('portfolio', 'dashboard', 'tracker'),
+    'yield': ('yield', 'staking', 'stake', 'farming', 'liquidity', 'lend', 'lending', 'borrow'),
+    'monitoring': ('monitor', 'alert', 'notify')
+}
+
+
+def _words(words) -> re.Pattern:
+    return re.compile(r'\b(?:' + '|'.join(re.escape(w) for w in words) + r')\b')
+
+
+_INTENT_RES = {intent: _words(keywords) for intent, keywords in _INTENTS.items()}
+
+
+def complexity_signals(user_input: str, context: Optional[Dict[str, Any]] = None) -> Dict[str, int]:
+    """Local signals of how hard a request is to analyze; no model calls"""
+    text = user_input.lower()
+    context = context or {}
+    entities = default_index().recognize(user_input)
+    return {
+        'words': len(text.split()),
+        'entities': len(entities.tokens) + len(entities.chains),
+        'intents': sum(1 for pattern in _INTENT_RES.values() if pattern.search(text)),
+        'turns': context.get('history_offset', 0) + len(context.get('history', []))
+    }
+
+
+def complexity_score(signals: Dict[str, int]) -> float:
+    """
+    Combine signals into one score; about 1.0 separates simple from complex requests
+
+    Thirty words, a third intent, or two entities beyond the first two each add 1.0.
+    """
+    return (signals['words'] / 30
+            + 0.5 * max(0, signals['entities'] - 2)
+            + max(0, signals['intents'] - 1)
+            + min(signals['turns'], 20) / 20)
+
+
+@dataclass
+class RoutingConfig:
+    """Fast model for simple requests; None routes everything to the strong (``AI_MODEL``) model"""
+    fast_model_id: Optional[str] = None
+    threshold: float = 1.0  # requests scoring at or above this go straight to the strong model
+
+    @classmethod
+    def from_env(cls) -> "RoutingConfig":
+        return cls(
+            fast_model_id=os.getenv("AI_FAST_MODEL") or None,
+            threshold=float(os.getenv("ROUTING_COMPLEXITY_THRESHOLD", "1.0"))
+        )
+
+
+class ModelRouter:
+    """Chooses a model tier per request and records how the choices worked out"""
+
+    def __init__(self, config: Optional[RoutingConfig] = None):
+        self.config = config or RoutingConfig()
+        self._stats = {
+            'routed': {FAST: 0, STRONG: 0},
+            'escalated': 0,
+            'seconds_total': {FAST: 0.0, STRONG: 0.0, 'escalated': 0.0}
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return self.config.fast_model_id is not None
+
+    def route(self, user_input: str, context: Optional[Dict[str, Any]] = None) -> Tuple[str, float]:
+        """
+        Pick the tier for a request
+
+        Returns:
+            ``(tier, complexity score)``
+        """
+        score = complexity_score(complexity_signals(user_input, context))
+        tier = FAST if self.enabled and score < self.config.threshold else STRONG
+        self._stats['routed'][tier] += 1
+        return tier, score
+
+    def record(self, tier: str, outcome: str, seconds: float, escalated: bool = False) -> None:
+        """
+        Record one routed analysis
+
+        Args:
+            tier: The tier the request was routed to
+            outcome: ``ok``, ``invalid`` or ``error`` for the final model call
+            seconds: Time across every model call made for the request
+            escalated: Whether the fast model's answer was rejected and the strong model retried
+        """
+        route = 'escalated' if escalated else tier
+        if escalated:
+            self._stats['escalated'] += 1
+        self._stats['seconds_total'][route] += seconds
+        ROUTED_ANALYSES.labels(route, outcome).inc()
+        ROUTED_ANALYSIS_SECONDS.labels(route).observe(seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        fast = self._stats['routed'][FAST]
+        return {
+            'enabled': self.enabled,
+            'fast_model': self.config.fast_model_id,
+            'threshold': self.config.threshold,
+            'routed': dict(self._stats['routed']),
+            'escalated': self._stats['escalated'],
+            'escalation_rate': round(self._stats['escalated'] / fast, 4) if fast else 0.0,
+            'seconds_total': {k: round(v, 6) for k, v in self._stats['seconds_total'].items()}
+        }
@@ -0,0 +1,52 @@
+"""
+Stand-in LLM
+
+Imitates the agno agent for load tests: each call waits a configurable,
+LLM-like delay and answers with the rule-based analysis as JSON. Select
+it with ``AI_PROVIDER=standin``; no provider SDK or API key is needed.
+"""
+
+import asyncio
+import json
+import os
+import random
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .architecture_mapper import HISTORY_MARKER
+
+
+@dataclass
+class StandInLLMConfig:
+    """Simulation knobs for the stand-in LLM"""
+    latency: Tuple[float, float] = (0.5, 1.5)  # per-call delay range in seconds
+    error_rate: float = 0.0  # probability that a call raises, as a provider outage would
+    seed: Optional[int] = None
+
+    @classmethod
+    def from_env(cls) -> "StandInLLMConfig":
+        low, _, high = os.getenv("STANDIN_LLM_LATENCY", "0.5,1.5").partition(",")
+        return cls(
+            latency=(float(low), float(high or low)),
+            error_rate=float(os.getenv("STANDIN_LLM_ERROR_RATE", "0")),
+            seed=int(os.environ["STANDIN_LLM_SEED"]) if os.getenv("STANDIN_LLM_SEED") else None
+        )
+
+
+class StandInLLM:
+    """Agent with an async ``arun(prompt)`` that answers with *analyze*'s result"""
+
+    def __init__(self, analyze: Callable[[str], Dict[str, Any]], config: Optional[StandInLLMConfig] = None):
+        self.analyze = analyze
+        self.config = config or StandInLLMConfig()
+        self.random = random.Random(self.config.seed)
+        self.calls = 0
+
+    async def arun(self, prompt: str) -> str:
+        self.calls += 1
+        low, high = self.config.latency
+        if high > 0:
+            await asyncio.sleep(self.random.uniform(low, high))
+        if self.random.random() < self.config.error_rate:
+            raise RuntimeError("Simulated LLM provider failure")
+        return json.dumps(self.analyze(prompt.split(HISTORY_MARKER, 1)[0]))
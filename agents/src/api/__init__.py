@@ -4,6 +4,13 @@ DeFi Agent System - API Package
 Contains HTTP client for communicating with the TypeScript backend.
 """
 
-from .backend_client import DeFiBackendClient
+from .backend_client import DeFiBackendClient, WorkflowSubmissionError
+from .bulk import BulkSubmissionReport
+from .log_tail import LogCursor
+from .node_catalog import NodeCatalog, NodeCatalogIndex
+from .poller import ExecutionPoller, PollerConfig
+from .status_cache import ExecutionStatusCache
+from .transport import TransportConfig
 
-__all__ = ['DeFiBackendClient']
\ No newline at end of file
+__all__ = ['DeFiBackendClient', 'WorkflowSubmissionError', 'BulkSubmissionReport', 'LogCursor', 'NodeCatalog', 'NodeCatalogIndex', 'ExecutionPoller', 'PollerConfig',
+           'ExecutionStatusCache', 'TransportConfig']
\ No newline at end of file
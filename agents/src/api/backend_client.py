@@ -5,12 +5,24 @@ HTTP client for communicating with the TypeScript DeFi Execution Engine backend.
 """
 
 import asyncio
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, AsyncIterator, List, Tuple
 import httpx
 import json
+import logging
+import uuid
 from dataclasses import dataclass
+import time
 import structlog
 
+from service.metrics import BACKEND_REQUEST_SECONDS
+from service.tracing import TRACER, current_span, trace_headers
+
+from .bulk import BulkSubmitter, BulkSubmissionReport, WorkflowSource
+from .log_tail import LogCursor, diff_log_entries
+from .node_catalog import KNOWN_NODE_TYPES, NodeCatalog, NodeCatalogIndex
+from .poller import ExecutionPoller, PollerConfig, TERMINAL_STATUSES, extract_status
+from .transport import BackendTransport, TransportConfig
+
 logger = structlog.get_logger()
 
 @dataclass
@@ -22,6 +34,13 @@ class ExecutionStatus:
     stats: Optional[Dict[str, Any]] = None
     error: Optional[str] = None
 
+class WorkflowSubmissionError(RuntimeError):
+    """Raised when the backend rejects a workflow submission"""
+    
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
 class DeFiBackendClient:
     """
     HTTP client for communicating with the TypeScript DeFi Execution Engine.
@@ -29,30 +48,66 @@ class DeFiBackendClient:
     Provides methods to execute workflows and monitor their progress.
     """
     
-    def __init__(self, base_url: str = "http://localhost:3001"):
+    def __init__(
+        self,
+        base_url: str = "http://localhost:3001",
+        poller_config: Optional[PollerConfig] = None,
+        transport_config: Optional[TransportConfig] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        catalog_ttl: float = 300.0
+    ):
         self.base_url = base_url.rstrip('/')
         self.logger = logger.bind(component="BackendClient", base_url=base_url)
-        self._client = None
+        # Pooled connections, per-endpoint timeouts and retries
+        self.transport = BackendTransport(self.base_url, transport_config, transport=transport)
+        # Shared scheduler for every execution being waited on
+        self.poller = ExecutionPoller(self.get_execution_status, poller_config)
+        # Cached /api/nodes, /api/config and /api/plugins lookups
+        self.node_catalog = NodeCatalog(self._request, ttl=catalog_ttl)
+        
+    async def start(self) -> None:
+        """Open the pooled HTTP client ahead of the first request"""
+        await self.transport.start()
         
     async def _get_client(self) -> httpx.AsyncClient:
         """Get or create HTTP client"""
-        if self._client is None:
-            self._client = httpx.AsyncClient(
-                timeout=httpx.Timeout(30.0),
-                headers={
-                    "Content-Type": "application/json",
-                    "User-Agent": "DeFi-Agent-System/0.1.0"
-                }
-            )
-        return self._client
+        return await self.transport.start()
+        
+    async def _request(self, method: str, path: str, endpoint: str, **kwargs: Any) -> httpx.Response:
+        """Send a request through the pooled transport, recording its latency per endpoint"""
+        if current_span() is None:
+            return await self._timed_request(method, path, endpoint, **kwargs)
+        with TRACER.span(f"backend.{endpoint}", method=method, path=path) as span:
+            # Let the backend correlate its logs with this request
+            kwargs['headers'] = {**(kwargs.get('headers') or {}), **trace_headers()}
+            response = await self._timed_request(method, path, endpoint, **kwargs)
+            span.attributes['status_code'] = response.status_code
+            return response
+            
+    async def _timed_request(self, method: str, path: str, endpoint: str, **kwargs: Any) -> httpx.Response:
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            response = await self.transport.request(method, path, endpoint, **kwargs)
+            outcome = f"{response.status_code // 100}xx"
+            return response
+        finally:
+            BACKEND_REQUEST_SECONDS.labels(endpoint, outcome).observe(time.perf_counter() - started)
+        
+    def stats(self) -> Dict[str, Any]:
+        """Return transport and poller counters"""
+        return {
+            'transport': self.transport.stats(),
+            'poller': self.poller.stats(),
+            'node_catalog': self.node_catalog.stats()
+        }
         
     async def health_check(self) -> Dict[str, Any]:
         """Check if the backend is healthy and ready"""
         self.logger.info("Performing health check")
         
         try:
-            client = await self._get_client()
-            response = await client.get(f"{self.base_url}/api/health")
+            response = await self._request("GET", "/api/health", "health")
             response.raise_for_status()
             
             result = response.json()
@@ -69,26 +124,35 @@ class DeFiBackendClient:
             self.logger.error("Health check failed - unexpected error", error=str(e))
             raise
             
-    async def execute_workflow(self, workflow_definition: Dict[str, Any]) -> Dict[str, Any]:
+    async def execute_workflow(self, workflow_definition: Dict[str, Any],
+                               idempotency_key: Optional[str] = None,
+                               retries: Optional[int] = None) -> Dict[str, Any]:
         """
         Execute a workflow definition on the backend
         
         Args:
             workflow_definition: The workflow to execute
+            idempotency_key: Key sent as ``Idempotency-Key``; generated when not provided.
+                The backend does not deduplicate on it yet, so the submission is retried
+                only when the connection could not be established
+            retries: Transport retries of an unsent request; None uses the configured
+                policy, 0 leaves retrying to the caller (the approval outbox)
             
         Returns:
             Execution result with executionId
         """
-        self.logger.info("Executing workflow", workflow_id=workflow_definition.get('id'))
+        idempotency_key = idempotency_key or str(uuid.uuid4())
+        self.logger.info("Executing workflow",
+                         workflow_id=workflow_definition.get('id'),
+                         idempotency_key=idempotency_key)
         
-        # Debug: Log the exact workflow being sent
-        import json
-        workflow_json = json.dumps(workflow_definition, indent=2)
-        self.logger.debug("Sending workflow definition", workflow=workflow_json)
+        # Debug: Log the exact workflow being sent (serialized only when debug logging is on)
+        workflow_json = None
+        if self.logger.is_enabled_for(logging.DEBUG):
+            workflow_json = json.dumps(workflow_definition, separators=(',', ':'))
+            self.logger.debug("Sending workflow definition", workflow=workflow_json)
         
         try:
-            client = await self._get_client()
-            
             # Backend expects { workflow: WorkflowDefinition, context?: ExecutionContext }
             request_body = {
                 "workflow": workflow_definition,
@@ -97,9 +161,13 @@ class DeFiBackendClient:
                 }
             }
             
-            response = await client.post(
-                f"{self.base_url}/api/workflows/execute",
-                json=request_body
+            response = await self._request(
+                "POST",
+                "/api/workflows/execute",
+                "execute",
+                json=request_body,
+                headers={"Idempotency-Key": idempotency_key},
+                retries=retries
             )
             response.raise_for_status()
             
@@ -117,12 +185,44 @@ class DeFiBackendClient:
                             workflow_structure=f"nodes: {len(workflow_definition.get('nodes', []))}, edges: {len(workflow_definition.get('edges', []))}")
             
             # Try to log the exact request being sent for debugging
-            self.logger.debug("Failed workflow structure", workflow=workflow_json)
-            raise RuntimeError(f"Workflow execution failed: {e.response.status_code} - {error_detail}")
+            if workflow_json is not None:
+                self.logger.debug("Failed workflow structure", workflow=workflow_json)
+            raise WorkflowSubmissionError(
+                f"Workflow execution failed: {e.response.status_code} - {error_detail}",
+                status_code=e.response.status_code
+            )
         except Exception as e:
             self.logger.error("Workflow execution error", error=str(e))
             raise
             
+    async def execute_workflows(
+        self,
+        workflows: WorkflowSource,
+        max_in_flight: int = 8,
+        queue_size: Optional[int] = None
+    ) -> BulkSubmissionReport:
+        """
+        Execute many workflow definitions with bounded concurrency
+        
+        Workflows are pulled from *workflows* into a bounded queue, so a
+        producer (including an async generator) is paused while the backend
+        is busy. Each workflow is submitted once; failures are reported per item.
+        
+        Args:
+            workflows: Sync or async iterable of workflow definitions
+            max_in_flight: Maximum concurrent submissions
+            queue_size: Maximum queued workflows (defaults to twice max_in_flight)
+            
+        Returns:
+            Report with per-item results, throughput and queue depth
+        """
+        submitter = BulkSubmitter(
+            lambda workflow, key: self.execute_workflow(workflow, idempotency_key=key),
+            max_in_flight=max_in_flight,
+            queue_size=queue_size
+        )
+        return await submitter.run(workflows)
+            
     async def get_execution_status(self, execution_id: str) -> Dict[str, Any]:
         """
         Get the current status of a workflow execution
@@ -134,8 +234,7 @@ class DeFiBackendClient:
             Current execution status
         """
         try:
-            client = await self._get_client()
-            response = await client.get(f"{self.base_url}/api/executions/{execution_id}")
+            response = await self._request("GET", f"/api/executions/{execution_id}", "status")
             response.raise_for_status()
             
             result = response.json()
@@ -168,8 +267,7 @@ class DeFiBackendClient:
             Execution logs
         """
         try:
-            client = await self._get_client()
-            response = await client.get(f"{self.base_url}/api/executions/{execution_id}/logs")
+            response = await self._request("GET", f"/api/executions/{execution_id}/logs", "logs")
             response.raise_for_status()
             
             return response.json()
@@ -183,6 +281,81 @@ class DeFiBackendClient:
             self.logger.error("Error getting execution logs", error=str(e))
             return {'logs': [f'Error retrieving logs: {str(e)}']}
             
+    async def fetch_log_delta(self, execution_id: str,
+                              cursor: Optional[LogCursor] = None) -> Tuple[List[Dict[str, Any]], LogCursor]:
+        """
+        Get only the log lines added since *cursor*
+        
+        The request is conditional on the previous response's ETag, so an
+        unchanged log costs a 304 with no body.
+        
+        Args:
+            execution_id: The execution ID
+            cursor: Position returned by the previous call (None reads from the start)
+            
+        Returns:
+            Tuple of (new log lines, advanced cursor)
+        """
+        cursor = cursor or LogCursor()
+        headers = {'If-None-Match': cursor.etag} if cursor.etag else {}
+        
+        try:
+            response = await self._request("GET", f"/api/executions/{execution_id}/logs", "logs",
+                                           headers=headers)
+            if response.status_code == 304:
+                return [], cursor
+            response.raise_for_status()
+            
+        except httpx.HTTPStatusError as e:
+            self.logger.error("Failed to get execution logs", 
+                            status_code=e.response.status_code,
+                            execution_id=execution_id)
+            raise RuntimeError(f"Failed to get execution logs: {e.response.status_code}")
+            
+        lines, next_cursor = diff_log_entries(response.json(), cursor)
+        next_cursor.etag = response.headers.get('ETag')
+        return lines, next_cursor
+        
+    async def tail_execution_logs(
+        self,
+        execution_id: str,
+        cursor: Optional[LogCursor] = None,
+        follow: bool = True,
+        poll_interval: float = 1.0
+    ) -> AsyncIterator[Tuple[List[Dict[str, Any]], LogCursor]]:
+        """
+        Incrementally tail the logs of a workflow execution
+        
+        Args:
+            execution_id: The execution ID
+            cursor: Position to resume from (None reads from the start)
+            follow: Keep polling until the execution reaches a terminal status
+            poll_interval: Seconds between polls while following
+            
+        Yields:
+            Batches of new log lines together with the cursor after each batch
+        """
+        cursor = cursor or LogCursor()
+        
+        while True:
+            lines, cursor = await self.fetch_log_delta(execution_id, cursor)
+            if lines:
+                yield lines, cursor
+            if not follow:
+                return
+                
+            if not lines:
+                # Only check the status when the log is quiet
+                status = extract_status(await self.get_execution_status(execution_id))
+                if status in TERMINAL_STATUSES:
+                    # Pick up anything written between the last read and completion
+                    lines, cursor = await self.fetch_log_delta(execution_id, cursor)
+                    if lines:
+                        yield lines, cursor
+                    return
+                    
+            await asyncio.sleep(poll_interval)
+            
     async def cancel_execution(self, execution_id: str) -> bool:
         """
         Cancel a running workflow execution
@@ -196,12 +369,13 @@ class DeFiBackendClient:
         self.logger.info("Cancelling execution", execution_id=execution_id)
         
         try:
-            client = await self._get_client()
-            response = await client.post(f"{self.base_url}/api/executions/{execution_id}/cancel")
+            response = await self._request("POST", f"/api/executions/{execution_id}/cancel", "cancel",
+                                           idempotent=True)
             response.raise_for_status()
             
             result = response.json()
-            success = result.get('success', False)
+            # The backend answers {"cancelled": bool}; older versions sent {"success": bool}
+            success = bool(result.get('cancelled', result.get('success', False)))
             
             if success:
                 self.logger.info("Execution cancelled successfully", execution_id=execution_id)
@@ -236,11 +410,7 @@ class DeFiBackendClient:
         }
         
         try:
-            client = await self._get_client()
-            response = await client.post(
-                f"{self.base_url}/api/test/oneinch",
-                json=test_params
-            )
+            response = await self._request("POST", "/api/test/oneinch", "oneinch", json=test_params)
             response.raise_for_status()
             
             result = response.json()
@@ -258,45 +428,96 @@ class DeFiBackendClient:
         """
         Get list of supported node types from the backend
         
+        Served from the node catalog cache and revalidated once its TTL expires.
+        
         Returns:
             List of supported node types
         """
         try:
-            client = await self._get_client()
-            response = await client.get(f"{self.base_url}/api/nodes")
-            response.raise_for_status()
-            
-            return response.json()
+            return await self.node_catalog.get_nodes()
             
         except Exception as e:
             self.logger.error("Failed to get supported nodes", error=str(e))
             # Return fallback list based on what we know from the backend
-            return {
-                'nodeTypes': [
-                    'walletConnector',
-                    'tokenSelector', 
-                    'oneInchQuote',
-                    'oneInchSwap',
-                    'priceImpactCalculator',
-                    'transactionMonitor',
-                    'transactionStatus',
-                    'chainSelector',
-                    'fusionPlus',
-                    'portfolioAPI',
-                    'limitOrder',
-                    'fusionSwap',
-                    'erc20Token'
-                ]
-            }
+            return {'nodeTypes': list(KNOWN_NODE_TYPES)}
+            
+    def watch_execution(self, execution_id: str) -> asyncio.Future:
+        """
+        Watch an execution through the shared poller
+        
+        Args:
+            execution_id: The execution ID to watch
+            
+        Returns:
+            Future resolved with the final execution status
+        """
+        return self.poller.watch(execution_id)
+            
+    async def get_node_index(self) -> Optional[NodeCatalogIndex]:
+        """
+        Get the local index of node types and config schemas
+        
+        Returns:
+            The catalog index, or None if the backend catalog is unavailable
+        """
+        try:
+            return await self.node_catalog.get_index()
+        except Exception as e:
+            self.logger.warning("Node catalog unavailable", error=str(e))
+            return self.node_catalog.index
+            
+    async def get_config(self) -> Dict[str, Any]:
+        """
+        Get the execution engine configuration from the backend
+        
+        Returns:
+            Engine configuration (supported chains, concurrency and timeout limits)
+        """
+        try:
+            return await self.node_catalog.get_config()
+        except httpx.HTTPStatusError as e:
+            self.logger.error("Failed to get backend config", status_code=e.response.status_code)
+            raise RuntimeError(f"Failed to get backend config: {e.response.status_code}")
+        except Exception as e:
+            self.logger.error("Error getting backend config", error=str(e))
+            raise
+            
+    async def get_plugin(self, plugin_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get details for a single backend plugin
+        
+        Args:
+            plugin_id: The plugin (node type) ID
+            
+        Returns:
+            Plugin definition, or None if the backend does not know it
+        """
+        try:
+            result = await self.node_catalog.get_plugin(plugin_id)
+            return result.get('plugin')
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 404:
+                self.logger.warning("Plugin not found", plugin_id=plugin_id)
+                return None
+            self.logger.error("Failed to get plugin",
+                            status_code=e.response.status_code,
+                            plugin_id=plugin_id)
+            raise RuntimeError(f"Failed to get plugin: {e.response.status_code}")
+        except Exception as e:
+            self.logger.error("Error getting plugin", error=str(e))
+            raise
             
     async def wait_for_completion(self, execution_id: str, timeout: int = 300, poll_interval: int = 2) -> Dict[str, Any]:
         """
         Wait for a workflow execution to complete
         
+        Polling is multiplexed through the shared poller, so concurrent waiters
+        do not each add their own request loop against the backend.
+        
         Args:
             execution_id: The execution ID to wait for
             timeout: Maximum time to wait in seconds
-            poll_interval: How often to check status in seconds
+            poll_interval: Upper bound on how often this execution is checked, in seconds
             
         Returns:
             Final execution status
@@ -305,33 +526,24 @@ class DeFiBackendClient:
                         execution_id=execution_id, 
                         timeout=timeout)
         
-        start_time = asyncio.get_event_loop().time()
-        
-        while True:
-            status = await self.get_execution_status(execution_id)
-            
-            if status.get('status') in ['completed', 'failed', 'cancelled']:
-                self.logger.info("Execution finished", 
-                               execution_id=execution_id,
-                               final_status=status.get('status'))
-                return status
-                
-            # Check timeout
-            elapsed = asyncio.get_event_loop().time() - start_time
-            if elapsed > timeout:
-                self.logger.warning("Execution wait timeout", 
-                                  execution_id=execution_id,
-                                  elapsed=elapsed)
-                await self.cancel_execution(execution_id)
-                raise TimeoutError(f"Execution {execution_id} did not complete within {timeout} seconds")
-                
-            await asyncio.sleep(poll_interval)
+        try:
+            status = await self.poller.wait(execution_id, timeout=timeout, max_interval=poll_interval)
+        except asyncio.TimeoutError:
+            self.logger.warning("Execution wait timeout", 
+                              execution_id=execution_id,
+                              timeout=timeout)
+            await self.cancel_execution(execution_id)
+            raise TimeoutError(f"Execution {execution_id} did not complete within {timeout} seconds")
+            
+        self.logger.info("Execution finished", 
+                       execution_id=execution_id,
+                       final_status=extract_status(status))
+        return status
             
     async def close(self):
-        """Close the HTTP client"""
-        if self._client:
-            await self._client.aclose()
-            self._client = None
+        """Close the poller and the HTTP client"""
+        await self.poller.close()
+        await self.transport.close()
             
     async def __aenter__(self):
         """Async context manager entry"""
@@ -0,0 +1,166 @@
+"""
+Bulk Workflow Submission
+
+Submits many workflows through a bounded in-flight window fed by a bounded
+queue, so producers are slowed down instead of flooding the backend.
+"""
+
+import asyncio
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterable, Awaitable, Callable, Dict, Iterable, List, Optional, Union
+import structlog
+
+logger = structlog.get_logger()
+
+WorkflowSource = Union[Iterable[Dict[str, Any]], AsyncIterable[Dict[str, Any]]]
+
+
+@dataclass
+class BulkItemResult:
+    """Outcome of a single workflow in a bulk submission"""
+    index: int
+    workflow_id: Optional[str]
+    idempotency_key: str
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @property
+    def execution_id(self) -> Optional[str]:
+        return self.result.get('executionId') if self.result else None
+
+
+@dataclass
+class BulkSubmissionReport:
+    """Per-item results plus throughput and queue statistics"""
+    results: List[BulkItemResult] = field(default_factory=list)
+    elapsed: float = 0.0
+    max_queue_depth: int = 0
+    max_in_flight: int = 0
+
+    @property
+    def succeeded(self) -> int:
+        return sum(1 for r in self.results if r.ok)
+
+    @property
+    def failed(self) -> int:
+        return len(self.results) - self.succeeded
+
+    @property
+    def throughput(self) -> float:
+        """Completed submissions per second"""
+        return len(self.results) / self.elapsed if self.elapsed > 0 else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'submitted': len(self.results),
+            'succeeded': self.succeeded,
+            'failed': self.failed,
+            'elapsed': round(self.elapsed, 4),
+            'throughput_per_second': round(self.throughput, 2),
+            'max_queue_depth': self.max_queue_depth,
+            'max_in_flight': self.max_in_flight
+        }
+
+
+class BulkSubmitter:
+    """
+    Runs a bulk submission with ``max_in_flight`` workers draining a queue
+    of at most ``queue_size`` pending workflows.
+
+    Each workflow is submitted once. Submission is not idempotent on the
+    backend, so a failed item is reported rather than retried; only requests
+    that never reached the backend are retried, by the transport.
+    """
+
+    def __init__(
+        self,
+        submit: Callable[[Dict[str, Any], str], Awaitable[Dict[str, Any]]],
+        max_in_flight: int = 8,
+        queue_size: Optional[int] = None
+    ):
+        self.max_in_flight = max(1, max_in_flight)
+        self.queue_size = queue_size or self.max_in_flight * 2
+        self.logger = logger.bind(component="BulkSubmitter")
+        self._submit = submit
+
+    async def run(self, workflows: WorkflowSource) -> BulkSubmissionReport:
+        """
+        Submit every workflow from *workflows*
+
+        Args:
+            workflows: Sync or async iterable of workflow definitions
+
+        Returns:
+            Report with one result per workflow, in input order
+        """
+        report = BulkSubmissionReport()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        results: Dict[int, BulkItemResult] = {}
+        in_flight = 0
+        started = time.perf_counter()
+
+        async def produce() -> None:
+            index = 0
+            async for workflow in self._iterate(workflows):
+                # Blocks while the queue is full: this is the backpressure on producers
+                await queue.put((index, workflow))
+                report.max_queue_depth = max(report.max_queue_depth, queue.qsize())
+                index += 1
+            for _ in range(self.max_in_flight):
+                await queue.put(None)
+
+        async def work() -> None:
+            nonlocal in_flight
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                index, workflow = item
+                in_flight += 1
+                report.max_in_flight = max(report.max_in_flight, in_flight)
+                try:
+                    results[index] = await self._submit_one(index, workflow)
+                finally:
+                    in_flight -= 1
+
+        producer = asyncio.create_task(produce())
+        workers = [asyncio.create_task(work()) for _ in range(self.max_in_flight)]
+        try:
+            await asyncio.gather(producer, *workers)
+        except BaseException:
+            for task in [producer, *workers]:
+                task.cancel()
+            raise
+
+        report.results = [results[i] for i in sorted(results)]
+        report.elapsed = time.perf_counter() - started
+        self.logger.info("Bulk submission finished", **report.stats())
+        return report
+
+    async def _submit_one(self, index: int, workflow: Dict[str, Any]) -> BulkItemResult:
+        item = BulkItemResult(
+            index=index,
+            workflow_id=workflow.get('id'),
+            idempotency_key=str(uuid.uuid4())
+        )
+        try:
+            item.result = await self._submit(workflow, item.idempotency_key)
+        except Exception as e:
+            item.error = str(e)
+            self.logger.warning("Bulk item failed", index=index, workflow_id=item.workflow_id, error=item.error)
+        return item
+
+    @staticmethod
+    async def _iterate(workflows: WorkflowSource):
+        if hasattr(workflows, '__aiter__'):
+            async for workflow in workflows:
+                yield workflow
+        else:
+            for workflow in workflows:
+                yield workflow
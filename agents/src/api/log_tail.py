@@ -0,0 +1,77 @@
+"""
+Execution Log Tailing
+
+Cursor bookkeeping for incremental reads of ``/api/executions/:id/logs``.
+"""
+
+import base64
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+
+@dataclass
+class LogCursor:
+    """
+    Position in an execution's log.
+
+    The backend groups log lines per node, so the cursor tracks how many
+    lines of each node have already been delivered, plus the ETag of the
+    last response so unchanged logs can be revalidated with a 304.
+    """
+    offsets: Dict[str, int] = field(default_factory=dict)
+    etag: Optional[str] = None
+
+    def encode(self) -> str:
+        """Serialize the cursor into an opaque URL-safe token"""
+        raw = json.dumps({'o': self.offsets, 'e': self.etag}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    @classmethod
+    def decode(cls, token: Optional[str]) -> "LogCursor":
+        """Parse a token produced by :meth:`encode` (empty or None starts from the beginning)"""
+        if not token:
+            return cls()
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            offsets = {str(k): int(v) for k, v in (data.get('o') or {}).items()}
+            return cls(offsets=offsets, etag=data.get('e'))
+        except (ValueError, TypeError, AttributeError) as e:
+            raise ValueError(f"Invalid log cursor: {token}") from e
+
+
+def diff_log_entries(payload: Dict[str, Any], cursor: LogCursor) -> Tuple[List[Dict[str, Any]], LogCursor]:
+    """
+    Return the log lines not yet covered by *cursor*
+
+    Args:
+        payload: Response body of ``/api/executions/:id/logs``
+        cursor: Cursor from the previous read
+
+    Returns:
+        Tuple of (new lines, advanced cursor)
+    """
+    offsets = dict(cursor.offsets)
+    new_lines: List[Dict[str, Any]] = []
+
+    for entry in payload.get('logs') or []:
+        if not isinstance(entry, dict):
+            # Error placeholders are plain strings without a node
+            continue
+        node_id = str(entry.get('nodeId', ''))
+        lines = entry.get('logs') or []
+        seen = offsets.get(node_id, 0)
+        if len(lines) <= seen:
+            continue
+        for message in lines[seen:]:
+            new_lines.append({
+                'nodeId': node_id,
+                'nodeType': entry.get('nodeType'),
+                'status': entry.get('status'),
+                'timestamp': entry.get('timestamp'),
+                'message': message
+            })
+        offsets[node_id] = len(lines)
+
+    return new_lines, LogCursor(offsets=offsets, etag=cursor.etag)
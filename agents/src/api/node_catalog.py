@@ -0,0 +1,276 @@
+"""
+Node Catalog
+
+Cached view of the backend plugin registry (``/api/nodes``, ``/api/config``,
+``/api/plugins/:pluginId``) with TTL and ETag revalidation, plus a local index
+of node config schemas for validating workflows before submission.
+"""
+
+import asyncio
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import httpx
+import structlog
+
+logger = structlog.get_logger()
+
+# Node types the backend registers; used wherever the live catalog is unavailable
+KNOWN_NODE_TYPES = (
+    'walletConnector', 'tokenSelector', 'chainSelector', 'oneInchQuote', 'oneInchSwap',
+    'priceImpactCalculator', 'transactionMonitor', 'transactionStatus', 'fusionPlus',
+    'fusionSwap', 'portfolioAPI', 'limitOrder', 'defiDashboard', 'erc20Token'
+)
+
+
+@dataclass
+class FieldSchema:
+    """Input field definition as published by a backend plugin"""
+    key: str
+    type: str
+    label: str
+    required: bool = False
+    default_value: Any = None
+    validation: List[Dict[str, Any]] = field(default_factory=list)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "FieldSchema":
+        return cls(
+            key=data.get('key', ''),
+            type=data.get('type', 'string'),
+            label=data.get('label') or data.get('key', ''),
+            required=bool(data.get('required', False)),
+            default_value=data.get('defaultValue'),
+            validation=list(data.get('validation') or [])
+        )
+
+
+class NodeCatalogIndex:
+    """
+    Local index of node types and their config schemas.
+
+    Mirrors the backend's plugin input validation so obviously invalid
+    workflows can be rejected without a network round trip.
+    """
+
+    def __init__(self, node_types: List[Dict[str, Any]]):
+        self.schemas: Dict[str, Dict[str, FieldSchema]] = {}
+        for entry in node_types:
+            if isinstance(entry, str):
+                # Fallback catalogs only list type names
+                self.schemas[entry] = {}
+                continue
+            node_type = entry.get('type') or entry.get('id')
+            if not node_type:
+                continue
+            self.schemas[node_type] = {
+                f['key']: FieldSchema.from_dict(f)
+                for f in entry.get('inputs') or []
+                if isinstance(f, dict) and f.get('key')
+            }
+        self._patterns: Dict[str, re.Pattern] = {}
+
+    def __contains__(self, node_type: str) -> bool:
+        return node_type in self.schemas
+
+    def __len__(self) -> int:
+        return len(self.schemas)
+
+    @property
+    def node_types(self) -> List[str]:
+        return list(self.schemas)
+
+    def validate_node(self, node_type: str, config: Dict[str, Any]) -> Tuple[List[str], List[str]]:
+        """
+        Check a node config against the indexed schema
+
+        Args:
+            node_type: The node's type
+            config: The node's ``data.config`` mapping
+
+        Returns:
+            Tuple of (errors, warnings)
+        """
+        schema = self.schemas.get(node_type)
+        if schema is None:
+            return [f"Unsupported node type '{node_type}'"], []
+
+        errors: List[str] = []
+        warnings: List[str] = []
+        for key, spec in schema.items():
+            value = config.get(key)
+            if value is None or value == '':
+                if spec.required and spec.default_value is None:
+                    # Required inputs may still be supplied by upstream node outputs
+                    warnings.append(f"Required field '{spec.label}' is not configured")
+                continue
+
+            if spec.type == 'number' and not self._is_number(value):
+                errors.append(f"Field '{spec.label}' must be a number")
+            elif spec.type == 'boolean' and not isinstance(value, bool):
+                errors.append(f"Field '{spec.label}' must be a boolean")
+            elif spec.type == 'array' and not isinstance(value, list):
+                errors.append(f"Field '{spec.label}' must be an array")
+
+            for rule in spec.validation:
+                message = self._check_rule(spec, rule, value)
+                if message:
+                    errors.append(message)
+
+        return errors, warnings
+
+    @staticmethod
+    def _is_number(value: Any) -> bool:
+        if isinstance(value, bool):
+            return False
+        try:
+            float(value)
+        except (TypeError, ValueError):
+            return False
+        return True
+
+    def _check_rule(self, spec: FieldSchema, rule: Dict[str, Any], value: Any) -> Optional[str]:
+        rule_type = rule.get('type')
+        bound = rule.get('value')
+        if rule_type in ('min', 'max'):
+            if not (self._is_number(value) and self._is_number(bound)):
+                return None
+            if rule_type == 'min' and float(value) < float(bound):
+                return rule.get('message') or f"{spec.label} must be at least {bound}"
+            if rule_type == 'max' and float(value) > float(bound):
+                return rule.get('message') or f"{spec.label} must be at most {bound}"
+        elif rule_type == 'pattern':
+            pattern = self._patterns.get(str(bound))
+            if pattern is None:
+                try:
+                    pattern = self._patterns[str(bound)] = re.compile(str(bound))
+                except re.error:
+                    return None
+            if not pattern.search(str(value)):
+                return rule.get('message') or f"{spec.label} format is invalid"
+        return None
+
+
+@dataclass
+class _CachedResource:
+    payload: Dict[str, Any]
+    fetched_at: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+class NodeCatalog:
+    """
+    TTL cache over the backend's catalog endpoints.
+
+    Fresh entries are served from memory; stale entries are revalidated with
+    ``If-None-Match`` / ``If-Modified-Since`` so unchanged catalogs cost a
+    304 instead of a full payload.
+    """
+
+    def __init__(self, request: Callable[..., Awaitable[httpx.Response]], ttl: float = 300.0):
+        self.ttl = ttl
+        self.logger = logger.bind(component="NodeCatalog")
+        self._request = request
+        self._cache: Dict[str, _CachedResource] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._index: Optional[NodeCatalogIndex] = None
+        # The payload the index was built from; identity tells whether the catalog was refetched
+        self._index_source: Optional[Dict[str, Any]] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._stats = {'hits': 0, 'revalidated': 0, 'fetched': 0}
+
+    async def get_nodes(self, force: bool = False) -> Dict[str, Any]:
+        """Return the ``/api/nodes`` payload"""
+        return await self._get("/api/nodes", "nodes", force)
+
+    async def get_config(self, force: bool = False) -> Dict[str, Any]:
+        """Return the ``/api/config`` payload"""
+        return await self._get("/api/config", "config", force)
+
+    async def get_plugin(self, plugin_id: str, force: bool = False) -> Dict[str, Any]:
+        """Return the ``/api/plugins/:pluginId`` payload"""
+        return await self._get(f"/api/plugins/{plugin_id}", "plugins", force)
+
+    async def get_index(self, force: bool = False) -> NodeCatalogIndex:
+        """Return the node schema index, rebuilding it only when the catalog changed"""
+        payload = await self.get_nodes(force)
+        if self._index is None or self._index_source is not payload:
+            self._index = NodeCatalogIndex(payload.get('nodeTypes', []))
+            self._index_source = payload
+        return self._index
+
+    @property
+    def index(self) -> Optional[NodeCatalogIndex]:
+        """Last built index without touching the network (None if never loaded)"""
+        return self._index
+
+    def current_index(self) -> Optional[NodeCatalogIndex]:
+        """
+        Return the last built index immediately, refreshing it in the background when stale
+
+        Unlike :meth:`get_index` this never waits on the backend, so callers on a
+        latency-sensitive path are unaffected by backend outages.
+        """
+        cached = self._cache.get("/api/nodes")
+        stale = cached is None or time.monotonic() - cached.fetched_at >= self.ttl
+        if stale and (self._refresh_task is None or self._refresh_task.done()):
+            self._refresh_task = asyncio.get_running_loop().create_task(self._refresh_index())
+        return self._index
+
+    async def _refresh_index(self) -> None:
+        try:
+            await self.get_index()
+        except Exception as e:
+            self.logger.warning("Background catalog refresh failed", error=str(e))
+
+    def invalidate(self) -> None:
+        self._cache.clear()
+        self._index = None
+        self._index_source = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            'entries': len(self._cache),
+            'indexed_node_types': len(self._index) if self._index else 0
+        }
+
+    async def _get(self, path: str, endpoint: str, force: bool) -> Dict[str, Any]:
+        cached = self._cache.get(path)
+        if cached and not force and time.monotonic() - cached.fetched_at < self.ttl:
+            self._stats['hits'] += 1
+            return cached.payload
+
+        lock = self._locks.setdefault(path, asyncio.Lock())
+        async with lock:
+            # Another caller may have refreshed the entry while we waited
+            cached = self._cache.get(path)
+            if cached and not force and time.monotonic() - cached.fetched_at < self.ttl:
+                self._stats['hits'] += 1
+                return cached.payload
+
+            headers = {}
+            if cached and cached.etag:
+                headers['If-None-Match'] = cached.etag
+            if cached and cached.last_modified:
+                headers['If-Modified-Since'] = cached.last_modified
+
+            response = await self._request("GET", path, endpoint, headers=headers)
+            if response.status_code == 304 and cached:
+                cached.fetched_at = time.monotonic()
+                self._stats['revalidated'] += 1
+                return cached.payload
+
+            response.raise_for_status()
+            payload = response.json()
+            self._cache[path] = _CachedResource(
+                payload=payload,
+                fetched_at=time.monotonic(),
+                etag=response.headers.get('ETag'),
+                last_modified=response.headers.get('Last-Modified')
+            )
+            self._stats['fetched'] += 1
+            self.logger.debug("Catalog resource refreshed", path=path)
+            return payload
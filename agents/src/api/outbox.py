@@ -0,0 +1,369 @@
+"""
+Approval Outbox
+
+Durable SQLite (WAL) queue of approved workflows. Approvals are recorded
+locally and submitted to the backend in batches by a background worker, so
+approving never depends on the backend being up.
+"""
+
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import httpx
+import structlog
+
+logger = structlog.get_logger()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS approval_outbox (
+    tracking_id TEXT PRIMARY KEY,
+    dedupe_key TEXT NOT NULL UNIQUE,
+    conversation_id TEXT NOT NULL,
+    workflow_id TEXT,
+    workflow TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    execution_id TEXT,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    owner TEXT,
+    lease_expires_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_approval_outbox_due ON approval_outbox (status, next_attempt_at);
+"""
+
+# Added after the first release; outboxes created before then get them on open
+_LEASE_COLUMNS = (("owner", "TEXT"), ("lease_expires_at", "REAL"))
+
+# Failures that happen before any bytes of the request are sent
+_UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    """
+    Failures after which the workflow has certainly not started: the request never
+    reached the backend, or was rejected with 429. A timeout or 5xx may have started
+    it, and the backend does not deduplicate submissions, so those are not retried.
+    """
+    if isinstance(error, _UNSENT_ERRORS):
+        return True
+    return getattr(error, 'status_code', None) == 429
+
+
+@dataclass
+class OutboxEntry:
+    """A single approved workflow tracked by the outbox"""
+    tracking_id: str
+    conversation_id: str
+    workflow_id: Optional[str]
+    status: str  # 'pending' | 'submitting' | 'submitted' | 'failed'
+    attempts: int
+    execution_id: Optional[str] = None
+    last_error: Optional[str] = None
+    created_at: float = 0.0
+    updated_at: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'trackingId': self.tracking_id,
+            'conversationId': self.conversation_id,
+            'workflowId': self.workflow_id,
+            'status': self.status,
+            'attempts': self.attempts,
+            'executionId': self.execution_id,
+            'error': self.last_error,
+            'createdAt': self.created_at,
+            'updatedAt': self.updated_at
+        }
+
+
+class ApprovalOutbox:
+    """
+    Stores approvals durably and drains them to the backend.
+
+    Approvals are deduplicated by conversation and workflow ID, so repeated
+    clicks on approve return the same tracking ID instead of adding load. The
+    tracking ID doubles as the backend idempotency key.
+
+    Several processes may share one outbox file. A worker claims entries
+    under a lease of ``lease_seconds``; entries whose lease expired (their
+    worker died mid-submission) are claimed again by any worker. The lease
+    must outlast a submission, or a slow one is sent a second time.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        submit: Callable[[Dict[str, Any], str], Awaitable[Dict[str, Any]]],
+        batch_size: int = 20,
+        poll_interval: float = 1.0,
+        max_attempts: int = 8,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0,
+        lease_seconds: float = 300.0
+    ):
+        self.path = path
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease_seconds = lease_seconds
+        # Identifies this worker's claims; a restarted process gets a new one
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.logger = logger.bind(component="ApprovalOutbox", path=path)
+        self._submit = submit
+        # Row counts by status, refreshed off the event loop by refresh_counts()
+        self._by_status: Dict[str, int] = {}
+        self._db_lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        columns = {row['name'] for row in self._conn.execute("PRAGMA table_info(approval_outbox)")}
+        for name, kind in _LEASE_COLUMNS:
+            if name not in columns:
+                self._conn.execute(f"ALTER TABLE approval_outbox ADD COLUMN {name} {kind}")
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._waiters: Dict[str, List[asyncio.Future]] = {}
+        self._stats = {'enqueued': 0, 'deduplicated': 0, 'submitted': 0, 'retried': 0, 'failed': 0, 'batches': 0,
+                       'reclaimed': 0, 'lease_lost': 0, 'worker_errors': 0}
+
+    async def start(self) -> None:
+        """Start the background worker; entries left mid-submission are reclaimed once their lease expires"""
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._wakeup.set()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the worker; pending approvals stay on disk for the next start"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def close(self) -> None:
+        with self._db_lock:
+            self._conn.close()
+
+    async def enqueue(self, conversation_id: str, workflow: Dict[str, Any]) -> OutboxEntry:
+        """
+        Record an approved workflow for submission
+
+        Args:
+            conversation_id: Conversation the workflow belongs to
+            workflow: The workflow definition to execute
+
+        Returns:
+            The (possibly pre-existing) outbox entry
+        """
+        entry = await asyncio.to_thread(self._enqueue_sync, conversation_id, workflow)
+        if self._wakeup is not None and entry.status == 'pending':
+            self._wakeup.set()
+        return entry
+
+    async def get(self, tracking_id: str) -> Optional[OutboxEntry]:
+        """Look up an entry by tracking ID"""
+        rows = await asyncio.to_thread(self._query,
+                                       "SELECT * FROM approval_outbox WHERE tracking_id = ?", (tracking_id,))
+        return self._row_to_entry(rows[0]) if rows else None
+
+    async def wait(self, tracking_id: str, timeout: float) -> Optional[OutboxEntry]:
+        """
+        Wait up to *timeout* seconds for an entry to leave the pending state
+
+        Returns:
+            The latest entry (still pending if the timeout elapsed)
+        """
+        # Register before reading so a submission finishing in between is not missed
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(tracking_id, []).append(future)
+        try:
+            entry = await self.get(tracking_id)
+            if entry is None or entry.status in ('submitted', 'failed') or timeout <= 0:
+                return entry
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            waiters = self._waiters.get(tracking_id, [])
+            if future in waiters:
+                waiters.remove(future)
+            if not waiters:
+                self._waiters.pop(tracking_id, None)
+        return await self.get(tracking_id)
+
+    async def refresh_counts(self) -> None:
+        """Recount entries by status for :meth:`stats`, in a thread"""
+        rows = await asyncio.to_thread(self._query,
+                                       "SELECT status, COUNT(*) AS n FROM approval_outbox GROUP BY status")
+        self._by_status = {row['status']: row['n'] for row in rows}
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, 'by_status': dict(self._by_status)}
+
+    async def _run(self) -> None:
+        errors = 0
+        while True:
+            self._wakeup.clear()
+            try:
+                batch = await asyncio.to_thread(self._claim_batch)
+                if batch:
+                    await self._submit_batch(batch)
+            except Exception as e:
+                # e.g. "database is locked" under another process's write; entries claimed
+                # before the error are picked up again once their lease expires
+                errors += 1
+                self._stats['worker_errors'] += 1
+                delay = min(self.poll_interval * (2 ** (errors - 1)), self.backoff_max)
+                self.logger.warning("Outbox worker iteration failed", error=str(e) or type(e).__name__,
+                                    retry_in=delay)
+                await asyncio.sleep(delay)
+                continue
+            errors = 0
+            if batch:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _submit_batch(self, batch: List[sqlite3.Row]) -> None:
+        self._stats['batches'] += 1
+        results = await asyncio.gather(
+            *[self._submit(json.loads(row['workflow']), row['tracking_id']) for row in batch],
+            return_exceptions=True
+        )
+        now = time.time()
+        updates = []
+        for row, result in zip(batch, results):
+            attempts = row['attempts'] + 1
+            if not isinstance(result, BaseException):
+                self._stats['submitted'] += 1
+                updates.append(("submitted", attempts, now, result.get('executionId'), None, now,
+                                row['tracking_id']))
+            elif attempts < self.max_attempts and is_retryable_error(result):
+                self._stats['retried'] += 1
+                ceiling = min(self.backoff_base * (2 ** (attempts - 1)), self.backoff_max)
+                updates.append(("pending", attempts, now + random.uniform(0, ceiling), None, str(result), now,
+                                row['tracking_id']))
+            else:
+                self._stats['failed'] += 1
+                self.logger.warning("Approved workflow could not be submitted",
+                                    tracking_id=row['tracking_id'], attempts=attempts, error=str(result))
+                updates.append(("failed", attempts, now, None, str(result), now, row['tracking_id']))
+
+        applied = await asyncio.to_thread(self._apply_updates, updates)
+        for (status, *_, tracking_id), ok in zip(updates, applied):
+            if not ok:
+                # The lease expired mid-submission and another worker owns the entry now
+                self._stats['lease_lost'] += 1
+                self.logger.warning("Outbox lease expired during submission", tracking_id=tracking_id)
+            elif status in ('submitted', 'failed'):
+                for future in self._waiters.pop(tracking_id, []):
+                    if not future.done():
+                        future.set_result(None)
+
+    def _enqueue_sync(self, conversation_id: str, workflow: Dict[str, Any]) -> OutboxEntry:
+        workflow_id = workflow.get('id')
+        dedupe_key = f"{conversation_id}:{workflow_id or uuid.uuid4()}"
+        now = time.time()
+        with self._db_lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO approval_outbox (tracking_id, dedupe_key, conversation_id, workflow_id, "
+                "workflow, status, attempts, next_attempt_at, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, 'pending', 0, ?, ?, ?)",
+                (str(uuid.uuid4()), dedupe_key, conversation_id, workflow_id, json.dumps(workflow), now, now, now)
+            )
+            if cursor.rowcount:
+                self._stats['enqueued'] += 1
+            else:
+                self._stats['deduplicated'] += 1
+                # A re-approval revives an entry that previously gave up
+                self._conn.execute(
+                    "UPDATE approval_outbox SET status = 'pending', attempts = 0, next_attempt_at = ?, "
+                    "updated_at = ? WHERE dedupe_key = ? AND status = 'failed'",
+                    (now, now, dedupe_key)
+                )
+            row = self._conn.execute("SELECT * FROM approval_outbox WHERE dedupe_key = ?", (dedupe_key,)).fetchone()
+        return self._row_to_entry(row)
+
+    def _claim_batch(self) -> List[sqlite3.Row]:
+        now = time.time()
+        with self._db_lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "SELECT * FROM approval_outbox WHERE (status = 'pending' AND next_attempt_at <= ?) "
+                    "OR (status = 'submitting' AND COALESCE(lease_expires_at, 0) <= ?) "
+                    "ORDER BY next_attempt_at LIMIT ?",
+                    (now, now, self.batch_size)
+                ).fetchall()
+                if rows:
+                    self._conn.executemany(
+                        "UPDATE approval_outbox SET status = 'submitting', owner = ?, lease_expires_at = ?, "
+                        "updated_at = ? WHERE tracking_id = ?",
+                        [(self.owner, now + self.lease_seconds, now, row['tracking_id']) for row in rows]
+                    )
+                    reclaimed = sum(1 for row in rows if row['status'] == 'submitting')
+                    if reclaimed:
+                        self._stats['reclaimed'] += reclaimed
+                        self.logger.warning("Reclaimed outbox entries with expired leases", count=reclaimed)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return rows
+
+    def _apply_updates(self, updates: List[tuple]) -> List[bool]:
+        """Record results for entries this worker still holds; returns whether each one applied"""
+        applied = []
+        with self._db_lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for update in updates:
+                    cursor = self._conn.execute(
+                        "UPDATE approval_outbox SET status = ?, attempts = ?, next_attempt_at = ?, "
+                        "execution_id = ?, last_error = ?, updated_at = ?, owner = NULL, lease_expires_at = NULL "
+                        "WHERE tracking_id = ? AND status = 'submitting' AND owner = ?",
+                        (*update, self.owner)
+                    )
+                    applied.append(cursor.rowcount > 0)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return applied
+
+    def _query(self, sql: str, params: tuple = ()) -> List[sqlite3.Row]:
+        with self._db_lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    @staticmethod
+    def _row_to_entry(row: sqlite3.Row) -> OutboxEntry:
+        return OutboxEntry(
+            tracking_id=row['tracking_id'],
+            conversation_id=row['conversation_id'],
+            workflow_id=row['workflow_id'],
+            status=row['status'],
+            attempts=row['attempts'],
+            execution_id=row['execution_id'],
+            last_error=row['last_error'],
+            created_at=row['created_at'],
+            updated_at=row['updated_at']
+        )
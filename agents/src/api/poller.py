@@ -0,0 +1,280 @@
+"""
+Execution Poller
+
+Shared, rate-limited scheduler that watches many workflow executions at once
+and resolves awaiting callers through futures.
+"""
+
+import asyncio
+import heapq
+import itertools
+import random
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import structlog
+
+logger = structlog.get_logger()
+
+TERMINAL_STATUSES = frozenset({'completed', 'failed', 'cancelled', 'not_found'})
+
+
+def extract_status(payload: Dict[str, Any]) -> Optional[str]:
+    """Read the execution status from either a flat or a nested backend payload"""
+    status = payload.get('status')
+    if status is None and isinstance(payload.get('execution'), dict):
+        status = payload['execution'].get('status')
+    return status
+
+
+@dataclass
+class PollerConfig:
+    """Tuning knobs for the shared execution poller"""
+    initial_interval: float = 0.25  # seconds before the first re-poll
+    max_interval: float = 10.0  # ceiling for the per-execution backoff
+    backoff_factor: float = 1.6
+    jitter: float = 0.2  # +/- fraction applied to every interval
+    max_requests_per_second: float = 20.0  # global cap across all executions
+    max_consecutive_errors: int = 5
+
+
+@dataclass
+class _Watch:
+    """Scheduler bookkeeping for a single watched execution"""
+    execution_id: str
+    interval: float
+    max_interval: float
+    waiters: List[asyncio.Future] = field(default_factory=list)
+    errors: int = 0
+    polls: int = 0
+
+
+class ExecutionPoller:
+    """
+    Multiplexes status polling for every watched execution onto one scheduler task.
+
+    Each execution starts with a short poll interval that grows exponentially
+    (with jitter) until it reaches its ceiling, and all requests share a global
+    requests-per-second budget, so backend load stays bounded no matter how many
+    callers are waiting.
+    """
+
+    def __init__(
+        self,
+        fetch_status: Callable[[str], Awaitable[Dict[str, Any]]],
+        config: Optional[PollerConfig] = None
+    ):
+        self.config = config or PollerConfig()
+        self.logger = logger.bind(component="ExecutionPoller")
+        self._fetch_status = fetch_status
+        self._watches: Dict[str, _Watch] = {}
+        self._schedule: List[tuple] = []  # heap of (due_time, seq, watch)
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._in_flight: set = set()
+        self._next_slot = 0.0
+        self._polls_sent = 0
+        self._poll_errors = 0
+
+    def watch(self, execution_id: str, max_interval: Optional[float] = None) -> asyncio.Future:
+        """
+        Register interest in an execution and return a future for its final status
+
+        Args:
+            execution_id: The execution ID to watch
+            max_interval: Optional per-execution ceiling for the poll interval
+
+        Returns:
+            Future resolved with the terminal status payload
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        watch = self._watches.get(execution_id)
+        if watch is None:
+            ceiling = min(max_interval or self.config.max_interval, self.config.max_interval)
+            watch = _Watch(
+                execution_id=execution_id,
+                interval=min(self.config.initial_interval, ceiling),
+                max_interval=ceiling
+            )
+            self._watches[execution_id] = watch
+            # Poll immediately so fast executions resolve without waiting an interval
+            self._push(watch, loop.time())
+        elif max_interval is not None:
+            watch.max_interval = min(watch.max_interval, max_interval)
+
+        watch.waiters.append(future)
+        self._ensure_running()
+        return future
+
+    async def wait(self, execution_id: str, timeout: Optional[float] = None,
+                   max_interval: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Wait for an execution to reach a terminal status
+
+        Args:
+            execution_id: The execution ID to wait for
+            timeout: Maximum time to wait in seconds
+            max_interval: Optional per-execution ceiling for the poll interval
+
+        Returns:
+            Final execution status
+        """
+        future = self.watch(execution_id, max_interval=max_interval)
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            self.unwatch(execution_id, future)
+            raise
+
+    def unwatch(self, execution_id: str, future: Optional[asyncio.Future] = None) -> None:
+        """Drop a single waiter (or all waiters) for an execution"""
+        watch = self._watches.get(execution_id)
+        if watch is None:
+            return
+        if future is None:
+            waiters, watch.waiters = watch.waiters, []
+        else:
+            waiters = [future] if future in watch.waiters else []
+            watch.waiters = [w for w in watch.waiters if w is not future]
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.cancel()
+        if not watch.waiters:
+            # Its heap entries are skipped lazily by the scheduler, even once the execution is watched again
+            self._watches.pop(execution_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return poller counters"""
+        return {
+            'watched_executions': len(self._watches),
+            'waiters': sum(len(w.waiters) for w in self._watches.values()),
+            'in_flight': len(self._in_flight),
+            'polls_sent': self._polls_sent,
+            'poll_errors': self._poll_errors,
+            'max_requests_per_second': self.config.max_requests_per_second
+        }
+
+    async def close(self) -> None:
+        """Stop the scheduler and cancel every pending waiter"""
+        if self._task:
+            self._task.cancel()
+            if self._task.get_loop() is asyncio.get_running_loop():
+                try:
+                    await self._task
+                except asyncio.CancelledError:
+                    pass
+            self._task = None
+        for task in list(self._in_flight):
+            task.cancel()
+        for execution_id in list(self._watches):
+            self.unwatch(execution_id)
+        self._schedule.clear()
+
+    def _push(self, watch: _Watch, due: float) -> None:
+        heapq.heappush(self._schedule, (due, next(self._seq), watch))
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _ensure_running(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._wakeup = asyncio.Event()
+            self._wakeup.set()
+            self._task = loop.create_task(self._run())
+
+    def _next_interval(self, watch: _Watch) -> float:
+        interval = watch.interval
+        watch.interval = min(watch.interval * self.config.backoff_factor, watch.max_interval)
+        spread = self.config.jitter
+        return max(0.0, interval * random.uniform(1 - spread, 1 + spread))
+
+    async def _run(self) -> None:
+        """Scheduler loop: dispatch due polls within the global rate budget"""
+        loop = asyncio.get_running_loop()
+        min_spacing = 1.0 / self.config.max_requests_per_second
+
+        while True:
+            if not self._schedule:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            due, _, watch = self._schedule[0]
+            now = loop.time()
+            if due > now:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), due - now)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heapq.heappop(self._schedule)
+            if self._watches.get(watch.execution_id) is not watch:
+                continue
+
+            # Global rate cap: space requests evenly regardless of how many are due
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + min_spacing
+            if slot > now:
+                await asyncio.sleep(slot - now)
+
+            task = asyncio.create_task(self._poll(watch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _poll(self, watch: _Watch) -> None:
+        execution_id = watch.execution_id
+        if self._watches.get(execution_id) is not watch:
+            return
+
+        self._polls_sent += 1
+        watch.polls += 1
+        try:
+            status = await self._fetch_status(execution_id)
+        except Exception as e:
+            if self._watches.get(execution_id) is not watch:
+                return
+            self._poll_errors += 1
+            watch.errors += 1
+            self.logger.warning("Execution poll failed",
+                                execution_id=execution_id,
+                                consecutive_errors=watch.errors,
+                                error=str(e))
+            if watch.errors >= self.config.max_consecutive_errors:
+                self._finish(execution_id, error=e)
+            else:
+                self._reschedule(watch)
+            return
+
+        if self._watches.get(execution_id) is not watch:
+            return
+        watch.errors = 0
+        if extract_status(status) in TERMINAL_STATUSES:
+            self._finish(execution_id, result=status)
+        else:
+            self._reschedule(watch)
+
+    def _reschedule(self, watch: _Watch) -> None:
+        if self._watches.get(watch.execution_id) is watch:
+            loop = asyncio.get_running_loop()
+            self._push(watch, loop.time() + self._next_interval(watch))
+
+    def _finish(self, execution_id: str, result: Optional[Dict[str, Any]] = None,
+                error: Optional[BaseException] = None) -> None:
+        watch = self._watches.pop(execution_id, None)
+        if watch is None:
+            return
+        self.logger.info("Execution watch finished",
+                         execution_id=execution_id,
+                         polls=watch.polls,
+                         final_status=extract_status(result) if result else None)
+        for waiter in watch.waiters:
+            if waiter.done():
+                continue
+            if error is not None:
+                waiter.set_exception(error)
+            else:
+                waiter.set_result(result)
@@ -0,0 +1,409 @@
+"""
+Stand-in Backend
+
+In-process Python imitation of the TypeScript DeFi Execution Engine routes
+used by ``DeFiBackendClient``, for load-testing the agent service without the
+real backend or its 1inch dependencies.
+
+Mount it in-process::
+
+    client = DeFiBackendClient(transport=standin_transport(StandInConfig(failure_rate=0.1)))
+
+or run it as a local server on the backend's default port::
+
+    python -m api.standin --port 3001
+"""
+
+import asyncio
+import hashlib
+import json
+import random
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from .node_catalog import KNOWN_NODE_TYPES
+
+@dataclass
+class StandInConfig:
+    """Simulation knobs for the stand-in backend"""
+    latency: Tuple[float, float] = (0.0, 0.0)  # per-request delay range in seconds
+    error_rate: float = 0.0  # probability of a transient 503 on any /api route
+    failure_rate: float = 0.0  # probability that an execution fails at a random step
+    step_duration: Tuple[float, float] = (0.05, 0.2)  # simulated seconds per workflow node
+    log_lines_per_step: int = 3
+    node_types: List[str] = field(default_factory=lambda: list(KNOWN_NODE_TYPES))
+    seed: Optional[int] = None
+    # The real backend ignores Idempotency-Key and starts a new execution for every submission;
+    # set to answer a repeated key with the execution it started
+    dedupe_idempotency_keys: bool = False
+
+
+@dataclass
+class _SimStep:
+    node_id: str
+    node_type: str
+    starts_at: float
+    ends_at: float
+    status: str = 'pending'
+    logs: List[str] = field(default_factory=list)
+
+
+@dataclass
+class _SimExecution:
+    id: str
+    workflow_id: str
+    start_time: float
+    steps: List[_SimStep]
+    fail_at: Optional[int]  # index of the step that fails, if any
+    status: str = 'running'
+    end_time: Optional[float] = None
+    error: Optional[str] = None
+
+
+class StandInBackend:
+    """Simulated execution engine state shared by the stand-in routes"""
+
+    def __init__(self, config: Optional[StandInConfig] = None):
+        self.config = config or StandInConfig()
+        self.random = random.Random(self.config.seed)
+        self.executions: Dict[str, _SimExecution] = {}
+        self.idempotency: Dict[str, str] = {}
+        self.duplicate_submissions = 0  # submissions repeating an Idempotency-Key already seen
+        self.events: List[Dict[str, Any]] = []
+        self.request_counts: Dict[str, int] = {}
+        self.started = time.time()
+        self._new_events: Optional[asyncio.Condition] = None
+
+    def create_execution(self, workflow: Dict[str, Any]) -> _SimExecution:
+        now = time.time()
+        steps = []
+        cursor = now
+        for node in workflow.get('nodes') or []:
+            duration = self.random.uniform(*self.config.step_duration)
+            steps.append(_SimStep(
+                node_id=node.get('id', str(uuid.uuid4())),
+                node_type=node.get('type', 'unknown'),
+                starts_at=cursor,
+                ends_at=cursor + duration
+            ))
+            cursor += duration
+
+        fail_at = None
+        if steps and self.random.random() < self.config.failure_rate:
+            fail_at = self.random.randrange(len(steps))
+
+        execution = _SimExecution(
+            id=str(uuid.uuid4()),
+            workflow_id=workflow.get('id', ''),
+            start_time=now,
+            steps=steps,
+            fail_at=fail_at
+        )
+        self.executions[execution.id] = execution
+        self._emit('execution.started', execution.id, {'workflowId': execution.workflow_id})
+        self.advance(execution, now)
+        return execution
+
+    def advance(self, execution: _SimExecution, now: Optional[float] = None) -> None:
+        """Move an execution forward to *now*, emitting events for each transition"""
+        if execution.status != 'running':
+            return
+        now = now or time.time()
+
+        for index, step in enumerate(execution.steps):
+            if step.status == 'pending' and now >= step.starts_at:
+                step.status = 'running'
+                self._emit('node.started', execution.id, {'nodeId': step.node_id, 'nodeType': step.node_type})
+            if step.status == 'running' and now >= step.ends_at:
+                if index == execution.fail_at:
+                    step.status = 'failed'
+                    step.logs = [f"{step.node_type}: simulated failure"]
+                    self._emit('node.failed', execution.id, {'nodeId': step.node_id, 'error': 'simulated failure'})
+                    self._finish(execution, 'failed', step.ends_at, f"Node {step.node_id} failed (simulated)")
+                    return
+                step.status = 'completed'
+                step.logs = [f"{step.node_type}: line {i + 1}" for i in range(self.config.log_lines_per_step)]
+                self._emit('node.completed', execution.id, {'nodeId': step.node_id, 'nodeType': step.node_type})
+            if step.status != 'completed':
+                return
+
+        self._finish(execution, 'completed', execution.steps[-1].ends_at if execution.steps else now)
+
+    def advance_all(self) -> None:
+        now = time.time()
+        for execution in list(self.executions.values()):
+            self.advance(execution, now)
+
+    def cancel(self, execution: _SimExecution) -> bool:
+        self.advance(execution)
+        if execution.status != 'running':
+            return False
+        for step in execution.steps:
+            if step.status in ('pending', 'running'):
+                step.status = 'skipped'
+        self._finish(execution, 'cancelled', time.time(), 'Cancelled by user')
+        return True
+
+    def status_payload(self, execution: _SimExecution) -> Dict[str, Any]:
+        completed = sum(1 for s in execution.steps if s.status == 'completed')
+        failed = sum(1 for s in execution.steps if s.status == 'failed')
+        end = execution.end_time or time.time()
+        return {
+            'execution': {
+                'id': execution.id,
+                'workflowId': execution.workflow_id,
+                'status': execution.status,
+                'startTime': int(execution.start_time * 1000),
+                'endTime': int(execution.end_time * 1000) if execution.end_time else None,
+                'error': execution.error
+            },
+            'stats': {
+                'executionId': execution.id,
+                'workflowId': execution.workflow_id,
+                'status': execution.status,
+                'duration': int((end - execution.start_time) * 1000),
+                'totalSteps': len(execution.steps),
+                'completedSteps': completed,
+                'failedSteps': failed,
+                'totalGasUsed': '0',
+                'error': execution.error
+            }
+        }
+
+    def logs_payload(self, execution: _SimExecution) -> Dict[str, Any]:
+        return {'logs': [
+            {
+                'nodeId': step.node_id,
+                'nodeType': step.node_type,
+                'logs': step.logs,
+                'timestamp': int(step.starts_at * 1000),
+                'status': step.status
+            }
+            for step in execution.steps if step.logs
+        ]}
+
+    def nodes_payload(self) -> Dict[str, Any]:
+        node_types = [
+            {
+                'type': node_type,
+                'name': node_type,
+                'description': f"Stand-in plugin for {node_type}",
+                'category': 'defi',
+                'version': '1.0.0',
+                'inputs': [],
+                'outputs': [],
+                'executor': {'type': 'generic', 'timeout': 30000, 'retries': 0}
+            }
+            for node_type in self.config.node_types
+        ]
+        return {'nodeTypes': node_types, 'totalPlugins': len(node_types)}
+
+    async def wait_for_events(self, after: int, timeout: float) -> None:
+        if self._new_events is None:
+            self._new_events = asyncio.Condition()
+        async with self._new_events:
+            try:
+                await asyncio.wait_for(self._new_events.wait_for(lambda: len(self.events) > after), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _finish(self, execution: _SimExecution, status: str, at: float, error: Optional[str] = None) -> None:
+        execution.status = status
+        execution.end_time = at
+        execution.error = error
+        event_type = {'completed': 'execution.completed', 'cancelled': 'execution.cancelled'}.get(
+            status, 'execution.failed')
+        self._emit(event_type, execution.id, {'status': status, 'error': error})
+
+    def _emit(self, event_type: str, execution_id: str, data: Dict[str, Any]) -> None:
+        self.events.append({
+            'type': event_type,
+            'executionId': execution_id,
+            'timestamp': int(time.time() * 1000),
+            'data': data
+        })
+        if self._new_events is not None:
+            asyncio.get_running_loop().create_task(self._notify())
+
+    async def _notify(self) -> None:
+        async with self._new_events:
+            self._new_events.notify_all()
+
+
+def _etag_response(request: Request, payload: Dict[str, Any]) -> Response:
+    """JSON response with a weak ETag, answering If-None-Match with 304 like Express"""
+    body = json.dumps(payload, separators=(',', ':')).encode()
+    etag = 'W/"' + hashlib.sha1(body).hexdigest() + '"'
+    if request.headers.get('if-none-match') == etag:
+        return Response(status_code=304, headers={'ETag': etag})
+    return Response(content=body, media_type='application/json', headers={'ETag': etag})
+
+
+def create_standin_app(config: Optional[StandInConfig] = None) -> FastAPI:
+    """
+    Build the stand-in backend application
+
+    Args:
+        config: Simulation settings (latency, failure rates, step timings)
+
+    Returns:
+        FastAPI app exposing the backend routes used by the agent service
+    """
+    backend = StandInBackend(config)
+    app = FastAPI(title="DeFi Execution Engine (stand-in)")
+    app.state.backend = backend
+
+    @app.middleware("http")
+    async def simulate_network(request: Request, call_next):
+        route = request.url.path
+        backend.request_counts[route] = backend.request_counts.get(route, 0) + 1
+        low, high = backend.config.latency
+        if high > 0:
+            await asyncio.sleep(backend.random.uniform(low, high))
+        if route.startswith('/api/') and backend.random.random() < backend.config.error_rate:
+            return JSONResponse({'error': 'Simulated transient failure'}, status_code=503)
+        backend.advance_all()
+        return await call_next(request)
+
+    @app.get('/api/health')
+    async def health():
+        return {
+            'status': 'healthy',
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'version': '1.0.0',
+            'uptime': time.time() - backend.started,
+            'environment': 'standin',
+            'oneInchApiKey': 'missing'
+        }
+
+    @app.get('/api/config')
+    async def engine_config(request: Request):
+        return _etag_response(request, {
+            'supportedChains': ['1', '137'],
+            'maxConcurrentWorkflows': 50,
+            'nodeTimeoutMs': 60000
+        })
+
+    @app.post('/api/workflows/execute')
+    async def execute(request: Request):
+        body = await request.json()
+        workflow = body.get('workflow')
+        if not workflow or not workflow.get('id'):
+            return JSONResponse({'error': 'Invalid workflow definition'}, status_code=400)
+
+        key = request.headers.get('idempotency-key')
+        if key and key in backend.idempotency:
+            backend.duplicate_submissions += 1
+        if key and key in backend.idempotency and backend.config.dedupe_idempotency_keys:
+            execution = backend.executions[backend.idempotency[key]]
+        else:
+            execution = backend.create_execution(workflow)
+            if key:
+                backend.idempotency.setdefault(key, execution.id)
+
+        return {
+            'executionId': execution.id,
+            'status': execution.status,
+            'startTime': int(execution.start_time * 1000)
+        }
+
+    @app.get('/api/executions/{execution_id}')
+    async def execution_status(execution_id: str):
+        execution = backend.executions.get(execution_id)
+        if execution is None:
+            return JSONResponse({'error': 'Execution not found'}, status_code=404)
+        return backend.status_payload(execution)
+
+    @app.get('/api/executions/{execution_id}/logs')
+    async def execution_logs(execution_id: str, request: Request):
+        execution = backend.executions.get(execution_id)
+        if execution is None:
+            return JSONResponse({'error': 'Execution not found'}, status_code=404)
+        return _etag_response(request, backend.logs_payload(execution))
+
+    @app.post('/api/executions/{execution_id}/cancel')
+    async def cancel(execution_id: str):
+        execution = backend.executions.get(execution_id)
+        return {'cancelled': bool(execution and backend.cancel(execution))}
+
+    @app.get('/api/nodes')
+    async def nodes(request: Request):
+        return _etag_response(request, backend.nodes_payload())
+
+    @app.get('/api/plugins/{plugin_id}')
+    async def plugin(plugin_id: str):
+        for entry in backend.nodes_payload()['nodeTypes']:
+            if entry['type'] == plugin_id:
+                return {'plugin': {**entry, 'id': plugin_id}}
+        return JSONResponse({'error': 'Plugin not found'}, status_code=404)
+
+    @app.get('/api/events')
+    async def events(request: Request, after: int = 0, tick: float = 0.05):
+        """Server-sent ``execution-event`` stream (stands in for the Socket.IO broadcast)"""
+        async def stream():
+            position = after
+            while not await request.is_disconnected():
+                backend.advance_all()
+                while position < len(backend.events):
+                    event = backend.events[position]
+                    position += 1
+                    yield f"id: {position}\nevent: execution-event\ndata: {json.dumps(event)}\n\n"
+                await backend.wait_for_events(position, tick)
+
+        return StreamingResponse(stream(), media_type='text/event-stream')
+
+    @app.get('/_standin/stats')
+    async def standin_stats():
+        statuses: Dict[str, int] = {}
+        for execution in backend.executions.values():
+            statuses[execution.status] = statuses.get(execution.status, 0) + 1
+        return {
+            'requests': dict(backend.request_counts),
+            'executions': statuses,
+            'duplicate_submissions': backend.duplicate_submissions,
+            'events': len(backend.events)
+        }
+
+    return app
+
+
+def standin_transport(config: Optional[StandInConfig] = None,
+                      app: Optional[FastAPI] = None) -> httpx.ASGITransport:
+    """Return an httpx transport that routes requests into an in-process stand-in"""
+    return httpx.ASGITransport(app=app or create_standin_app(config))
+
+
+if __name__ == "__main__":
+    import argparse
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run the stand-in DeFi backend")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3001)
+    parser.add_argument("--latency", type=float, nargs=2, default=(0.0, 0.0), metavar=("MIN", "MAX"))
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--step-duration", type=float, nargs=2, default=(0.05, 0.2), metavar=("MIN", "MAX"))
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--dedupe-idempotency-keys", action="store_true",
+                        help="Answer a repeated Idempotency-Key with its first execution")
+    args = parser.parse_args()
+
+    uvicorn.run(
+        create_standin_app(StandInConfig(
+            latency=tuple(args.latency),
+            error_rate=args.error_rate,
+            failure_rate=args.failure_rate,
+            step_duration=tuple(args.step_duration),
+            seed=args.seed,
+            dedupe_idempotency_keys=args.dedupe_idempotency_keys
+        )),
+        host=args.host,
+        port=args.port
+    )
@@ -0,0 +1,127 @@
+"""
+Execution Status Cache
+
+Short-TTL, single-flight cache in front of the backend's execution status
+endpoint so many concurrent watchers cost one backend request.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional
+import structlog
+
+from .poller import TERMINAL_STATUSES, extract_status
+
+logger = structlog.get_logger()
+
+
+@dataclass
+class _StatusEntry:
+    payload: Dict[str, Any]
+    expires_at: Optional[float]  # None means the entry never expires
+
+
+class ExecutionStatusCache:
+    """
+    Caches execution status payloads per execution ID.
+
+    Running executions are cached for ``running_ttl`` seconds; terminal states
+    (completed, failed, cancelled) are immutable and cached until evicted by
+    the LRU capacity bound. Concurrent lookups for the same execution share a
+    single in-flight backend request.
+    """
+
+    def __init__(
+        self,
+        fetch_status: Callable[[str], Awaitable[Dict[str, Any]]],
+        running_ttl: float = 1.0,
+        not_found_ttl: float = 1.0,
+        max_entries: int = 10000
+    ):
+        self.running_ttl = running_ttl
+        self.not_found_ttl = not_found_ttl
+        self.max_entries = max_entries
+        self.logger = logger.bind(component="ExecutionStatusCache")
+        self._fetch_status = fetch_status
+        self._entries: "OrderedDict[str, _StatusEntry]" = OrderedDict()
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'evictions': 0}
+
+    async def get(self, execution_id: str) -> Dict[str, Any]:
+        """
+        Get the status of an execution, from cache when fresh
+
+        Args:
+            execution_id: The execution ID to look up
+
+        Returns:
+            Execution status payload as returned by the backend
+        """
+        entry = self._entries.get(execution_id)
+        if entry is not None and (entry.expires_at is None or entry.expires_at > time.monotonic()):
+            self._entries.move_to_end(execution_id)
+            self._stats['hits'] += 1
+            return entry.payload
+
+        pending = self._in_flight.get(execution_id)
+        if pending is not None:
+            self._stats['coalesced'] += 1
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                # The leading request was cancelled, not us: look the status up again
+                if pending.cancelled() and not asyncio.current_task().cancelling():
+                    return await self.get(execution_id)
+                raise
+
+        self._stats['misses'] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[execution_id] = future
+        try:
+            payload = await self._fetch_status(execution_id)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so an error with no coalesced waiters is not reported as unhandled
+            future.exception()
+            raise
+        else:
+            self._store(execution_id, payload)
+            future.set_result(payload)
+            return payload
+        finally:
+            self._in_flight.pop(execution_id, None)
+
+    def invalidate(self, execution_id: str) -> None:
+        """Drop a cached status, e.g. after cancelling the execution"""
+        self._entries.pop(execution_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return cache counters including the hit ratio"""
+        lookups = self._stats['hits'] + self._stats['misses'] + self._stats['coalesced']
+        served_locally = self._stats['hits'] + self._stats['coalesced']
+        return {
+            **self._stats,
+            'entries': len(self._entries),
+            'in_flight': len(self._in_flight),
+            'hit_ratio': round(served_locally / lookups, 4) if lookups else 0.0
+        }
+
+    def _store(self, execution_id: str, payload: Dict[str, Any]) -> None:
+        status = extract_status(payload)
+        if status == 'not_found':
+            expires_at = time.monotonic() + self.not_found_ttl
+        elif status in TERMINAL_STATUSES:
+            expires_at = None
+        else:
+            expires_at = time.monotonic() + self.running_ttl
+
+        self._entries[execution_id] = _StatusEntry(payload=payload, expires_at=expires_at)
+        self._entries.move_to_end(execution_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats['evictions'] += 1
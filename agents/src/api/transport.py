@@ -0,0 +1,231 @@
+"""
+Backend Transport
+
+Connection-pooled HTTP transport for the backend client with per-endpoint
+timeouts, bounded retries and connection reuse accounting.
+"""
+
+import asyncio
+import os
+import random
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+import httpx
+import structlog
+
+logger = structlog.get_logger()
+
+# Transient statuses that are safe to retry for idempotent requests
+RETRYABLE_STATUS_CODES = frozenset({429, 502, 503, 504})
+
+# Failures that happen before any bytes of the request are sent; safe to retry for any request
+UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+@dataclass
+class RetryPolicy:
+    """Bounded retry policy with jittered exponential backoff"""
+    max_retries: int = 3
+    backoff_base: float = 0.2  # seconds before the first retry
+    backoff_max: float = 5.0
+    retry_statuses: frozenset = RETRYABLE_STATUS_CODES
+
+    def delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Return the sleep before retry number *attempt* (starting at 1)"""
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        ceiling = min(self.backoff_base * (2 ** (attempt - 1)), self.backoff_max)
+        # Full jitter keeps retrying clients from synchronising
+        return random.uniform(0, ceiling)
+
+
+@dataclass
+class TransportConfig:
+    """Connection pool, protocol and timeout settings for the backend transport"""
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    http2: bool = False
+    connect_timeout: float = 5.0
+    default_timeout: float = 30.0
+    endpoint_timeouts: Dict[str, float] = field(default_factory=lambda: {
+        'health': 5.0,
+        'execute': 60.0,
+        'status': 10.0,
+        'logs': 15.0,
+        'cancel': 10.0,
+        'nodes': 10.0,
+        'config': 10.0,
+        'plugins': 10.0,
+    })
+    retry: RetryPolicy = field(default_factory=RetryPolicy)
+
+    @classmethod
+    def from_env(cls) -> "TransportConfig":
+        """Build a config from BACKEND_* environment variables"""
+        config = cls()
+        config.max_connections = int(os.getenv("BACKEND_MAX_CONNECTIONS", config.max_connections))
+        config.max_keepalive_connections = int(
+            os.getenv("BACKEND_MAX_KEEPALIVE", config.max_keepalive_connections)
+        )
+        config.keepalive_expiry = float(os.getenv("BACKEND_KEEPALIVE_EXPIRY", config.keepalive_expiry))
+        config.http2 = os.getenv("BACKEND_HTTP2", "false").lower() in ("1", "true", "yes")
+        config.default_timeout = float(os.getenv("BACKEND_TIMEOUT", config.default_timeout))
+        config.retry.max_retries = int(os.getenv("BACKEND_MAX_RETRIES", config.retry.max_retries))
+        return config
+
+
+class BackendTransport:
+    """
+    Owns the pooled ``httpx.AsyncClient`` used to talk to the backend.
+
+    Idempotent requests are retried on request errors and transient HTTP
+    statuses. Non-idempotent ones, even with an idempotency key, are retried
+    only on ``UNSENT_ERRORS``, when the connection failed before anything
+    was sent.
+    """
+
+    def __init__(self, base_url: str, config: Optional[TransportConfig] = None,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.base_url = base_url.rstrip('/')
+        self.config = config or TransportConfig()
+        self.logger = logger.bind(component="BackendTransport", base_url=self.base_url)
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._stats = {
+            'requests': 0,
+            'responses': 0,
+            'connections_opened': 0,
+            'retries': 0,
+            'retry_exhausted': 0,
+            'errors': 0,
+        }
+
+    async def start(self) -> httpx.AsyncClient:
+        """Create the pooled client if it does not exist yet"""
+        if self._client is None:
+            http2 = self.config.http2
+            if http2 and not _http2_available():
+                self.logger.warning("HTTP/2 requested but 'h2' is not installed, using HTTP/1.1")
+                http2 = False
+
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                http2=http2,
+                transport=self._transport,
+                limits=httpx.Limits(
+                    max_connections=self.config.max_connections,
+                    max_keepalive_connections=self.config.max_keepalive_connections,
+                    keepalive_expiry=self.config.keepalive_expiry
+                ),
+                timeout=httpx.Timeout(self.config.default_timeout, connect=self.config.connect_timeout),
+                headers={
+                    "Content-Type": "application/json",
+                    "User-Agent": "DeFi-Agent-System/0.1.0"
+                }
+            )
+        return self._client
+
+    async def close(self) -> None:
+        """Close all pooled connections"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @property
+    def is_open(self) -> bool:
+        return self._client is not None
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        endpoint: str,
+        idempotent: Optional[bool] = None,
+        retries: Optional[int] = None,
+        **kwargs: Any
+    ) -> httpx.Response:
+        """
+        Send a request with endpoint-specific timeout and retry handling
+
+        Args:
+            method: HTTP method
+            path: Path relative to the backend base URL
+            endpoint: Logical endpoint name used for timeouts and logging
+            idempotent: Whether the call may be retried after it may have reached the
+                backend; defaults to True for GET/HEAD only. Other requests are retried
+                only when the connection could not be established
+            retries: Overrides the policy's ``max_retries``; 0 for callers that retry themselves
+            **kwargs: Extra arguments forwarded to ``httpx.AsyncClient.request``
+
+        Returns:
+            The final response (callers decide whether to raise on its status)
+        """
+        client = await self.start()
+        if idempotent is None:
+            idempotent = method.upper() in ('GET', 'HEAD')
+        timeout = self.config.endpoint_timeouts.get(endpoint, self.config.default_timeout)
+        kwargs.setdefault('timeout', httpx.Timeout(timeout, connect=self.config.connect_timeout))
+        extensions = dict(kwargs.pop('extensions', None) or {})
+        extensions['trace'] = self._trace
+
+        policy = self.config.retry
+        max_attempts = 1 + (policy.max_retries if retries is None else retries)
+        attempt = 0
+        while True:
+            attempt += 1
+            self._stats['requests'] += 1
+            try:
+                response = await client.request(method, path, extensions=extensions, **kwargs)
+            except httpx.RequestError as e:
+                if attempt >= max_attempts or not (idempotent or isinstance(e, UNSENT_ERRORS)):
+                    self._stats['errors'] += 1
+                    if attempt >= max_attempts > 1:
+                        self._stats['retry_exhausted'] += 1
+                    raise
+                delay = policy.delay(attempt)
+                self.logger.warning("Backend request failed, retrying",
+                                    endpoint=endpoint, attempt=attempt, delay=round(delay, 3),
+                                    error=str(e))
+            else:
+                self._stats['responses'] += 1
+                if not idempotent or response.status_code not in policy.retry_statuses \
+                        or attempt >= max_attempts:
+                    if idempotent and response.status_code in policy.retry_statuses and max_attempts > 1:
+                        self._stats['retry_exhausted'] += 1
+                    return response
+                delay = policy.delay(attempt, response.headers.get('Retry-After'))
+                self.logger.warning("Backend returned transient status, retrying",
+                                    endpoint=endpoint, attempt=attempt,
+                                    status_code=response.status_code, delay=round(delay, 3))
+                await response.aclose()
+
+            self._stats['retries'] += 1
+            await asyncio.sleep(delay)
+
+    async def _trace(self, event_name: str, info: Dict[str, Any]) -> None:
+        # httpcore emits connect_tcp only when a new connection is established
+        if event_name == "connection.connect_tcp.complete":
+            self._stats['connections_opened'] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return connection reuse and retry counters"""
+        stats = dict(self._stats)
+        responses = stats['responses']
+        reused = max(responses - stats['connections_opened'], 0)
+        stats['connections_reused'] = reused
+        stats['connection_reuse_ratio'] = round(reused / responses, 4) if responses else 0.0
+        stats['http2'] = self.config.http2
+        stats['max_connections'] = self.config.max_connections
+        return stats
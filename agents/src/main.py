@@ -1,25 +1,66 @@
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
+from contextlib import asynccontextmanager
 import asyncio
+import json
+import hmac
+import math
 import sys
 import os
-from typing import Dict, Any, List, Optional
+import time
+from typing import Dict, Any, List, Mapping, Optional, Tuple
 import uuid
+import httpx
+import structlog
 
 # Add src to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from agents.architecture_mapper import ArchitectureMapperAgent
+from agents.entities import default_index
+from agents.routing import RoutingConfig
 import os
 from api.backend_client import DeFiBackendClient
+from api.log_tail import LogCursor
+from api.outbox import ApprovalOutbox
+from api.poller import extract_status
+from api.status_cache import ExecutionStatusCache
+from api.transport import TransportConfig
+from service.encoding import CompressionMiddleware, conditional_json
+from service.fairshare import BULK, DEFAULT_TENANT, INTERACTIVE, FairScheduler, FairShareConfig
+from service.jobs import JobQueue, JobQueueConfig, QueueFullError
+from service.logs import LogConfig, LogPipeline
+from service.metrics import REGISTRY, stage
+from service.profiler import ProfilerBusyError, SamplingProfiler, format_collapsed
+from service.tracing import TRACER, parse_traceparent, traced
+from service.warmup import Warmup
+from store.conversations import ConversationStore, SQLiteConversationTier
+from store.history import ConversationHistory, JSONLHistoryArchive
+from store.locks import KeyedLockManager
+from store.shared import SharedConversationStore, SQLiteKV
 from workflow.generator import WorkflowGenerator
 
+logger = structlog.get_logger()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Build the application state on startup and release it on shutdown"""
+    global state
+    state = AppState()
+    await state.initialize()
+    try:
+        yield
+    finally:
+        await state.shutdown()
+
 app = FastAPI(
     title="DeFi Agent API",
     description="An API for converting natural language requests into DeFi workflows and executing them.",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Add CORS middleware for frontend integration
@@ -29,8 +70,26 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID", "traceparent", "ETag"],
 )
 
+# Workflow and execution payloads are large and repetitive; compress them for slow links
+app.add_middleware(CompressionMiddleware)
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Open a root span per request and tag logs and backend calls with its request ID"""
+    request_id = request.headers.get("x-request-id") or uuid.uuid4().hex
+    trace_id, parent_id = parse_traceparent(request.headers.get("traceparent"))
+    with structlog.contextvars.bound_contextvars(request_id=request_id):
+        with TRACER.span(f"{request.method} {request.url.path}", request_id=request_id,
+                         trace_id=trace_id, parent_id=parent_id) as span:
+            response = await call_next(request)
+            span.attributes["status_code"] = response.status_code
+    response.headers["X-Request-ID"] = request_id
+    response.headers["traceparent"] = span.traceparent
+    return response
+
 class UserRequest(BaseModel):
     request: str
     conversation_id: Optional[str] = None
@@ -46,27 +105,132 @@ class ConversationResponse(BaseModel):
     suggestions: Optional[List[str]] = None
 
 class AppState:
-    def __init__(self):
+    def __init__(self, backend_transport: Optional[httpx.AsyncBaseTransport] = None):
+        # Installed first: components bind their loggers to the structlog configuration of the moment
+        self.log_pipeline = LogPipeline(LogConfig.from_env())
+        self.log_pipeline.install()
         # Initialize agent with environment variables
         provider = os.getenv("AI_PROVIDER", "openai")
         model_id = os.getenv("AI_MODEL", "gpt-4o-mini")
 
         self.architecture_agent = ArchitectureMapperAgent(
             provider=provider,
-            model_id=model_id
+            model_id=model_id,
+            routing=RoutingConfig.from_env(),
+            # Suggested nodes are checked against the backend's catalog once it is cached
+            node_index=lambda: self.backend_client.node_catalog.current_index()
+        )
+        self.backend_client = DeFiBackendClient(
+            base_url=os.getenv("BACKEND_URL", "http://localhost:3001"),
+            transport_config=TransportConfig.from_env(),
+            # An in-process backend (e.g. the stand-in) for tests and load tests
+            transport=backend_transport
         )
-        self.backend_client = DeFiBackendClient()
         self.workflow_generator = WorkflowGenerator()
-        # Store conversation contexts
-        self.conversations: Dict[str, Dict[str, Any]] = {}
+        # Coalesces status polls from many watchers into one backend request
+        self.status_cache = ExecutionStatusCache(
+            self.backend_client.get_execution_status,
+            running_ttl=float(os.getenv("STATUS_CACHE_RUNNING_TTL", "1.0"))
+        )
+        # Durable queue of approved workflows awaiting backend submission
+        self.outbox = ApprovalOutbox(
+            os.getenv("OUTBOX_PATH", "approval_outbox.sqlite3"),
+            # The outbox is the only retry layer for approvals
+            lambda workflow, key: self.backend_client.execute_workflow(workflow, idempotency_key=key, retries=0),
+            lease_seconds=float(os.getenv("OUTBOX_LEASE_SECONDS", "300"))
+        )
+        self.approval_wait = float(os.getenv("OUTBOX_APPROVE_WAIT", "0.5"))
+        # Contexts keep the latest messages; older ones move to an append-only archive
+        archive_dir = os.getenv("CONVERSATION_HISTORY_DIR", "conversation_history")
+        retention = float(os.getenv("CONVERSATION_HISTORY_RETENTION", str(30 * 24 * 3600)))
+        self.history = ConversationHistory(
+            JSONLHistoryArchive(archive_dir) if archive_dir else None,
+            window=int(os.getenv("CONVERSATION_HISTORY_WINDOW", "20")),
+            retention=retention or None
+        )
+        # Store conversation contexts. With a shared store every worker process
+        # sees the same conversations; otherwise idle ones spill to a local file.
+        shared_path = os.getenv("CONVERSATION_SHARED_PATH")
+        store_path = os.getenv("CONVERSATION_STORE_PATH", "conversations.sqlite3")
+        if shared_path:
+            self.conversations = SharedConversationStore(SQLiteKV(shared_path))
+        else:
+            self.conversations = ConversationStore(
+                max_entries=int(os.getenv("CONVERSATION_MAX_ENTRIES", "1000")),
+                max_bytes=int(os.getenv("CONVERSATION_MAX_BYTES", str(64 * 1024 * 1024))),
+                idle_ttl=float(os.getenv("CONVERSATION_IDLE_TTL", "3600")),
+                tier=SQLiteConversationTier(store_path) if store_path else None,
+                # Conversations dropped from memory without a tier take their archives with them
+                on_drop=self.history.delete
+            )
+        # Serializes requests within a conversation; different conversations run in parallel
+        self.conversation_locks = KeyedLockManager()
+        # Bounded pool that runs analysis and generation for /process
+        self.jobs = JobQueue(lambda payload: run_turn(*payload), JobQueueConfig.from_env(),
+                             scheduler=FairScheduler(FairShareConfig.from_env()))
+        # Fair-share accounts: "key:tenant" pairs, else a tenant header set by a trusted proxy
+        # (only when TENANT_HEADER names one), else one shared account
+        self.tenant_keys = dict(
+            pair.split(":", 1) for pair in os.getenv("TENANT_API_KEYS", "").split(",") if ":" in pair
+        )
+        self.tenant_header = os.getenv("TENANT_HEADER", "")
+        self.process_wait = float(os.getenv("PROCESS_WAIT", "30"))
+        self.ws_max_in_flight = int(os.getenv("WS_MAX_IN_FLIGHT", "8"))
+        # Startup work that runs in the background; /ready reports when it is done
+        self.warmup = Warmup.from_env()
+        # Token and chain lists are parsed in a thread; the first request would otherwise pay for it
+        self.warmup.add("entities", self._warm_entities)
+        # Without the LLM every analysis uses the rule-based fallback, so keep retrying it
+        self.warmup.add("llm", self._warm_llm, retry=True)
+        self.warmup.add("backend", self._warm_backend)
+        self.warmup.add("workflow_generator", self._warm_generator)
+        self._warmup_task: Optional[asyncio.Task] = None
 
     async def initialize(self):
-        await self.architecture_agent.initialize()
+        self.log_pipeline.start()
+        await self.backend_client.start()
+        await self.outbox.start()
+        await self.jobs.start()
+        # Until the LLM stack has loaded, requests are analyzed by the rule-based fallback
+        self._warmup_task = asyncio.create_task(self.warmup.run())
+
+    async def _warm_entities(self):
+        index = await asyncio.to_thread(default_index)
+        if index.load_error:
+            # Requests are served from the bundled lists; report the configured ones as failed
+            raise RuntimeError(index.load_error)
+
+    async def _warm_llm(self):
+        # A retry after a failed warm_up() reuses the agent that already loaded
+        if not self.architecture_agent.ready:
+            await self.architecture_agent.initialize()
+        await self.architecture_agent.warm_up()
+
+    async def _warm_backend(self):
+        # Opens pooled connections and primes the node catalog cache
+        await self.backend_client.health_check()
+        await self.backend_client.get_node_index()
+        await self.backend_client.get_config()
+
+    async def _warm_generator(self):
         try:
-            await self.backend_client.health_check()
+            node_index = await self.backend_client.get_node_index()
         except Exception as e:
-            print(f"Warning: Backend health check failed: {e}")
-            print("Continuing without backend connection...")
+            # The generator paths don't need the backend; warm them with structural validation only
+            logger.warning("Node catalog unavailable, warming the generator without it", error=str(e))
+            node_index = None
+        await self.workflow_generator.warm_up(node_index)
+
+    async def shutdown(self):
+        if self._warmup_task is not None:
+            self._warmup_task.cancel()
+            await asyncio.gather(self._warmup_task, return_exceptions=True)
+        await self.jobs.stop()
+        await self.outbox.stop()
+        await self.backend_client.close()
+        self.outbox.close()
+        await self.conversations.close()
+        self.log_pipeline.stop()
     
     def _generate_conversational_response(self, user_input: str, context: Dict[str, Any]) -> str:
         """Generate appropriate conversational responses for non-DeFi inputs"""
@@ -137,110 +301,242 @@ class AppState:
         
         return True
 
-state = AppState()
+# Built in the lifespan so importing this module stays cheap
+state: Optional[AppState] = None
 
-@app.on_event("startup")
-async def startup_event():
-    await state.initialize()
+def new_conversation() -> Dict[str, Any]:
+    return {
+        "history": [],
+        "current_requirements": None,
+        "current_workflow": None
+    }
 
-@app.post("/process", summary="Process a natural language DeFi request")
-async def process_request(user_request: UserRequest) -> ConversationResponse:
-    """
-    Processes a user's natural language request with conversation context,
-    generates workflows, and manages multi-turn interactions.
-    """
-    try:
-        # Get or create conversation context
-        conversation_id = user_request.conversation_id or str(uuid.uuid4())
-        context = state.conversations.get(conversation_id, {
-            "history": [],
-            "current_requirements": None,
-            "current_workflow": None
-        })
-        
-        # Add user message to history
-        context["history"].append({
-            "role": "user",
-            "content": user_request.request,
-            "timestamp": asyncio.get_event_loop().time()
+async def commit_turn(conversation_id: str, turn: List[Dict[str, Any]], **fields: Any) -> None:
+    """Append a chat turn to the stored context and archive the messages leaving its history window"""
+    overflow = (0, [])
+
+    def mutate(context: Dict[str, Any]) -> None:
+        # Re-run on conflict retries; only the committed attempt's overflow is archived
+        nonlocal overflow
+        overflow = state.history.append(context, turn)
+        context.update(fields)
+
+    await state.conversations.update(conversation_id, mutate, default=new_conversation)
+    await state.history.archive(conversation_id, *overflow)
+
+@traced("process_turn")
+@stage("process_turn")
+async def handle_turn(conversation_id: str, user_request: UserRequest) -> ConversationResponse:
+    """Run one chat turn of a conversation; callers hold the conversation's lock"""
+    # Get or create conversation context
+    stored = await state.conversations.get(conversation_id) or new_conversation()
+    
+    # Work on a snapshot; this turn's changes are applied to the latest stored context at the end
+    turn = [{
+        "role": "user",
+        "content": user_request.request,
+        "timestamp": time.time()
+    }]
+    context = {**stored, "history": stored["history"] + turn}
+    
+    # Step 1: Analyze user request with conversation context
+    requirements = await state.architecture_agent.analyze_request(
+        user_request.request, 
+        context=context
+    )
+    
+    # Secondary validation: Double-check for conversational inputs that might have slipped through
+    if not state._is_defi_request(user_request.request, requirements):
+        requirements['pattern'] = 'conversational'
+        requirements['suggested_nodes'] = []
+    
+    # Check if this is a conversational response (not a DeFi workflow request)
+    if requirements.get('pattern') == 'conversational':
+        # Handle conversational interactions
+        conversational_response = state._generate_conversational_response(user_request.request, context)
+        turn.append({
+            "role": "assistant",
+            "content": conversational_response,
+            "timestamp": time.time()
         })
         
-        # Step 1: Analyze user request with conversation context
-        requirements = await state.architecture_agent.analyze_request(
-            user_request.request, 
-            context=context
-        )
-        
-        # Secondary validation: Double-check for conversational inputs that might have slipped through
-        if not state._is_defi_request(user_request.request, requirements):
-            requirements['pattern'] = 'conversational'
-            requirements['suggested_nodes'] = []
-        
-        # Update context with new requirements
-        context["current_requirements"] = requirements
-        
-        # Check if this is a conversational response (not a DeFi workflow request)
-        if requirements.get('pattern') == 'conversational':
-            # Handle conversational interactions
-            conversational_response = state._generate_conversational_response(user_request.request, context)
-            context["history"].append({
-                "role": "assistant",
-                "content": conversational_response,
-                "timestamp": asyncio.get_event_loop().time()
-            })
-            
-            # Save updated context
-            state.conversations[conversation_id] = context
-            
-            return ConversationResponse(
-                conversation_id=conversation_id,
-                message=conversational_response,
-                requirements=requirements,
-                workflow=None,
-                executionId=None,
-                needs_approval=False,
-                suggestions=[
-                    "Try: 'Create a swap application'",
-                    "Try: 'Build a limit order system'", 
-                    "Try: 'Make a portfolio dashboard'"
-                ]
-            )
-        
-        # Step 2: Generate workflow based on requirements (only for DeFi requests)
-        workflow_def = await state.workflow_generator.generate_workflow(requirements)
-        context["current_workflow"] = workflow_def
-        
         # Save updated context
-        state.conversations[conversation_id] = context
-        
-        # Step 3: Determine if this needs backend execution or just approval
-        needs_approval = True  # Always require approval for now
-        execution_id = None
-        
-        # Add assistant response to history
-        assistant_message = f"I've analyzed your request and created a {requirements.get('pattern', 'Custom')} workflow with {len(workflow_def.get('nodes', []))} nodes."
-        context["history"].append({
-            "role": "assistant", 
-            "content": assistant_message,
-            "timestamp": asyncio.get_event_loop().time()
-        })
+        await commit_turn(conversation_id, turn, current_requirements=requirements)
         
         return ConversationResponse(
             conversation_id=conversation_id,
-            message=assistant_message,
+            message=conversational_response,
             requirements=requirements,
-            workflow=workflow_def,
-            executionId=execution_id,
-            needs_approval=needs_approval,
+            workflow=None,
+            executionId=None,
+            needs_approval=False,
             suggestions=[
-                "Approve this workflow to generate the canvas",
-                "Ask me to modify specific nodes or features",
-                "Request different token combinations"
+                "Try: 'Create a swap application'",
+                "Try: 'Build a limit order system'", 
+                "Try: 'Make a portfolio dashboard'"
             ]
         )
+    
+    # Step 2: Generate workflow based on requirements (only for DeFi requests)
+    workflow_def = await state.workflow_generator.generate_workflow(requirements)
+    
+    # Step 3: Determine if this needs backend execution or just approval
+    needs_approval = True  # Always require approval for now
+    execution_id = None
+    
+    # Add assistant response to history
+    assistant_message = f"I've analyzed your request and created a {requirements.get('pattern', 'Custom')} workflow with {len(workflow_def.get('nodes', []))} nodes."
+    turn.append({
+        "role": "assistant", 
+        "content": assistant_message,
+        "timestamp": time.time()
+    })
+    
+    # Save updated context
+    await commit_turn(conversation_id, turn, current_requirements=requirements, current_workflow=workflow_def)
+    
+    return ConversationResponse(
+        conversation_id=conversation_id,
+        message=assistant_message,
+        requirements=requirements,
+        workflow=workflow_def,
+        executionId=execution_id,
+        needs_approval=needs_approval,
+        suggestions=[
+            "Approve this workflow to generate the canvas",
+            "Ask me to modify specific nodes or features",
+            "Request different token combinations"
+        ]
+    )
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+async def run_turn(conversation_id: str, user_request: UserRequest) -> ConversationResponse:
+    # The job queue already runs one turn per conversation; the lock keeps approvals out meanwhile
+    async with state.conversation_locks.lock(conversation_id):
+        return await handle_turn(conversation_id, user_request)
+
+def resolve_tenant(headers: Mapping[str, str]) -> Tuple[str, str]:
+    """
+    Fair-share tenant and traffic class of a request
+
+    A key from TENANT_API_KEYS names the tenant, and other keys are refused,
+    so clients can't mint accounts to escape their quota. Without a key the
+    tenant header is used only if TENANT_HEADER is configured (a proxy in
+    front sets it); anything else is charged to the shared default account.
+    """
+    api_key = headers.get("x-api-key")
+    if api_key and state.tenant_keys:
+        tenant = state.tenant_keys.get(api_key)
+        if tenant is None:
+            raise HTTPException(status_code=401, detail="Unknown API key")
+    elif state.tenant_header and headers.get(state.tenant_header):
+        tenant = headers[state.tenant_header]
+    else:
+        tenant = DEFAULT_TENANT
+    traffic_class = BULK if headers.get("x-request-class", "").lower() == BULK else INTERACTIVE
+    return tenant, traffic_class
+
+def submit_turn(conversation_id: str, user_request: UserRequest, headers: Mapping[str, str]):
+    """Queue a chat turn on the job pool, turning admission failures into 429s"""
+    tenant, traffic_class = resolve_tenant(headers)
+    try:
+        # Turns of one conversation are chained, and an identical message already queued is answered once
+        return state.jobs.submit((conversation_id, user_request), tenant=tenant, traffic_class=traffic_class,
+                                 key=conversation_id, dedupe=user_request.request)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e),
+                            headers={"Retry-After": str(math.ceil(e.retry_after))})
+
+def job_to_dict(job) -> Dict[str, Any]:
+    data = job.to_dict()
+    data["conversation_id"] = job.payload[0]
+    if isinstance(job.result, BaseModel):
+        data["result"] = job.result.model_dump()
+    return data
+
+@app.post("/process", summary="Process a natural language DeFi request")
+async def process_request(user_request: UserRequest, request: Request,
+                          wait: Optional[float] = None) -> ConversationResponse:
+    """
+    Processes a user's natural language request with conversation context,
+    generates workflows, and manages multi-turn interactions.
+
+    The request runs on the job pool. If it finishes within ``wait`` seconds
+    (PROCESS_WAIT by default) the response is returned directly; otherwise a
+    202 with a ``job_id`` to poll at ``/jobs/{job_id}``. A full queue
+    answers 429 with Retry-After.
+
+    Requests are scheduled fairly across tenants (``X-API-Key`` or the
+    tenant header); ``X-Request-Class: bulk`` marks batch traffic, which
+    runs after interactive requests.
+    """
+    conversation_id = user_request.conversation_id or str(uuid.uuid4())
+    job = submit_turn(conversation_id, user_request, request.headers)
+    job = await state.jobs.wait(job.id, state.process_wait if wait is None else wait)
+    if job.status == "completed":
+        return job.result
+    if job.status == "failed":
+        raise HTTPException(status_code=500, detail=job.error)
+    return JSONResponse(status_code=202, content=job_to_dict(job), headers={"Location": f"/jobs/{job.id}"})
+
+@app.get("/jobs/{job_id}", summary="Get the status and result of a queued /process request")
+async def get_job(job_id: str, request: Request) -> Response:
+    """
+    Returns a job's status, queue and run times, and its result once completed.
+    Finished jobs answer 304 to a matching If-None-Match.
+    """
+    job = state.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return conditional_json(request, job_to_dict(job))
+
+@traced("approve_workflow")
+@stage("approve_workflow")
+async def handle_approval(conversation_id: str) -> Dict[str, Any]:
+    """Validate and queue the current workflow of a conversation; callers hold its lock"""
+    context = await state.conversations.get(conversation_id)
+    if context is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    
+    workflow_def = context.get("current_workflow")
+    
+    if not workflow_def:
+        raise HTTPException(status_code=400, detail="No workflow to approve")
+    
+    # Reject workflows the backend would refuse, using the cached node catalog
+    node_index = state.backend_client.node_catalog.current_index()
+    validation = await state.workflow_generator.validate_workflow(workflow_def, node_index=node_index)
+    if not validation['valid']:
+        return {
+            "message": "Workflow approved for canvas generation (failed validation, not executed)",
+            "workflow": workflow_def,
+            "validation_errors": validation['errors']
+        }
+    
+    # Record the approval durably; the outbox worker submits it to the backend
+    entry = await state.outbox.enqueue(conversation_id, workflow_def)
+    entry = await state.outbox.wait(entry.tracking_id, state.approval_wait)
+    
+    approval = {"tracking_id": entry.tracking_id}
+    if entry.execution_id:
+        approval.update(execution_id=entry.execution_id, status="executing")
+        message = "Workflow approved and execution started"
+    elif entry.status == "failed":
+        message = "Workflow approved for canvas generation (backend execution failed)"
+    else:
+        approval["status"] = "queued"
+        message = "Workflow approved and queued for execution"
+    await state.conversations.update(conversation_id, lambda latest: latest.update(approval))
+    
+    response = {
+        "message": message,
+        "trackingId": entry.tracking_id,
+        "status": entry.status,
+        "executionId": entry.execution_id,
+        "workflow": workflow_def
+    }
+    if entry.last_error:
+        response["backend_error"] = entry.last_error
+    return response
 
 @app.post("/approve-workflow", summary="Approve and execute a workflow")
 async def approve_workflow(request: Dict[str, Any]) -> Dict[str, Any]:
@@ -249,51 +545,356 @@ async def approve_workflow(request: Dict[str, Any]) -> Dict[str, Any]:
     """
     try:
         conversation_id = request.get("conversation_id")
-        if not conversation_id or conversation_id not in state.conversations:
+        if not conversation_id:
             raise HTTPException(status_code=404, detail="Conversation not found")
-        
-        context = state.conversations[conversation_id]
-        workflow_def = context.get("current_workflow")
-        
-        if not workflow_def:
-            raise HTTPException(status_code=400, detail="No workflow to approve")
-        
-        # Execute workflow on backend
-        try:
-            execution_result = await state.backend_client.execute_workflow(workflow_def)
-            execution_id = execution_result.get("executionId")
-            
-            # Update context
-            context["execution_id"] = execution_id
-            context["status"] = "executing"
-            
-            return {
-                "message": "Workflow approved and execution started",
-                "executionId": execution_id,
-                "workflow": workflow_def
-            }
-        except Exception as backend_error:
-            # Return workflow for canvas generation even if backend execution fails
-            return {
-                "message": "Workflow approved for canvas generation (backend execution failed)",
-                "workflow": workflow_def,
-                "backend_error": str(backend_error)
-            }
+        # Waits for an in-progress turn so the workflow it is generating is the one approved
+        async with state.conversation_locks.lock(conversation_id):
+            return await handle_approval(conversation_id)
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/approvals/{tracking_id}", summary="Get the submission status of an approved workflow")
+async def get_approval_status(tracking_id: str, request: Request) -> Response:
+    """
+    Returns the outbox entry for an approval, including its executionId once submitted.
+    """
+    entry = await state.outbox.get(tracking_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Approval not found")
+    return conditional_json(request, entry.to_dict())
+
+@app.get("/conversations/{conversation_id}/workflow", summary="Get a conversation's current workflow")
+async def get_conversation_workflow(conversation_id: str, request: Request) -> Response:
+    """
+    Returns the workflow and requirements from the conversation's latest turn,
+    or 304 if the client's If-None-Match still matches.
+    """
+    context = await state.conversations.get(conversation_id)
+    if context is None or not context.get("current_workflow"):
+        raise HTTPException(status_code=404, detail="No workflow for this conversation")
+    return conditional_json(request, {
+        "conversation_id": conversation_id,
+        "workflow": context["current_workflow"],
+        "requirements": context.get("current_requirements")
+    })
+
+@app.get("/conversations/{conversation_id}/history", summary="Get a page of a conversation's messages")
+async def get_conversation_history(conversation_id: str, offset: int = 0, limit: int = 50) -> Dict[str, Any]:
+    """
+    Returns up to *limit* consecutive messages starting at position *offset*. Recent
+    messages come from the conversation context; older ones are read from the history
+    archive. Messages missing from the archive are skipped, so the returned ``offset``
+    is where the page actually starts and may be later than the one requested.
+    """
+    context = await state.conversations.get(conversation_id)
+    if context is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    offset, limit = max(0, offset), max(0, min(limit, 1000))
+    start, messages = await state.history.read(conversation_id, context, offset=offset, limit=limit)
+    total = context.get("history_offset", 0) + len(context.get("history", []))
+    return {"conversation_id": conversation_id, "offset": start, "total": total, "messages": messages}
+
 @app.get("/executions/{execution_id}", summary="Get execution status")
-async def get_execution_status(execution_id: str) -> Dict[str, Any]:
+async def get_execution_status(execution_id: str, request: Request) -> Response:
     """
     Retrieves the status of a specific workflow execution from the backend.
+    Pollers sending the last ETag in If-None-Match get 304 until the status changes.
     """
     try:
-        status = await state.backend_client.get_execution_status(execution_id)
-        return status
+        status = await state.status_cache.get(execution_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    return conditional_json(request, status)
+
+@app.get("/executions/{execution_id}/logs", summary="Stream new execution log lines")
+async def stream_execution_logs(execution_id: str, cursor: Optional[str] = None,
+                                follow: bool = True) -> StreamingResponse:
+    """
+    Streams log lines of an execution as newline-delimited JSON.
+
+    Only lines after ``cursor`` are sent. Each batch is followed by a
+    ``{"type": "cursor"}`` record that can be passed back to resume.
+    """
+    try:
+        start = LogCursor.decode(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def stream():
+        try:
+            async for lines, position in state.backend_client.tail_execution_logs(
+                execution_id, cursor=start, follow=follow
+            ):
+                chunk = "".join(json.dumps({"type": "log", **line}) + "\n" for line in lines)
+                yield chunk + json.dumps({"type": "cursor", "cursor": position.encode()}) + "\n"
+        except Exception as e:
+            yield json.dumps({"type": "error", "error": str(e)}) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+class ConversationSession:
+    """
+    A WebSocket connection bound to one conversation.
+
+    Inbound frames are handled in their own tasks so a cancellation can
+    arrive while a turn is still running; at most ``max_in_flight`` tasks
+    run per session, and frames beyond that are answered with an error.
+    Outbound frames go through a bounded queue drained by a single sender,
+    which keeps frames whole and slows producers down when the client reads
+    slowly.
+    """
+
+    def __init__(self, websocket: WebSocket, conversation_id: str, max_in_flight: int = 8):
+        self.websocket = websocket
+        self.conversation_id = conversation_id
+        self.execution_id: Optional[str] = None
+        self.outgoing: asyncio.Queue = asyncio.Queue(maxsize=256)
+        self.tasks: set = set()
+        self.max_in_flight = max_in_flight
+
+    async def send(self, frame: Dict[str, Any]) -> None:
+        await self.outgoing.put(frame)
+
+    async def sender(self) -> None:
+        while True:
+            frame = await self.outgoing.get()
+            await self.websocket.send_json(frame)
+
+    def spawn(self, coro) -> bool:
+        """Run *coro* in its own task, reporting its failure as an error frame; False if at the cap"""
+        if len(self.tasks) >= self.max_in_flight:
+            coro.close()
+            return False
+        task = asyncio.create_task(self.report_errors(coro))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return True
+
+    async def report_errors(self, coro) -> None:
+        try:
+            await coro
+        except HTTPException as e:
+            frame = {"type": "error", "error": e.detail, "status_code": e.status_code}
+            if e.headers and "Retry-After" in e.headers:
+                frame["retry_after"] = int(e.headers["Retry-After"])
+            await self.send(frame)
+        except Exception as e:
+            await self.send({"type": "error", "error": str(e)})
+
+    async def handle(self, frame: Dict[str, Any]) -> None:
+        """Dispatch one client frame; run it through spawn so failures become error frames"""
+        kind = frame.get("type")
+        if kind == "message":
+            await self.on_message(frame)
+        elif kind == "approve":
+            await self.on_approve()
+        elif kind == "cancel":
+            await self.on_cancel(frame.get("executionId"))
+        else:
+            await self.send({"type": "error", "error": f"Unknown frame type: {kind}"})
+
+    async def on_message(self, frame: Dict[str, Any]) -> None:
+        text = frame.get("request")
+        if not text:
+            raise HTTPException(status_code=400, detail="Message frames need a 'request'")
+        user_request = UserRequest(request=text, conversation_id=self.conversation_id, context=frame.get("context"))
+        job = await state.jobs.wait(submit_turn(self.conversation_id, user_request, self.websocket.headers).id)
+        if job.status == "failed":
+            raise HTTPException(status_code=500, detail=job.error)
+        response = job.result
+        await self.send({"type": "assistant_message", **response.model_dump(exclude={"workflow"})})
+        if response.workflow:
+            await self.send({"type": "workflow_update", "workflow": response.workflow})
+
+    async def on_approve(self) -> None:
+        async with state.conversation_locks.lock(self.conversation_id):
+            result = await handle_approval(self.conversation_id)
+        await self.send({"type": "approval", **{k: v for k, v in result.items() if k != "workflow"}})
+        if result.get("trackingId") and result.get("status") != "failed":
+            if not self.spawn(self.follow_execution(result["trackingId"], result.get("executionId"))):
+                await self.send({"type": "error", "status_code": 429, "trackingId": result["trackingId"],
+                                 "error": "Too many frames in flight; poll /approvals/{trackingId} instead"})
+
+    async def on_cancel(self, execution_id: Optional[str]) -> None:
+        execution_id = execution_id or self.execution_id
+        if not execution_id:
+            raise HTTPException(status_code=400, detail="No execution to cancel")
+        success = await state.backend_client.cancel_execution(execution_id)
+        if success:
+            # A cached running status would outlive the cancellation
+            state.status_cache.invalidate(execution_id)
+        await self.send({"type": "execution_event", "event": "cancel_requested",
+                         "executionId": execution_id, "success": success})
+
+    async def follow_execution(self, tracking_id: str, execution_id: Optional[str]) -> None:
+        """Push the approval's submission, log lines and final status as they happen"""
+        while execution_id is None:
+            entry = await state.outbox.wait(tracking_id, 5.0)
+            if entry is None or entry.status in ("submitted", "failed"):
+                await self.send({"type": "approval", **(entry.to_dict() if entry else {"trackingId": tracking_id})})
+                if entry is None or entry.execution_id is None:
+                    return
+                execution_id = entry.execution_id
+
+        self.execution_id = execution_id
+        await self.send({"type": "execution_event", "event": "started", "executionId": execution_id})
+        async for lines, _ in state.backend_client.tail_execution_logs(execution_id):
+            await self.send({"type": "execution_event", "event": "log", "executionId": execution_id, "lines": lines})
+        status = await state.status_cache.get(execution_id)
+        await self.send({"type": "execution_event", "event": "status", "executionId": execution_id,
+                         "status": extract_status(status), "execution": status.get("execution", status)})
+
+    async def close(self) -> None:
+        for task in list(self.tasks):
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+@app.websocket("/ws")
+async def conversation_socket(websocket: WebSocket, conversation_id: Optional[str] = None):
+    """
+    Persistent conversation session.
+
+    Client frames: ``message`` (with ``request``), ``approve``, ``cancel``
+    (optional ``executionId``) and ``ping``. Server frames: ``session``,
+    ``assistant_message``, ``workflow_update``, ``approval``,
+    ``execution_event`` (``started`` / ``log`` / ``status`` /
+    ``cancel_requested``), ``pong`` and ``error``.
+    """
+    await websocket.accept()
+    session = ConversationSession(websocket, conversation_id or str(uuid.uuid4()), state.ws_max_in_flight)
+    sender = asyncio.create_task(session.sender())
+    await session.send({"type": "session", "conversation_id": session.conversation_id})
+    try:
+        while True:
+            raw = await websocket.receive_text()
+            try:
+                frame = json.loads(raw)
+            except ValueError:
+                await session.send({"type": "error", "error": "Frames must be JSON objects"})
+                continue
+            if not isinstance(frame, dict):
+                await session.send({"type": "error", "error": "Frames must be JSON objects"})
+                continue
+            if frame.get("type") == "ping":
+                await session.send({"type": "pong"})
+            elif not session.spawn(session.handle(frame)):
+                await session.send({"type": "error", "error": "Too many frames in flight", "status_code": 429})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await session.close()
+        sender.cancel()
+
+@app.get("/health", summary="Liveness probe")
+async def get_health() -> Dict[str, Any]:
+    """Returns 200 while the process is serving requests"""
+    return {"status": "alive"}
+
+@app.get("/ready", summary="Readiness probe")
+async def get_ready() -> JSONResponse:
+    """
+    Returns 200 once startup warm-up (LLM load and connection, backend connection
+    and node catalog, workflow generator paths) has finished, 503 until then.
+    The body lists each warm-up step's outcome.
+    """
+    status = state.warmup.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+@app.get("/stats", summary="Get agent service runtime counters")
+async def get_stats() -> Dict[str, Any]:
+    """
+    Returns backend client counters such as connection reuse and retries,
+    the execution status cache hit ratio, conversation store evictions and
+    per-conversation lock wait times, and job queue depth and wait times.
+    """
+    await refresh_counts()
+    return collect_stats()
+
+async def refresh_counts() -> None:
+    """Recount on-disk entries in threads, so collect_stats() only reads memory"""
+    results = await asyncio.gather(state.outbox.refresh_counts(), state.conversations.refresh_counts(),
+                                   return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception):
+            # Stats keep the previous counts
+            logger.warning("Failed to refresh stats counts", error=str(result))
+
+def collect_stats() -> Dict[str, Any]:
+    return {
+        "backend_client": state.backend_client.stats(),
+        "status_cache": state.status_cache.stats(),
+        "outbox": state.outbox.stats(),
+        "conversations": state.conversations.stats(),
+        "conversation_locks": state.conversation_locks.stats(),
+        "conversation_history": state.history.stats(),
+        "jobs": state.jobs.stats(),
+        "llm_ready": state.architecture_agent.ready,
+        "model_routing": state.architecture_agent.router.stats(),
+        "logging": state.log_pipeline.stats(),
+        "entities": state.workflow_generator.entities.stats(),
+        "warmup": state.warmup.status()
+    }
+
+# Component counters are exposed as gauges next to the stage histograms
+REGISTRY.register_collector("service", collect_stats)
+
+@app.get("/metrics", summary="Prometheus metrics", response_class=PlainTextResponse)
+async def get_metrics() -> PlainTextResponse:
+    """
+    Returns per-stage and backend call latency histograms, fallback analysis
+    counts and component counters in the Prometheus text format.
+    """
+    await refresh_counts()
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+def require_admin(token: Optional[str]) -> None:
+    """Admin endpoints don't exist without ADMIN_TOKEN, and need it when it is set"""
+    expected = os.getenv("ADMIN_TOKEN")
+    if not expected:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if token is None or not hmac.compare_digest(token.encode(), expected.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+profiler = SamplingProfiler()
+
+@app.get("/admin/traces/{request_id}", summary="Get the recorded spans of a request")
+async def get_trace(request_id: str, x_admin_token: Optional[str] = Header(None)) -> Dict[str, Any]:
+    """
+    Returns the spans recorded for a request ID (see the X-Request-ID response header),
+    from the in-memory span exporter.
+    """
+    require_admin(x_admin_token)
+    spans = TRACER.exporter.spans(request_id=request_id)
+    if not spans:
+        raise HTTPException(status_code=404, detail="No spans recorded for this request")
+    return {"request_id": request_id, "spans": [span.to_dict() for span in sorted(spans, key=lambda s: s.start_time)]}
+
+@app.post("/admin/profile", summary="Sample the live process and return collapsed stacks",
+          response_class=PlainTextResponse)
+async def run_profile(seconds: float = 5.0, interval: float = 0.01,
+                      x_admin_token: Optional[str] = Header(None)) -> PlainTextResponse:
+    """
+    Samples every thread's stack for ``seconds`` (max 60) and returns a
+    flamegraph-compatible collapsed-stack file (``frame;frame;... count``).
+    """
+    require_admin(x_admin_token)
+    try:
+        counts = await asyncio.to_thread(profiler.profile, seconds, interval)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(format_collapsed(counts))
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    workers = int(os.getenv("AGENT_WORKERS", "1"))
+    if workers > 1:
+        # Worker processes import the app themselves; conversations must be shared between them
+        if not os.getenv("CONVERSATION_SHARED_PATH"):
+            os.environ["CONVERSATION_SHARED_PATH"] = "conversations_shared.sqlite3"
+        uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=workers,
+                    app_dir=os.path.dirname(os.path.abspath(__file__)))
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
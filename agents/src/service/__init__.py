@@ -0,0 +1,19 @@
+"""
+DeFi Agent System - Service Package
+
+Contains request handling infrastructure for the agent API service.
+"""
+
+from .encoding import CompressionConfig, CompressionMiddleware, conditional_json
+from .fairshare import FairScheduler, FairShareConfig, TenantPolicy
+from .jobs import Job, JobQueue, JobQueueConfig, QueueFullError
+from .logs import LogConfig, LogPipeline
+from .metrics import REGISTRY, MetricsRegistry, stage, timed
+from .profiler import SamplingProfiler
+from .tracing import TRACER, InMemoryExporter, Span, Tracer, traced
+from .warmup import Warmup, WarmupStep
+
+__all__ = ['CompressionConfig', 'CompressionMiddleware', 'conditional_json', 'FairScheduler', 'FairShareConfig',
+           'TenantPolicy', 'Job', 'JobQueue', 'JobQueueConfig', 'QueueFullError', 'LogConfig',
+           'LogPipeline', 'REGISTRY', 'MetricsRegistry', 'stage',
+           'timed', 'SamplingProfiler', 'TRACER', 'InMemoryExporter', 'Span', 'Tracer', 'traced', 'Warmup', 'WarmupStep']
\ No newline at end of file
@@ -0,0 +1,265 @@
+"""
+Response Encoding
+
+Negotiated response compression (brotli when the ``brotli`` package is
+installed, gzip otherwise) and strong ETags, so clients on slow links
+download large workflow payloads compressed, and pollers that already hold
+the current payload get ``304 Not Modified`` with no body.
+"""
+
+import hashlib
+import json
+import os
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import Request
+from starlette.responses import Response
+
+from .metrics import COMPRESSION_BYTES, COMPRESSION_SECONDS
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is always available
+    brotli = None
+
+# Content types worth compressing; images and archives are already compressed
+_COMPRESSIBLE = ('application/json', 'application/x-ndjson', 'text/', 'application/javascript', 'application/xml')
+
+
+def available_encodings() -> Tuple[str, ...]:
+    """Supported encodings, most preferred first"""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def negotiate_encoding(accept_encoding: Optional[str], supported: Tuple[str, ...]) -> Optional[str]:
+    """
+    Pick a content coding from an Accept-Encoding header
+
+    Args:
+        accept_encoding: The request's Accept-Encoding value
+        supported: Encodings the server offers, most preferred first
+
+    Returns:
+        The encoding with the highest q-value (server preference breaks ties), or None for identity
+    """
+    if not accept_encoding:
+        return None
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(','):
+        name, _, params = item.strip().partition(';')
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+    best, best_q = None, 0.0
+    for encoding in supported:
+        q = weights.get(encoding, weights.get('*', 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+@dataclass
+class CompressionConfig:
+    """Which responses are compressed and how hard"""
+    encodings: Tuple[str, ...] = available_encodings()
+    minimum_size: int = 1024  # smaller bodies are sent as-is; headers would eat the savings
+    gzip_level: int = 6
+    brotli_quality: int = 4
+
+    @classmethod
+    def from_env(cls) -> "CompressionConfig":
+        requested = os.getenv("COMPRESSION_ENCODINGS", ",".join(available_encodings()))
+        return cls(
+            encodings=tuple(e.strip() for e in requested.split(",") if e.strip() in available_encodings()),
+            minimum_size=int(os.getenv("COMPRESSION_MIN_SIZE", "1024")),
+            gzip_level=int(os.getenv("COMPRESSION_GZIP_LEVEL", "6")),
+            brotli_quality=int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+        )
+
+
+class _Compressor:
+    """Incremental compressor for one response body"""
+
+    def __init__(self, encoding: str, config: CompressionConfig):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._brotli = brotli.Compressor(quality=config.brotli_quality)
+        else:
+            # wbits 31: zlib stream with a gzip header and trailer
+            self._gzip = zlib.compressobj(config.gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        """Compress a chunk, flushed so the client can decode it right away"""
+        if self.encoding == 'br':
+            out = self._brotli.process(data)
+            return out + (self._brotli.finish() if final else self._brotli.flush())
+        out = self._gzip.compress(data)
+        return out + self._gzip.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+def compress(data: bytes, encoding: str, config: Optional[CompressionConfig] = None) -> bytes:
+    """Compress a whole body"""
+    return _Compressor(encoding, config or CompressionConfig()).compress(data, final=True)
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing response bodies with the negotiated encoding.
+
+    Single-message bodies are compressed in one go and get an exact
+    Content-Length; streamed bodies (NDJSON log tails) are compressed chunk
+    by chunk and flushed after each one. Strong ETags get the encoding
+    appended, since the compressed bytes are a different representation,
+    and a 304 answering a request for the compressed representation carries
+    that same ETag. Every response of a compressible type, compressed or
+    not, gets ``Vary: Accept-Encoding`` so caches keep the variants apart.
+    """
+
+    def __init__(self, app, config: Optional[CompressionConfig] = None):
+        self.app = app
+        self.config = config or CompressionConfig.from_env()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not self.config.encodings:
+            await self.app(scope, receive, send)
+            return
+        request_headers = Headers(scope=scope)
+        encoding = negotiate_encoding(request_headers.get('accept-encoding'), self.config.encodings)
+        await self.app(scope, receive, _CompressingSend(send, encoding, self.config,
+                                                        request_headers.get('if-none-match')))
+
+
+class _CompressingSend:
+    def __init__(self, send, encoding: Optional[str], config: CompressionConfig,
+                 if_none_match: Optional[str] = None):
+        self._send = send
+        self._encoding = encoding
+        self._config = config
+        self._if_none_match = if_none_match
+        self._start: Optional[Dict[str, Any]] = None
+        self._compressor: Optional[_Compressor] = None
+        self._passthrough = False
+
+    async def __call__(self, message: Dict[str, Any]) -> None:
+        if message['type'] == 'http.response.start':
+            self._start = message
+            headers = MutableHeaders(scope=message)
+            content_type = headers.get('content-type', '')
+            compressible = any(content_type.startswith(t) for t in _COMPRESSIBLE)
+            if message['status'] == 304:
+                # No body, so no content type: the 200 it stands for was compressible JSON
+                headers.add_vary_header('Accept-Encoding')
+                self._match_encoded_etag(headers)
+            elif compressible and 'content-encoding' not in headers:
+                headers.add_vary_header('Accept-Encoding')
+            self._passthrough = (
+                self._encoding is None
+                or 'content-encoding' in headers
+                or message['status'] in (204, 304) or message['status'] < 200
+                or not compressible
+            )
+            if self._passthrough:
+                await self._send(message)
+            return
+        if message['type'] != 'http.response.body' or self._passthrough:
+            await self._send(message)
+            return
+
+        body = message.get('body', b'')
+        more_body = message.get('more_body', False)
+        if self._compressor is None:
+            if not more_body and len(body) < self._config.minimum_size:
+                self._passthrough = True
+                await self._send(self._start)
+                await self._send(message)
+                return
+            self._compressor = _Compressor(self._encoding, self._config)
+            self._prepare_headers(None if more_body else body)
+
+        started = time.perf_counter()
+        compressed = self._compressor.compress(body, final=not more_body)
+        COMPRESSION_SECONDS.labels(self._encoding).observe(time.perf_counter() - started)
+        COMPRESSION_BYTES.labels(self._encoding, 'in').inc(len(body))
+        COMPRESSION_BYTES.labels(self._encoding, 'out').inc(len(compressed))
+        if self._start is not None:
+            if not more_body:
+                MutableHeaders(scope=self._start)['content-length'] = str(len(compressed))
+            await self._send(self._start)
+            self._start = None
+        await self._send({'type': 'http.response.body', 'body': compressed, 'more_body': more_body})
+
+    def _prepare_headers(self, body: Optional[bytes]) -> None:
+        headers = MutableHeaders(scope=self._start)
+        headers['content-encoding'] = self._encoding
+        if body is None:
+            # Streamed: length unknown until the last chunk
+            del headers['content-length']
+        etag = headers.get('etag')
+        if etag and etag.startswith('"'):
+            headers['etag'] = _encoded_etag(etag, self._encoding)
+
+    def _match_encoded_etag(self, headers: MutableHeaders) -> None:
+        # Revalidating the compressed representation: answer with its ETag, as its 200 did
+        etag = headers.get('etag')
+        if not (self._encoding and self._if_none_match and etag and etag.startswith('"')):
+            return
+        encoded = _encoded_etag(etag, self._encoding)
+        if any(c.strip().removeprefix('W/') == encoded for c in self._if_none_match.split(',')):
+            headers['etag'] = encoded
+
+
+def _encoded_etag(etag: str, encoding: str) -> str:
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag for a response body"""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Evaluate If-None-Match against an ETag (weak comparison, as RFC 9110 requires),
+    ignoring the encoding suffix :class:`CompressionMiddleware` adds
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    suffixes = tuple(f'-{encoding}"' for encoding in ('br', 'gzip'))
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        for suffix in suffixes:
+            if candidate.endswith(suffix):
+                candidate = candidate[:-len(suffix)] + '"'
+                break
+        if candidate == etag:
+            return True
+    return False
+
+
+def conditional_json(request: Request, content: Any, status_code: int = 200,
+                     headers: Optional[Dict[str, str]] = None) -> Response:
+    """
+    JSON response with a strong ETag, or ``304 Not Modified`` if the client already has it
+
+    The body is serialized once and hashed; ``Cache-Control: no-cache`` makes
+    clients revalidate on every poll instead of reusing a stale copy.
+    """
+    body = json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(',', ':')).encode('utf-8')
+    etag = make_etag(body)
+    response_headers = {'ETag': etag, 'Cache-Control': 'no-cache', **(headers or {})}
+    if etag_matches(request.headers.get('if-none-match'), etag):
+        return Response(status_code=304, headers=response_headers)
+    return Response(body, status_code=status_code, media_type='application/json', headers=response_headers)
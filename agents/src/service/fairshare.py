@@ -0,0 +1,276 @@
+"""
+Fair-Share Scheduling
+
+Orders queued jobs across tenants with weighted fair queueing, so one
+tenant submitting a large batch gets its share of the workers instead of
+all of them. Tenants can also be capped in concurrency and admitted
+through a token-bucket quota, and interactive traffic is dispatched ahead
+of bulk traffic.
+"""
+
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from .metrics import TENANT_LATENCY_SECONDS, TENANT_QUEUE_SECONDS
+
+INTERACTIVE = 'interactive'
+BULK = 'bulk'
+TRAFFIC_CLASSES = (INTERACTIVE, BULK)  # dispatch order
+DEFAULT_TENANT = 'default'
+
+
+@dataclass
+class TenantPolicy:
+    """Share and limits of one tenant"""
+    weight: float = 1.0  # relative share of dispatches while several tenants are waiting
+    max_concurrency: Optional[int] = None  # jobs of this tenant running at once
+    max_queued: Optional[int] = None  # queued jobs of this tenant before new ones are refused
+    rate: Optional[float] = None  # sustained admissions per second (token bucket refill)
+    burst: Optional[float] = None  # token bucket size; defaults to max(1, rate)
+
+
+def _optional(name: str, cast):
+    value = os.getenv(name)
+    return cast(value) if value else None
+
+
+@dataclass
+class FairShareConfig:
+    """Tenant policies; tenants without their own policy use ``default``"""
+    default: TenantPolicy = field(default_factory=TenantPolicy)
+    tenants: Dict[str, TenantPolicy] = field(default_factory=dict)
+    max_metric_tenants: int = 50  # tenants beyond this share the "other" metric label
+
+    def policy(self, tenant: str) -> TenantPolicy:
+        return self.tenants.get(tenant, self.default)
+
+    @classmethod
+    def from_env(cls) -> "FairShareConfig":
+        default = TenantPolicy(
+            weight=float(os.getenv("TENANT_DEFAULT_WEIGHT", "1")),
+            max_concurrency=_optional("TENANT_DEFAULT_CONCURRENCY", int),
+            max_queued=_optional("TENANT_DEFAULT_MAX_QUEUED", int),
+            rate=_optional("TENANT_DEFAULT_RATE", float),
+            burst=_optional("TENANT_DEFAULT_BURST", float)
+        )
+        # e.g. {"batch-importer": {"weight": 0.5, "max_concurrency": 2, "rate": 1, "burst": 20}}
+        specs = json.loads(os.getenv("TENANT_POLICIES", "{}"))
+        return cls(default=default, tenants={name: TenantPolicy(**spec) for name, spec in specs.items()})
+
+
+class TokenBucket:
+    """Admits ``rate`` requests per second on average, with bursts of up to ``burst``"""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self) -> float:
+        """Take a token; returns 0 on success, else seconds until one is available"""
+        now = time.monotonic()
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else float('inf')
+
+    @property
+    def full(self) -> bool:
+        self._refill(time.monotonic())
+        return self.tokens >= self.capacity
+
+
+class _Tenant:
+    __slots__ = ('name', 'policy', 'queues', 'running', 'tag', 'bucket', 'label', 'stats')
+
+    def __init__(self, name: str, policy: TenantPolicy, label: str):
+        self.name = name
+        self.policy = policy
+        # Per traffic class: heap of (-priority, sequence, job)
+        self.queues: Dict[str, List[Tuple[int, int, Any]]] = {cls: [] for cls in TRAFFIC_CLASSES}
+        self.running = 0
+        # Virtual finish time of this tenant's last dispatched job
+        self.tag = 0.0
+        self.bucket = TokenBucket(policy.rate, policy.burst) if policy.rate is not None else None
+        self.label = label
+        self.stats = {'submitted': 0, 'dispatched': 0, 'rejected': 0, 'wait_seconds_total': 0.0}
+
+    @property
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self.queues.values())
+
+    @property
+    def idle(self) -> bool:
+        return not self.running and not self.queued and (self.bucket is None or self.bucket.full)
+
+    def eligible(self, traffic_class: str) -> bool:
+        limit = self.policy.max_concurrency
+        return bool(self.queues[traffic_class]) and (limit is None or self.running < limit)
+
+
+class FairScheduler:
+    """
+    Queue discipline for :class:`~service.jobs.JobQueue`.
+
+    Interactive jobs are dispatched before bulk jobs. Within a class the
+    next job comes from the eligible tenant with the lowest virtual time;
+    each dispatch advances a tenant's virtual time by ``1 / weight``, so
+    backlogged tenants are served in proportion to their weights. A tenant
+    returning from idle starts at the current virtual time rather than
+    cashing in credit. Within a tenant, higher ``priority`` runs first.
+
+    Jobs need ``tenant``, ``traffic_class``, ``priority`` and
+    ``enqueued_at`` attributes.
+    """
+
+    def __init__(self, config: Optional[FairShareConfig] = None):
+        self.config = config or FairShareConfig()
+        self._tenants: Dict[str, _Tenant] = {}
+        self._labels: Dict[str, str] = {}
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._sequence = itertools.count()
+        self._virtual_time = 0.0
+        self._depth = {cls: 0 for cls in TRAFFIC_CLASSES}
+        self._sweep_at = 256
+
+    def _tenant(self, name: str) -> _Tenant:
+        tenant = self._tenants.get(name)
+        if tenant is None:
+            label = self._labels.get(name)
+            if label is None:
+                # Bound metric label cardinality; configured tenants always get their own series
+                label = name if name in self.config.tenants or len(self._labels) < self.config.max_metric_tenants \
+                    else 'other'
+                if label != 'other':
+                    self._labels[name] = label
+            if len(self._tenants) >= self._sweep_at:
+                self._sweep()
+            tenant = self._tenants[name] = _Tenant(name, self.config.policy(name), label)
+            tenant.tag = self._virtual_time
+        return tenant
+
+    def admit(self, tenant_name: str) -> float:
+        """
+        Apply a tenant's quota and queue cap to a new job
+
+        Returns:
+            0 if the job may be queued, else suggested seconds before retrying
+        """
+        tenant = self._tenant(tenant_name)
+        if tenant.policy.max_queued is not None and tenant.queued >= tenant.policy.max_queued:
+            tenant.stats['rejected'] += 1
+            return 1.0
+        retry_after = tenant.bucket.take() if tenant.bucket is not None else 0.0
+        if retry_after:
+            tenant.stats['rejected'] += 1
+            self._forget_if_idle(tenant)
+        return retry_after
+
+    def put(self, job: Any) -> None:
+        tenant = self._tenant(job.tenant)
+        if not tenant.running and not tenant.queued:
+            tenant.tag = max(tenant.tag, self._virtual_time)
+        heapq.heappush(tenant.queues[job.traffic_class], (-job.priority, next(self._sequence), job))
+        tenant.stats['submitted'] += 1
+        self._depth[job.traffic_class] += 1
+        self._wake()
+
+    async def get(self) -> Any:
+        """Wait for and return the next job to run"""
+        while True:
+            job = self._pop()
+            if job is not None:
+                return job
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # Woken and cancelled at once: pass the wake-up on
+                    self._wake()
+                raise
+
+    def release(self, job: Any) -> None:
+        """Record a dispatched job as finished, freeing its tenant's concurrency slot"""
+        tenant = self._tenants.get(job.tenant)
+        if tenant is None:
+            return
+        tenant.running -= 1
+        if job.finished_at is not None:
+            TENANT_LATENCY_SECONDS.labels(tenant.label, job.traffic_class).observe(job.finished_at - job.enqueued_at)
+        self._forget_if_idle(tenant)
+        self._wake()
+
+    def depth(self, traffic_class: Optional[str] = None) -> int:
+        """Queued jobs, in total or of one traffic class"""
+        return self._depth[traffic_class] if traffic_class else sum(self._depth.values())
+
+    def ahead_of(self, traffic_class: str) -> int:
+        """Queued jobs that would be dispatched before a new job of *traffic_class*"""
+        index = TRAFFIC_CLASSES.index(traffic_class)
+        return sum(self._depth[cls] for cls in TRAFFIC_CLASSES[:index + 1])
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'virtual_time': round(self._virtual_time, 4),
+            'depth': dict(self._depth),
+            'tenants': {
+                name: {
+                    **tenant.stats,
+                    'wait_seconds_total': round(tenant.stats['wait_seconds_total'], 6),
+                    'queued': tenant.queued,
+                    'running': tenant.running,
+                    'tokens': round(tenant.bucket.tokens, 2) if tenant.bucket is not None else None
+                }
+                for name, tenant in self._tenants.items()
+            }
+        }
+
+    def _pop(self) -> Optional[Any]:
+        for traffic_class in TRAFFIC_CLASSES:
+            candidates = [t for t in self._tenants.values() if t.eligible(traffic_class)]
+            if not candidates:
+                continue
+            tenant = min(candidates, key=lambda t: (t.tag, t.queues[traffic_class][0][1]))
+            _, _, job = heapq.heappop(tenant.queues[traffic_class])
+            self._depth[traffic_class] -= 1
+            self._virtual_time = max(self._virtual_time, tenant.tag)
+            tenant.tag = max(tenant.tag, self._virtual_time) + 1.0 / max(tenant.policy.weight, 1e-6)
+            tenant.running += 1
+            waited = time.monotonic() - job.enqueued_at
+            tenant.stats['dispatched'] += 1
+            tenant.stats['wait_seconds_total'] += waited
+            TENANT_QUEUE_SECONDS.labels(tenant.label, traffic_class).observe(waited)
+            return job
+        return None
+
+    def _wake(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+
+    def _sweep(self) -> None:
+        for tenant in list(self._tenants.values()):
+            self._forget_if_idle(tenant)
+        self._sweep_at = max(256, 2 * len(self._tenants))
+
+    def _forget_if_idle(self, tenant: _Tenant) -> None:
+        # Idle tenants hold no state worth keeping; they rejoin at the current virtual time
+        if tenant.idle and self._tenants.get(tenant.name) is tenant:
+            del self._tenants[tenant.name]
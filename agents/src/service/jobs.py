@@ -0,0 +1,300 @@
+"""
+Job Queue
+
+Bounded queue drained by a fixed pool of workers, with admission control.
+Slow work such as LLM analysis runs at a steady concurrency, and requests
+beyond the queue's capacity are refused early instead of piling up. Jobs
+are ordered by a fair-share scheduler across tenants, and jobs sharing a
+serialization key run one after another without holding a worker while
+they wait.
+"""
+
+import asyncio
+import contextvars
+import os
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, List, Optional
+import structlog
+
+from .fairshare import DEFAULT_TENANT, INTERACTIVE, TRAFFIC_CLASSES, FairScheduler
+
+logger = structlog.get_logger()
+
+
+class QueueFullError(RuntimeError):
+    """Raised when a job is refused by admission control"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@dataclass
+class JobQueueConfig:
+    """Sizing and admission limits for a :class:`JobQueue`"""
+    workers: int = 4
+    max_queue: int = 100  # jobs queued ahead of a new one before it is refused
+    max_queue_wait: float = 30.0  # refuse jobs whose estimated queue wait exceeds this
+    result_ttl: float = 600.0  # seconds finished jobs stay retrievable
+    max_results: int = 10000
+
+    @classmethod
+    def from_env(cls) -> "JobQueueConfig":
+        return cls(
+            workers=int(os.getenv("JOB_WORKERS", "4")),
+            max_queue=int(os.getenv("JOB_MAX_QUEUE", "100")),
+            max_queue_wait=float(os.getenv("JOB_MAX_QUEUE_WAIT", "30")),
+            result_ttl=float(os.getenv("JOB_RESULT_TTL", "600"))
+        )
+
+
+@dataclass
+class Job:
+    """A unit of queued work and its outcome"""
+    id: str
+    payload: Any
+    priority: int = 0
+    tenant: str = DEFAULT_TENANT
+    traffic_class: str = INTERACTIVE  # 'interactive' | 'bulk'
+    status: str = 'queued'  # 'queued' | 'running' | 'completed' | 'failed'
+    result: Any = None
+    error: Optional[str] = None
+    enqueued_at: float = 0.0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    key: Optional[Hashable] = None  # jobs with the same key run one at a time, in submission order
+    dedupe: Optional[Hashable] = None
+    # Submitter's context (trace span, log bindings), restored while the job runs
+    context: Optional[contextvars.Context] = field(default=None, repr=False)
+
+    @property
+    def done(self) -> bool:
+        return self.status in ('completed', 'failed')
+
+    def to_dict(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        started = self.started_at or now
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'priority': self.priority,
+            'tenant': self.tenant,
+            'traffic_class': self.traffic_class,
+            'result': self.result,
+            'error': self.error,
+            'queued_seconds': round(started - self.enqueued_at, 4),
+            'run_seconds': round((self.finished_at or now) - started, 4) if self.started_at else 0.0
+        }
+
+
+class JobQueue:
+    """
+    Runs submitted jobs with ``config.workers`` concurrent workers.
+
+    The scheduler decides which queued job runs next: interactive before
+    bulk, tenants in weighted fair shares, and within a tenant higher
+    ``priority`` values first, then submission order. Finished jobs are
+    kept for ``result_ttl`` seconds so clients can collect results after
+    their request returned.
+
+    A job submitted with a ``key`` that already has a job queued or running
+    is held back, outside the scheduler, until that job finishes. Waiting
+    for an earlier turn of the same conversation therefore never occupies a
+    worker, and a held job identical to a new one (same ``dedupe``) is
+    returned instead of queueing a second copy.
+    """
+
+    def __init__(self, handler: Callable[[Any], Awaitable[Any]], config: Optional[JobQueueConfig] = None,
+                 scheduler: Optional[FairScheduler] = None):
+        self.config = config or JobQueueConfig()
+        self.logger = logger.bind(component="JobQueue")
+        self._handler = handler
+        self._scheduler = scheduler or FairScheduler()
+        self._started = False
+        self._workers: List[asyncio.Task] = []
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._waiters: Dict[str, asyncio.Future] = {}
+        self._running = 0
+        # key -> jobs held until the key's queued or running job finishes
+        self._chains: Dict[Hashable, Deque[Job]] = {}
+        self._held = 0
+        # Exponential moving average of run time, used for Retry-After estimates
+        self._avg_run_time = 1.0
+        self._stats = {'submitted': 0, 'rejected': 0, 'coalesced': 0, 'completed': 0, 'failed': 0, 'max_depth': 0,
+                       'wait_seconds_total': 0.0, 'wait_seconds_max': 0.0, 'run_seconds_total': 0.0}
+
+    async def start(self) -> None:
+        if self._workers:
+            return
+        self._started = True
+        self._workers = [asyncio.create_task(self._work()) for _ in range(max(1, self.config.workers))]
+
+    async def stop(self) -> None:
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def submit(self, payload: Any, priority: int = 0, tenant: str = DEFAULT_TENANT,
+               traffic_class: str = INTERACTIVE, key: Optional[Hashable] = None,
+               dedupe: Optional[Hashable] = None) -> Job:
+        """
+        Queue a job
+
+        Args:
+            payload: Passed to the handler as-is
+            priority: Higher values run sooner within the tenant's queue
+            tenant: Fair-share account the job is charged to
+            traffic_class: 'interactive' jobs are dispatched before 'bulk' ones
+            key: Optional serialization key, e.g. a conversation ID
+            dedupe: Optional fingerprint; a held job with the same key and
+                fingerprint is returned instead of queueing a new one
+
+        Returns:
+            The queued job (or the held job it was coalesced with)
+
+        Raises:
+            QueueFullError: If the jobs ahead are at capacity, the estimated wait is
+                too long, or the tenant is over its quota
+            ValueError: If the traffic class is unknown
+        """
+        if not self._started:
+            raise RuntimeError("JobQueue is not started")
+        if traffic_class not in TRAFFIC_CLASSES:
+            raise ValueError(f"Unknown traffic class: {traffic_class}")
+        if key is not None and dedupe is not None:
+            for held in self._chains.get(key, ()):
+                if held.dedupe == dedupe:
+                    self._stats['coalesced'] += 1
+                    return held
+        # Bulk backlogs don't count against interactive admission; they run after it
+        ahead = self._scheduler.ahead_of(traffic_class) + self._held
+        estimated_wait = self.estimated_wait(traffic_class)
+        if ahead >= self.config.max_queue or estimated_wait > self.config.max_queue_wait:
+            self._stats['rejected'] += 1
+            raise QueueFullError(f"Job queue is full ({ahead} queued)", retry_after=max(1.0, estimated_wait))
+        retry_after = self._scheduler.admit(tenant)
+        if retry_after:
+            self._stats['rejected'] += 1
+            raise QueueFullError(f"Tenant {tenant} is over its request quota", retry_after=max(1.0, retry_after))
+
+        job = Job(id=str(uuid.uuid4()), payload=payload, priority=priority, tenant=tenant,
+                  traffic_class=traffic_class, enqueued_at=time.monotonic(), key=key, dedupe=dedupe,
+                  context=contextvars.copy_context())
+        self._store(job)
+        if key is not None and key in self._chains:
+            self._chains[key].append(job)
+            self._held += 1
+        else:
+            if key is not None:
+                self._chains[key] = deque()
+            self._scheduler.put(job)
+        self._stats['submitted'] += 1
+        self._stats['max_depth'] = max(self._stats['max_depth'], self._scheduler.depth())
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self._expire()
+        return self._jobs.get(job_id)
+
+    async def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[Job]:
+        """
+        Wait up to *timeout* seconds (forever if None) for a job to finish
+
+        Returns:
+            The job, finished or not, or None if unknown
+        """
+        job = self.get(job_id)
+        if job is None or job.done or (timeout is not None and timeout <= 0):
+            return job
+        future = self._waiters.get(job_id)
+        if future is None:
+            future = self._waiters[job_id] = asyncio.get_running_loop().create_future()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return job
+
+    def estimated_wait(self, traffic_class: str = INTERACTIVE) -> float:
+        """Rough seconds a new job of *traffic_class* would spend queued"""
+        return self._scheduler.ahead_of(traffic_class) * self._avg_run_time / max(1, self.config.workers)
+
+    def stats(self) -> Dict[str, Any]:
+        started = self._stats['completed'] + self._stats['failed'] + self._running
+        return {
+            **self._stats,
+            'wait_seconds_total': round(self._stats['wait_seconds_total'], 6),
+            'wait_seconds_max': round(self._stats['wait_seconds_max'], 6),
+            'wait_seconds_avg': round(self._stats['wait_seconds_total'] / started, 6) if started else 0.0,
+            'run_seconds_total': round(self._stats['run_seconds_total'], 6),
+            'depth': self._scheduler.depth(),
+            'held': self._held,
+            'running': self._running,
+            'workers': len(self._workers),
+            'retained_jobs': len(self._jobs),
+            'scheduler': self._scheduler.stats()
+        }
+
+    async def _work(self) -> None:
+        while True:
+            job = await self._scheduler.get()
+            job.status = 'running'
+            job.started_at = time.monotonic()
+            waited = job.started_at - job.enqueued_at
+            self._stats['wait_seconds_total'] += waited
+            self._stats['wait_seconds_max'] = max(self._stats['wait_seconds_max'], waited)
+            self._running += 1
+            try:
+                job.result = await asyncio.create_task(self._handler(job.payload), context=job.context)
+                job.status = 'completed'
+                self._stats['completed'] += 1
+            except asyncio.CancelledError:
+                job.status, job.error = 'failed', 'cancelled'
+                raise
+            except Exception as e:
+                job.status, job.error = 'failed', str(e)
+                self._stats['failed'] += 1
+                self.logger.warning("Job failed", job_id=job.id, error=job.error)
+            finally:
+                self._running -= 1
+                job.finished_at = time.monotonic()
+                self._scheduler.release(job)
+                self._advance(job.key)
+                run_time = job.finished_at - job.started_at
+                self._stats['run_seconds_total'] += run_time
+                self._avg_run_time = 0.8 * self._avg_run_time + 0.2 * run_time
+                future = self._waiters.pop(job.id, None)
+                if future is not None and not future.done():
+                    future.set_result(None)
+
+    def _advance(self, key: Optional[Hashable]) -> None:
+        # Hand the key's next held job to the scheduler, or forget the key
+        if key is None:
+            return
+        chain = self._chains.get(key)
+        if chain:
+            self._held -= 1
+            self._scheduler.put(chain.popleft())
+        else:
+            self._chains.pop(key, None)
+
+    def _store(self, job: Job) -> None:
+        self._expire()
+        self._jobs[job.id] = job
+        while len(self._jobs) > self.config.max_results:
+            oldest_id, oldest = next(iter(self._jobs.items()))
+            if not oldest.done:
+                break
+            del self._jobs[oldest_id]
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - self.config.result_ttl
+        while self._jobs:
+            job = next(iter(self._jobs.values()))
+            if not job.done or job.finished_at > cutoff:
+                break
+            del self._jobs[job.id]
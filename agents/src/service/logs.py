@@ -0,0 +1,218 @@
+"""
+Log Pipeline
+
+Structured logging that keeps rendering and I/O off the event loop. Log
+calls on the loop only filter by level, merge context variables, apply
+per-event sampling and append the event to a bounded queue; a background
+thread timestamps, renders and writes batches of events. When the queue is
+full, new events are dropped and counted rather than blocking the caller.
+Queued events are snapshots: values the caller goes on mutating are copied
+or pre-rendered first, so the writer never sees a later state or races it.
+"""
+
+import copy
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, Optional, TextIO
+
+import structlog
+
+_LEVELS = {'debug': logging.DEBUG, 'info': logging.INFO, 'warning': logging.WARNING, 'error': logging.ERROR,
+           'critical': logging.CRITICAL}
+
+_IMMUTABLE = (str, int, float, bool, bytes, type(None))
+_CONTAINERS = (dict, list, tuple, set, frozenset)
+
+
+@dataclass
+class LogConfig:
+    """Level, format, queue size and sampling of the log pipeline"""
+    level: str = 'info'
+    format: str = 'console'  # or 'json', one object per line
+    queue_size: int = 10000  # 0 renders and writes on the calling thread, as structlog does by default
+    # Fraction of each event (by message) to keep, e.g. {"Workflow generated": 0.1}; others are all kept
+    sample_rates: Dict[str, float] = field(default_factory=dict)
+    flush_interval: float = 0.05  # seconds the writer waits for more events before writing a batch
+
+    @classmethod
+    def from_env(cls) -> "LogConfig":
+        return cls(
+            level=os.getenv("LOG_LEVEL", "info").lower(),
+            format=os.getenv("LOG_FORMAT", "console").lower(),
+            queue_size=int(os.getenv("LOG_QUEUE_SIZE", "10000")),
+            sample_rates=json.loads(os.getenv("LOG_SAMPLE_RATES", "{}"))
+        )
+
+
+class _Sampler:
+    """Keeps ``rate`` of each sampled event, evenly spaced (1 in 10 for 0.1), without randomness"""
+
+    def __init__(self, rates: Dict[str, float]):
+        self.rates = rates
+        self.seen: Dict[str, int] = {}
+        self.dropped: Dict[str, int] = {}
+
+    def __call__(self, logger, method_name: str, event_dict: Dict[str, Any]) -> Dict[str, Any]:
+        event = event_dict.get('event')
+        rate = self.rates.get(event)
+        if rate is None or rate >= 1:
+            return event_dict
+        seen = self.seen.get(event, 0) + 1
+        self.seen[event] = seen
+        if int(seen * rate) == int((seen - 1) * rate):
+            self.dropped[event] = self.dropped.get(event, 0) + 1
+            raise structlog.DropEvent
+        return event_dict
+
+
+def _enqueue(logger, method_name: str, event_dict: Dict[str, Any]):
+    # Last processor on the calling thread: the timestamp is taken now, formatted by the writer
+    event_dict['level'] = method_name
+    event_dict['_time'] = time.time()
+    if event_dict.get('exc_info') is True:
+        # The writer thread has no current exception; capture it here, format it there
+        event_dict['exc_info'] = sys.exc_info()
+    return (event_dict,), {}
+
+
+class _QueueLogger:
+    """structlog logger whose methods hand events to the pipeline"""
+
+    def __init__(self, pipeline: "LogPipeline"):
+        self._pipeline = pipeline
+
+    def msg(self, event_dict: Dict[str, Any]) -> None:
+        self._pipeline.put(event_dict)
+
+    debug = info = warning = warn = error = critical = exception = fatal = log = msg
+
+
+class LogPipeline:
+    """
+    Routes structlog output through a bounded queue to a writer thread.
+
+    :meth:`install` configures structlog; loggers created with
+    ``structlog.get_logger()`` pick it up on their next call. Until
+    :meth:`start` (and after :meth:`stop`) events are written on the calling
+    thread, so nothing is lost at startup or shutdown.
+    """
+
+    def __init__(self, config: Optional[LogConfig] = None, stream: Optional[TextIO] = None):
+        self.config = config or LogConfig()
+        self.stream = stream
+        self._sampler = _Sampler(self.config.sample_rates)
+        self._queue: Deque[Dict[str, Any]] = deque()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        # How the renderer turns values that aren't JSON-like data into text
+        self._to_text = str if self.config.format == 'json' else repr
+        if self.config.format == 'json':
+            render_json = structlog.processors.JSONRenderer(default=str)
+            self._render = lambda logger, name, event_dict: render_json(
+                logger, name, structlog.processors.format_exc_info(logger, name, event_dict))
+        else:
+            self._render = structlog.dev.ConsoleRenderer(colors=False)
+        self._stats = {'queued': 0, 'written': 0, 'dropped': 0, 'write_errors': 0}
+
+    def install(self) -> None:
+        structlog.configure(
+            processors=[
+                structlog.contextvars.merge_contextvars,
+                self._sampler,
+                _enqueue
+            ],
+            wrapper_class=structlog.make_filtering_bound_logger(_LEVELS.get(self.config.level, logging.INFO)),
+            logger_factory=lambda *args: _QueueLogger(self),
+            cache_logger_on_first_use=False
+        )
+
+    def start(self) -> None:
+        if self._thread is not None or self.config.queue_size <= 0:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Write what is queued and stop the writer thread"""
+        if self._thread is None:
+            return
+        self._running = False
+        self._wake.set()
+        self._thread.join(timeout)
+        self._thread = None
+        self._write_batch()
+
+    def put(self, event_dict: Dict[str, Any]) -> None:
+        if self._thread is None:
+            self._write(self._format(event_dict))
+            return
+        if len(self._queue) >= self.config.queue_size:
+            self._stats['dropped'] += 1
+            return
+        # deque.append is atomic; the writer pops from the other end
+        self._queue.append(self._snapshot(event_dict))
+        self._stats['queued'] += 1
+        if not self._wake.is_set():
+            self._wake.set()
+
+    def _snapshot(self, event_dict: Dict[str, Any]) -> Dict[str, Any]:
+        snapshot = {}
+        for key, value in event_dict.items():
+            if isinstance(value, _IMMUTABLE) or key == 'exc_info':
+                snapshot[key] = value
+            elif isinstance(value, _CONTAINERS):
+                try:
+                    snapshot[key] = copy.deepcopy(value)
+                except Exception:
+                    snapshot[key] = self._to_text(value)
+            else:
+                snapshot[key] = self._to_text(value)
+        return snapshot
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            'queue_depth': len(self._queue),
+            'sampled_out': dict(self._sampler.dropped)
+        }
+
+    def _run(self) -> None:
+        while self._running:
+            self._wake.wait()
+            self._wake.clear()
+            # Let a burst accumulate so it is written with one call
+            time.sleep(self.config.flush_interval)
+            self._write_batch()
+
+    def _write_batch(self) -> None:
+        lines = []
+        while self._queue:
+            lines.append(self._format(self._queue.popleft()))
+        if lines:
+            self._write('\n'.join(lines), count=len(lines))
+
+    def _format(self, event_dict: Dict[str, Any]) -> str:
+        stamp = time.localtime(event_dict.pop('_time'))
+        event_dict['timestamp'] = time.strftime('%Y-%m-%d %H:%M:%S', stamp)
+        try:
+            return self._render(None, event_dict['level'], event_dict)
+        except Exception as e:  # an unserializable value must not kill the writer
+            return f"{event_dict.get('timestamp')} [{event_dict.get('level')}] {event_dict.get('event')} " \
+                   f"(render failed: {e!r})"
+
+    def _write(self, text: str, count: int = 1) -> None:
+        stream = self.stream or sys.stdout
+        try:
+            stream.write(text + '\n')
+            stream.flush()
+            self._stats['written'] += count
+        except (OSError, ValueError):
+            self._stats['write_errors'] += count
@@ -0,0 +1,292 @@
+"""
+Metrics
+
+Counters and histograms with Prometheus text exposition. Observations are
+plain list and float updates on pre-resolved label children, keeping the
+cost of an instrumented call to about a microsecond.
+"""
+
+import functools
+import inspect
+import math
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+import structlog
+
+logger = structlog.get_logger()
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+
+    def labels(self, *values: str):
+        """Return the child for a label combination; resolve it once and keep it for hot paths"""
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+            child = self._children[key] = self._new_child()
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _unlabelled(self):
+        return self.labels() if not self.labelnames else None
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in list(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+    def _render_child(self, values: Tuple[str, ...], child) -> List[str]:
+        raise NotImplementedError
+
+
+class _CounterChild:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._unlabelled().inc(amount)
+
+    def _render_child(self, values, child):
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"]
+
+
+class _HistogramChild:
+    __slots__ = ('upper_bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, upper_bounds: Tuple[float, ...]):
+        self.upper_bounds = upper_bounds
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.upper_bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def time(self) -> "_Timer":
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ('child', 'started')
+
+    def __init__(self, child: _HistogramChild):
+        self.child = child
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.started)
+        return False
+
+
+class Histogram(_Metric):
+    """Distribution of observed values (seconds by default) in cumulative buckets"""
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.upper_bounds = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.upper_bounds)
+
+    def observe(self, value: float) -> None:
+        self._unlabelled().observe(value)
+
+    def time(self) -> _Timer:
+        return self._unlabelled().time()
+
+    def _render_child(self, values, child):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.upper_bounds + (math.inf,), child.counts):
+            cumulative += count
+            labels = _format_labels(self.labelnames, values, f'le="{_format_value(bound)}"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+        lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+def timed(child: _HistogramChild) -> Callable:
+    """
+    Decorator recording the duration of every call (sync or async) in a histogram child
+
+    Args:
+        child: Result of ``Histogram.labels(...)``
+    """
+    observe = child.observe
+    perf_counter = time.perf_counter
+
+    def decorator(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                started = perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    observe(perf_counter() - started)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                observe(perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+class MetricsRegistry:
+    """
+    Holds metrics and scrape-time collectors and renders them for Prometheus.
+
+    Collectors return nested ``stats()``-style dicts; their numeric leaves
+    are exposed as gauges named ``<prefix>_<path>``. They run on every
+    scrape, so they must only read in-memory state. A collector that raises
+    is logged and counted in ``collector_errors_total``, and its gauges are
+    left out of that scrape.
+    """
+
+    def __init__(self, namespace: str = 'agent'):
+        self.namespace = namespace
+        self.logger = logger.bind(component="MetricsRegistry")
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: Dict[str, Callable[[], Dict[str, Any]]] = {}
+        self._collector_errors = self.counter(
+            'collector_errors_total', 'Scrape-time collectors that raised', ['collector'])
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(f"{self.namespace}_{name}", documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(f"{self.namespace}_{name}", documentation, labelnames, buckets))
+
+    def register_collector(self, prefix: str, collect: Callable[[], Dict[str, Any]]) -> None:
+        self._collectors[prefix] = collect
+
+    def unregister_collector(self, prefix: str) -> None:
+        self._collectors.pop(prefix, None)
+
+    def render(self) -> str:
+        """Return every metric in the Prometheus text exposition format"""
+        lines: List[str] = []
+        gauges: List[str] = []
+        # Collectors run first so this scrape already counts their failures
+        for prefix, collect in list(self._collectors.items()):
+            try:
+                stats = collect()
+            except Exception as e:
+                self._collector_errors.labels(prefix).inc()
+                self.logger.warning("Metrics collector failed", collector=prefix, error=str(e))
+                continue
+            for name, value in self._flatten(f"{self.namespace}_{prefix}", stats):
+                gauges.append(f"# TYPE {name} gauge")
+                gauges.append(f"{name} {_format_value(float(value))}")
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return '\n'.join(lines + gauges) + '\n'
+
+    def _register(self, metric: _Metric) -> Any:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            # Re-registration (e.g. a module reload) keeps the live series
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    @classmethod
+    def _flatten(cls, prefix: str, stats: Dict[str, Any]):
+        for key, value in stats.items():
+            name = f"{prefix}_{''.join(c if c.isalnum() else '_' for c in str(key))}"
+            if isinstance(value, dict):
+                yield from cls._flatten(name, value)
+            elif isinstance(value, bool):
+                yield name, int(value)
+            elif isinstance(value, (int, float)) and not (isinstance(value, float) and math.isnan(value)):
+                yield name, value
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'stage_seconds', 'Time spent in each request processing stage', ['stage'])
+FALLBACK_ANALYSIS = REGISTRY.counter(
+    'fallback_analysis_total', 'Requests analyzed by the rule-based fallback instead of the LLM', ['reason'])
+ROUTED_ANALYSES = REGISTRY.counter(
+    'routed_analysis_total', 'LLM analyses by model route (fast, strong, escalated) and outcome', ['route', 'outcome'])
+ROUTED_ANALYSIS_SECONDS = REGISTRY.histogram(
+    'routed_analysis_seconds', 'Time spent in model calls per analysis, by model route', ['route'])
+BACKEND_REQUEST_SECONDS = REGISTRY.histogram(
+    'backend_request_seconds', 'Latency of backend API calls, including retries', ['endpoint', 'outcome'])
+TENANT_QUEUE_SECONDS = REGISTRY.histogram(
+    'tenant_queue_seconds', 'Time jobs wait in the fair-share queue', ['tenant', 'traffic_class'])
+TENANT_LATENCY_SECONDS = REGISTRY.histogram(
+    'tenant_latency_seconds', 'Time from submission to completion of jobs', ['tenant', 'traffic_class'])
+COMPRESSION_BYTES = REGISTRY.counter(
+    'compression_bytes_total', 'Response body bytes before (in) and after (out) compression', ['encoding', 'direction'])
+COMPRESSION_SECONDS = REGISTRY.histogram(
+    'compression_seconds', 'Time spent compressing response body chunks', ['encoding'],
+    buckets=(0.00001, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05))
+
+
+def stage(name: str) -> Callable:
+    """Shorthand for ``timed(STAGE_SECONDS.labels(name))``"""
+    return timed(STAGE_SECONDS.labels(name))
@@ -0,0 +1,87 @@
+"""
+Sampling Profiler
+
+Time-boxed statistical profiler for the live process. A background thread
+snapshots every thread's Python stack at a fixed interval; the result is a
+collapsed-stack file that flamegraph.pl, speedscope and similar tools read.
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional
+
+
+class ProfilerBusyError(RuntimeError):
+    """Raised when a profile is requested while another one is running"""
+
+
+class SamplingProfiler:
+    """
+    Samples thread stacks with ``sys._current_frames()``.
+
+    Nothing is instrumented, so the profiled code runs at full speed; the
+    cost is one stack walk per thread per interval, paid by the sampler
+    thread. Only one profile runs at a time.
+    """
+
+    def __init__(self, max_duration: float = 60.0, min_interval: float = 0.001):
+        self.max_duration = max_duration
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+
+    def profile(self, duration: float, interval: float = 0.01) -> Dict[str, int]:
+        """
+        Sample all threads for *duration* seconds (blocking)
+
+        Args:
+            duration: Seconds to sample, capped at ``max_duration``
+            interval: Seconds between samples
+
+        Returns:
+            Mapping of collapsed stack (root first, ``;``-separated) to sample count
+
+        Raises:
+            ProfilerBusyError: If another profile is in progress
+        """
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusyError("A profile is already running")
+        try:
+            return self._sample(min(duration, self.max_duration), max(interval, self.min_interval))
+        finally:
+            self._lock.release()
+
+    def _sample(self, duration: float, interval: float) -> Dict[str, int]:
+        own_thread = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        counts: Counter = Counter()
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread:
+                    continue
+                counts[self._collapse(names.get(thread_id, str(thread_id)), frame)] += 1
+            time.sleep(interval)
+        return dict(counts)
+
+    @staticmethod
+    def _collapse(thread_name: str, frame) -> str:
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        stack.append(thread_name)
+        return ';'.join(reversed(stack))
+
+
+def format_collapsed(counts: Dict[str, int], min_count: Optional[int] = None) -> str:
+    """Render sample counts as ``stack count`` lines, heaviest first"""
+    lines = [
+        f"{stack} {count}"
+        for stack, count in sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+        if min_count is None or count >= min_count
+    ]
+    return '\n'.join(lines) + ('\n' if lines else '')
@@ -0,0 +1,174 @@
+"""
+Tracing
+
+Span-based request tracing built on context variables. A span started for
+an incoming request is the parent of every span opened while handling it,
+across awaits and tasks, and its IDs are forwarded to the backend as W3C
+``traceparent`` and ``X-Request-ID`` headers.
+"""
+
+import functools
+import inspect
+import secrets
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+@dataclass
+class Span:
+    """A timed operation within a trace"""
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str] = None
+    request_id: Optional[str] = None
+    start_time: float = 0.0  # wall clock, seconds since the epoch
+    duration: Optional[float] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'request_id': self.request_id,
+            'start_time': self.start_time,
+            'duration': self.duration,
+            'attributes': self.attributes,
+            'error': self.error
+        }
+
+
+class InMemoryExporter:
+    """Keeps the most recent finished spans in memory, for offline inspection and tests"""
+
+    def __init__(self, max_spans: int = 10000):
+        self._spans: Deque[Span] = deque(maxlen=max_spans)
+
+    def export(self, span: Span) -> None:
+        self._spans.append(span)
+
+    def spans(self, request_id: Optional[str] = None, trace_id: Optional[str] = None) -> List[Span]:
+        return [
+            span for span in list(self._spans)
+            if (request_id is None or span.request_id == request_id)
+            and (trace_id is None or span.trace_id == trace_id)
+        ]
+
+    def clear(self) -> None:
+        self._spans.clear()
+
+
+def parse_traceparent(header: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """Return ``(trace_id, parent span_id)`` from a W3C traceparent header, or Nones if invalid"""
+    if not header:
+        return None, None
+    parts = header.strip().split('-')
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None, None
+    try:
+        int(parts[1], 16)
+        int(parts[2], 16)
+    except ValueError:
+        return None, None
+    return parts[1], parts[2]
+
+
+class Tracer:
+    """
+    Creates spans and hands finished ones to an exporter.
+
+    :meth:`traced` only records spans inside an existing trace, so library
+    code called outside a request (tests, scripts) pays a single context
+    variable lookup.
+    """
+
+    def __init__(self, exporter: Optional[InMemoryExporter] = None):
+        self.exporter = exporter or InMemoryExporter()
+
+    @contextmanager
+    def span(self, name: str, request_id: Optional[str] = None, trace_id: Optional[str] = None,
+             parent_id: Optional[str] = None, **attributes: Any) -> Iterator[Span]:
+        """
+        Open a span as a child of the current one
+
+        Args:
+            name: Operation name
+            request_id: Request ID for a root span (children inherit their parent's)
+            trace_id: Trace to join for a root span, e.g. from an incoming traceparent
+            parent_id: Remote parent span ID for a root span
+            **attributes: Extra span attributes
+        """
+        parent = _current_span.get()
+        span = Span(
+            name=name,
+            trace_id=parent.trace_id if parent else (trace_id or secrets.token_hex(16)),
+            span_id=secrets.token_hex(8),
+            parent_id=parent.span_id if parent else parent_id,
+            request_id=parent.request_id if parent else request_id,
+            start_time=time.time(),
+            attributes=attributes
+        )
+        token = _current_span.set(span)
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.duration = time.perf_counter() - started
+            _current_span.reset(token)
+            self.exporter.export(span)
+
+    def traced(self, name: str) -> Callable:
+        """Decorator wrapping every call (sync or async) made inside a trace in a span"""
+        def decorator(func: Callable) -> Callable:
+            if inspect.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    if _current_span.get() is None:
+                        return await func(*args, **kwargs)
+                    with self.span(name):
+                        return await func(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if _current_span.get() is None:
+                    return func(*args, **kwargs)
+                with self.span(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def trace_headers() -> Dict[str, str]:
+    """Headers propagating the current trace to a downstream service"""
+    span = _current_span.get()
+    if span is None:
+        return {}
+    headers = {'traceparent': span.traceparent}
+    if span.request_id:
+        headers['X-Request-ID'] = span.request_id
+    return headers
+
+
+TRACER = Tracer()
+traced = TRACER.traced
@@ -0,0 +1,141 @@
+"""
+Warm-up
+
+Startup steps that pay first-request costs (connection handshakes, lazy
+clients, cold code paths) before traffic arrives. The service reports
+ready once every step has finished, whether or not it succeeded, so an
+unreachable dependency degrades the first requests instead of keeping the
+instance out of rotation. Steps registered with ``retry`` keep being retried
+in the background after a failure, and are listed as degraded until one
+attempt succeeds.
+"""
+
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import structlog
+
+logger = structlog.get_logger()
+
+
+@dataclass
+class WarmupStep:
+    """A named warm-up call and its outcome"""
+    name: str
+    call: Callable[[], Awaitable[Any]]
+    retry: bool = False  # keep retrying in the background after a failure or timeout
+    status: str = 'pending'  # 'pending' | 'running' | 'ok' | 'failed' | 'timeout' | 'retrying'
+    duration: Optional[float] = None
+    error: Optional[str] = None
+    attempts: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            'status': self.status,
+            'duration': round(self.duration, 4) if self.duration is not None else None,
+            'error': self.error
+        }
+        if self.retry:
+            data['attempts'] = self.attempts
+        return data
+
+
+class Warmup:
+    """
+    Runs registered steps concurrently, each bounded by ``timeout`` seconds.
+
+    Steps that depend on each other should be chained inside one call;
+    shared resources (connection pools, caches) already coalesce concurrent
+    first uses. Retried steps wait ``retry_interval`` seconds before their
+    next attempt, doubling up to ``retry_max``; :meth:`run` returns once
+    they have all succeeded, so cancelling it stops the retries.
+    """
+
+    def __init__(self, timeout: float = 30.0, retry_interval: float = 5.0, retry_max: float = 300.0):
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self.retry_max = retry_max
+        self.logger = logger.bind(component="Warmup")
+        self._steps: List[WarmupStep] = []
+        self._done = asyncio.Event()
+        self._started_at: Optional[float] = None
+        self._duration: Optional[float] = None
+
+    @classmethod
+    def from_env(cls) -> "Warmup":
+        return cls(
+            timeout=float(os.getenv("WARMUP_TIMEOUT", "30")),
+            retry_interval=float(os.getenv("WARMUP_RETRY_INTERVAL", "5")),
+            retry_max=float(os.getenv("WARMUP_RETRY_MAX", "300"))
+        )
+
+    def add(self, name: str, call: Callable[[], Awaitable[Any]], retry: bool = False) -> None:
+        self._steps.append(WarmupStep(name, call, retry=retry))
+
+    @property
+    def ready(self) -> bool:
+        return self._done.is_set()
+
+    async def run(self) -> None:
+        """Run every step, then retry the failed ones that allow it; never raises for a failed step"""
+        self._started_at = time.perf_counter()
+        try:
+            await asyncio.gather(*(self._run_step(step) for step in self._steps))
+        finally:
+            self._duration = time.perf_counter() - self._started_at
+            for step in self._steps:
+                if step.retry and step.status != 'ok':
+                    step.status = 'retrying'
+            self._done.set()
+        self.logger.info("Warm-up finished", duration=round(self._duration, 3),
+                         steps={step.name: step.status for step in self._steps})
+        await asyncio.gather(*(self._retry(step) for step in self._steps if step.status == 'retrying'))
+
+    async def wait(self, timeout: Optional[float] = None) -> bool:
+        """Wait up to *timeout* seconds for warm-up to finish; returns :attr:`ready`"""
+        try:
+            await asyncio.wait_for(self._done.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.ready
+
+    def status(self) -> Dict[str, Any]:
+        elapsed = self._duration
+        if elapsed is None and self._started_at is not None:
+            elapsed = time.perf_counter() - self._started_at
+        return {
+            'ready': self.ready,
+            'duration': round(elapsed, 4) if elapsed is not None else None,
+            # Finished steps that did not succeed; their features run in a fallback mode
+            'degraded': [step.name for step in self._steps if self.ready and step.status != 'ok'],
+            'steps': {step.name: step.to_dict() for step in self._steps}
+        }
+
+    async def _retry(self, step: WarmupStep) -> None:
+        delay = self.retry_interval
+        while step.status != 'ok':
+            step.status = 'retrying'
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.retry_max)
+            await self._run_step(step)
+        step.error = None
+        self.logger.info("Warm-up step recovered", step=step.name, attempts=step.attempts)
+
+    async def _run_step(self, step: WarmupStep) -> None:
+        step.attempts += 1
+        step.status = 'running'
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(step.call(), self.timeout)
+            step.status = 'ok'
+        except asyncio.TimeoutError:
+            step.status, step.error = 'timeout', f"exceeded {self.timeout}s"
+        except Exception as e:
+            step.status, step.error = 'failed', str(e) or type(e).__name__
+        finally:
+            step.duration = time.perf_counter() - started
+        if step.status != 'ok':
+            self.logger.warning("Warm-up step did not complete", step=step.name, status=step.status,
+                                error=step.error)
@@ -0,0 +1,13 @@
+"""
+DeFi Agent System - Store Package
+
+Contains storage for agent service state such as conversation contexts.
+"""
+
+from .conversations import ConversationStore, SQLiteConversationTier
+from .history import ConversationHistory, JSONLHistoryArchive
+from .locks import KeyedLockManager
+from .shared import ConversationConflictError, InMemoryKV, SharedConversationStore, SQLiteKV
+
+__all__ = ['ConversationStore', 'SQLiteConversationTier', 'ConversationHistory', 'JSONLHistoryArchive',
+           'KeyedLockManager', 'ConversationConflictError', 'InMemoryKV', 'SharedConversationStore', 'SQLiteKV']
\ No newline at end of file
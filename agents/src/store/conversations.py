@@ -0,0 +1,293 @@
+"""
+Conversation Store
+
+Bounded in-memory store of conversation contexts with LRU and idle-TTL
+eviction. Evicted conversations can spill to a persistent tier (SQLite by
+default) and are reloaded from it transparently on the next access.
+"""
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import structlog
+
+logger = structlog.get_logger()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    conversation_id TEXT PRIMARY KEY,
+    context TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+class SQLiteConversationTier:
+    """
+    Persistent tier holding conversations evicted from memory.
+
+    Any object with the same ``load`` / ``save_many`` / ``delete`` / ``count``
+    / ``close`` methods can be plugged into :class:`ConversationStore`
+    instead. Methods are synchronous and are called from a worker thread.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def load(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT context FROM conversations WHERE conversation_id = ?", (conversation_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save_many(self, items: List[Tuple[str, str]]) -> None:
+        """Write ``(conversation_id, serialized context)`` pairs in one transaction"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO conversations (conversation_id, context, updated_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(conversation_id) DO UPDATE SET context = excluded.context, "
+                    "updated_at = excluded.updated_at",
+                    [(conversation_id, payload, now) for conversation_id, payload in items]
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def delete(self, conversation_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM conversations WHERE conversation_id = ?", (conversation_id,))
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+@dataclass
+class _Entry:
+    context: Dict[str, Any]
+    size: int
+    last_access: float
+
+
+class ConversationStore:
+    """
+    Memory-capped conversation store.
+
+    Entries are kept in LRU order, so idle-TTL expiry and capacity eviction
+    both pop from the cold end. Without a persistent tier, evicted
+    conversations are dropped. ``on_drop`` is called with the IDs of
+    conversations that are gone for good (dropped on eviction, or deleted),
+    so data kept elsewhere for them, such as archived history, can go too.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        max_bytes: int = 64 * 1024 * 1024,
+        idle_ttl: Optional[float] = 3600.0,
+        tier: Optional[SQLiteConversationTier] = None,
+        on_drop: Optional[Callable[[List[str]], Awaitable[None]]] = None
+    ):
+        self.max_entries = max(1, max_entries)
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self.tier = tier
+        self.on_drop = on_drop
+        self.logger = logger.bind(component="ConversationStore")
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._bytes = 0
+        # Evicted contexts not yet written to the tier, still readable
+        self._spilling: Dict[str, Dict[str, Any]] = {}
+        # Rows in the persistent tier, refreshed off the event loop by refresh_counts()
+        self._persisted = 0
+        self._stats = {
+            'hits': 0, 'misses': 0, 'reloads': 0, 'spilled': 0, 'spill_failures': 0,
+            'evicted_lru': 0, 'evicted_ttl': 0, 'evicted_memory': 0
+        }
+
+    async def get(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Return a conversation context, reloading it from the persistent tier if evicted
+
+        Args:
+            conversation_id: The conversation to look up
+
+        Returns:
+            The context, or None if the conversation is unknown
+        """
+        now = time.monotonic()
+        await self._expire(now)
+        entry = self._entries.get(conversation_id)
+        if entry is not None:
+            self._stats['hits'] += 1
+            entry.last_access = now
+            self._entries.move_to_end(conversation_id)
+            return entry.context
+
+        context = self._spilling.get(conversation_id)
+        if context is None and self.tier is not None:
+            context = await asyncio.to_thread(self.tier.load, conversation_id)
+            # The conversation may have been stored while the tier was read
+            if conversation_id in self._entries:
+                return await self.get(conversation_id)
+        if context is None:
+            self._stats['misses'] += 1
+            return None
+
+        self._stats['reloads'] += 1
+        await self.put(conversation_id, context)
+        return context
+
+    async def put(self, conversation_id: str, context: Dict[str, Any]) -> None:
+        """Store a conversation context, evicting cold conversations if over capacity"""
+        size = len(json.dumps(context, default=str))
+        previous = self._entries.pop(conversation_id, None)
+        if previous is not None:
+            self._bytes -= previous.size
+        self._spilling.pop(conversation_id, None)
+
+        self._entries[conversation_id] = _Entry(context=context, size=size, last_access=time.monotonic())
+        self._bytes += size
+
+        evicted: List[Tuple[str, Dict[str, Any]]] = []
+        while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            reason = 'evicted_lru' if len(self._entries) > self.max_entries else 'evicted_memory'
+            evicted.append(self._evict_oldest(reason))
+        await self._spill(evicted)
+
+    async def update(
+        self,
+        conversation_id: str,
+        mutate: Callable[[Dict[str, Any]], None],
+        default: Optional[Callable[[], Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        """
+        Apply *mutate* to a conversation context and store the result
+
+        Args:
+            conversation_id: The conversation to update
+            mutate: Function changing the context in place
+            default: Factory for the context of a new conversation
+
+        Returns:
+            The stored context
+
+        Raises:
+            KeyError: If the conversation is unknown and no default is given
+        """
+        context = await self.get(conversation_id)
+        if context is None:
+            if default is None:
+                raise KeyError(conversation_id)
+            context = default()
+        mutate(context)
+        await self.put(conversation_id, context)
+        return context
+
+    async def delete(self, conversation_id: str) -> None:
+        entry = self._entries.pop(conversation_id, None)
+        if entry is not None:
+            self._bytes -= entry.size
+        self._spilling.pop(conversation_id, None)
+        if self.tier is not None:
+            await asyncio.to_thread(self.tier.delete, conversation_id)
+        await self._dropped([conversation_id])
+
+    async def close(self) -> None:
+        """Flush in-memory conversations to the persistent tier and close it"""
+        if self.tier is None:
+            return
+        await self._spill(list((cid, entry.context) for cid, entry in self._entries.items()))
+        self.tier.close()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def refresh_counts(self) -> None:
+        """Recount the persistent tier for :meth:`stats`, in a thread"""
+        if self.tier is not None:
+            self._persisted = await asyncio.to_thread(self.tier.count)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+            'persisted': self._persisted
+        }
+
+    async def _expire(self, now: float) -> None:
+        if not self.idle_ttl:
+            return
+        evicted = []
+        while self._entries:
+            oldest = next(iter(self._entries.values()))
+            if now - oldest.last_access < self.idle_ttl:
+                break
+            evicted.append(self._evict_oldest('evicted_ttl'))
+        await self._spill(evicted)
+
+    def _evict_oldest(self, reason: str) -> Tuple[str, Dict[str, Any]]:
+        conversation_id, entry = self._entries.popitem(last=False)
+        self._bytes -= entry.size
+        self._stats[reason] += 1
+        if self.tier is not None:
+            self._spilling[conversation_id] = entry.context
+        return conversation_id, entry.context
+
+    async def _dropped(self, conversation_ids: List[str]) -> None:
+        if not conversation_ids or self.on_drop is None:
+            return
+        try:
+            await self.on_drop(conversation_ids)
+        except Exception as e:
+            self.logger.warning("on_drop callback failed", count=len(conversation_ids), error=str(e))
+
+    async def _spill(self, evicted: List[Tuple[str, Dict[str, Any]]]) -> None:
+        if not evicted:
+            return
+        if self.tier is None:
+            await self._dropped([cid for cid, _ in evicted])
+            return
+        items = [(cid, json.dumps(context, default=str)) for cid, context in evicted]
+        try:
+            await asyncio.to_thread(self.tier.save_many, items)
+        except Exception as e:
+            self.logger.error("Failed to spill conversations", count=len(items), error=str(e))
+            self._stats['spill_failures'] += 1
+            failed = True
+        else:
+            self._stats['spilled'] += len(items)
+            failed = False
+        now = time.monotonic()
+        for (cid, context), (_, payload) in zip(evicted, items):
+            # Contexts re-admitted in the meantime are already back in memory
+            if self._spilling.get(cid) is not context:
+                continue
+            del self._spilling[cid]
+            if failed:
+                # Keep the conversation in memory, at the cold end, so the next eviction retries the write
+                self._entries[cid] = _Entry(context=context, size=len(payload), last_access=now)
+                self._entries.move_to_end(cid, last=False)
+                self._bytes += len(payload)
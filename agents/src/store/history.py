@@ -0,0 +1,217 @@
+"""
+Conversation History
+
+Keeps only the most recent messages of a conversation inside its context,
+as a fixed-size window, and moves older ones to an append-only archive on
+disk. Contexts stay the same size however long a session runs; the full
+history is read back from the archive only when asked for. Archives of
+dropped conversations are deleted, and archives not written to for the
+retention period are pruned.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import structlog
+
+logger = structlog.get_logger()
+
+
+class JSONLHistoryArchive:
+    """
+    Append-only message log with one JSONL file per conversation.
+
+    Every line is a message plus its ``seq`` (position in the conversation),
+    so a page can be read without loading the rest of the conversation and
+    a batch written twice is read back once. Methods are synchronous and are
+    called from a worker thread.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, conversation_id: str) -> str:
+        # Conversation IDs come from clients; hash them into safe file names
+        name = hashlib.sha256(conversation_id.encode('utf-8')).hexdigest()[:32]
+        return os.path.join(self.directory, f"{name}.jsonl")
+
+    def append(self, conversation_id: str, first_seq: int, messages: List[Dict[str, Any]]) -> None:
+        lines = ''.join(
+            json.dumps({'seq': first_seq + i, **message}, separators=(',', ':')) + '\n'
+            for i, message in enumerate(messages)
+        )
+        # One write per batch, so concurrent writers' batches don't interleave
+        with open(self._path(conversation_id), 'a', encoding='utf-8') as f:
+            f.write(lines)
+
+    def read(self, conversation_id: str, start: int = 0,
+             limit: Optional[int] = None) -> List[Tuple[int, Dict[str, Any]]]:
+        """Return ``(seq, message)`` for archived messages with ``start <= seq < start + limit``, in order"""
+        end = start + limit if limit is not None else None
+        found: Dict[int, Dict[str, Any]] = {}
+        try:
+            with open(self._path(conversation_id), 'r', encoding='utf-8') as f:
+                for line in f:
+                    message = json.loads(line)
+                    seq = message.pop('seq')
+                    if seq >= start and (end is None or seq < end):
+                        found.setdefault(seq, message)
+                        if end is not None and len(found) == end - start:
+                            break
+        except FileNotFoundError:
+            return []
+        return [(seq, found[seq]) for seq in sorted(found)]
+
+    def delete(self, conversation_id: str) -> None:
+        try:
+            os.remove(self._path(conversation_id))
+        except FileNotFoundError:
+            pass
+
+    def prune(self, cutoff: float) -> int:
+        """Remove archives last appended to before *cutoff* (a ``time.time()`` value)"""
+        removed = 0
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if not entry.name.endswith('.jsonl'):
+                    continue
+                try:
+                    if entry.stat().st_mtime < cutoff:
+                        os.remove(entry.path)
+                        removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
+
+
+class ConversationHistory:
+    """
+    Bounds ``context["history"]`` to the last ``window`` messages.
+
+    ``context["history_offset"]`` counts the messages moved out of the
+    window, i.e. the position of the first message still in it. Without an
+    archive, messages leaving the window are dropped.
+
+    With a ``retention`` (seconds), archives idle for longer are removed,
+    checked at most every ``prune_interval`` seconds while archiving.
+    """
+
+    def __init__(self, tier: Optional[JSONLHistoryArchive] = None, window: int = 20,
+                 retention: Optional[float] = None, prune_interval: float = 3600.0):
+        self.tier = tier
+        self.window = max(1, window)
+        self.retention = retention
+        self.prune_interval = prune_interval
+        self.logger = logger.bind(component="ConversationHistory")
+        self._pruned_at = 0.0
+        self._stats = {'archived': 0, 'dropped': 0, 'archive_reads': 0, 'archive_failures': 0,
+                       'deleted': 0, 'pruned': 0}
+
+    def append(self, context: Dict[str, Any], messages: List[Dict[str, Any]]) -> Tuple[int, List[Dict[str, Any]]]:
+        """
+        Add messages to a context's window (synchronous; safe inside store mutations)
+
+        Returns:
+            ``(seq of the first overflowed message, overflowed messages)`` to pass to :meth:`archive`
+        """
+        history = context.setdefault("history", [])
+        history.extend(messages)
+        overflow = history[:-self.window]
+        first_seq = context.get("history_offset", 0)
+        if overflow:
+            del history[:-self.window]
+            context["history_offset"] = first_seq + len(overflow)
+        return first_seq, overflow
+
+    async def archive(self, conversation_id: str, first_seq: int, messages: List[Dict[str, Any]]) -> None:
+        """
+        Write messages that left a conversation's window to the archive
+
+        The turn they belong to is already committed, so a failed write is
+        logged and counted rather than raised; those messages are lost.
+        """
+        if not messages:
+            return
+        if self.tier is None:
+            self._stats['dropped'] += len(messages)
+            return
+        try:
+            await asyncio.to_thread(self.tier.append, conversation_id, first_seq, messages)
+        except Exception as e:
+            self._stats['archive_failures'] += 1
+            self._stats['dropped'] += len(messages)
+            self.logger.error("Failed to archive messages", conversation_id=conversation_id,
+                              count=len(messages), error=str(e))
+            return
+        self._stats['archived'] += len(messages)
+        await self._maybe_prune()
+
+    async def read(self, conversation_id: str, context: Dict[str, Any], offset: int = 0,
+                   limit: Optional[int] = None) -> Tuple[int, List[Dict[str, Any]]]:
+        """
+        Return consecutive messages from ``offset`` onwards, from the archive and then the window
+
+        Messages missing from the archive (dropped, or lost to a failed write)
+        are skipped: the page starts at the first message found after
+        ``offset`` and ends before the next missing one, so it never spans a gap.
+
+        Args:
+            conversation_id: The conversation
+            context: Its current context
+            offset: Position of the first message to return
+            limit: Maximum number of messages (all remaining if None)
+
+        Returns:
+            ``(position of the first returned message, messages)``
+        """
+        window_start = context.get("history_offset", 0)
+        history = context.get("history", [])
+        start, messages = offset, []
+        if offset < window_start:
+            archived: List[Tuple[int, Dict[str, Any]]] = []
+            if self.tier is not None:
+                archived_limit = window_start - offset if limit is None else min(limit, window_start - offset)
+                self._stats['archive_reads'] += 1
+                archived = await asyncio.to_thread(self.tier.read, conversation_id, offset, archived_limit)
+            start = archived[0][0] if archived else window_start
+            for seq, message in archived:
+                if seq != start + len(messages):
+                    break
+                messages.append(message)
+            if start + len(messages) < window_start:
+                # The limit was reached, or the next message is missing
+                return start, messages
+        remaining = None if limit is None else limit - len(messages)
+        position = start + len(messages) - window_start
+        messages.extend(history[position:] if remaining is None else history[position:position + max(0, remaining)])
+        return start, messages
+
+    async def delete(self, conversation_ids: Iterable[str]) -> None:
+        """Remove the archives of conversations that no longer exist"""
+        if self.tier is None:
+            return
+        conversation_ids = list(conversation_ids)
+
+        def delete_all() -> None:
+            for conversation_id in conversation_ids:
+                self.tier.delete(conversation_id)
+
+        await asyncio.to_thread(delete_all)
+        self._stats['deleted'] += len(conversation_ids)
+
+    async def _maybe_prune(self) -> None:
+        now = time.time()
+        if self.retention is None or now - self._pruned_at < self.prune_interval:
+            return
+        self._pruned_at = now
+        try:
+            self._stats['pruned'] += await asyncio.to_thread(self.tier.prune, now - self.retention)
+        except OSError as e:
+            self.logger.warning("Failed to prune history archives", error=str(e))
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, 'window': self.window}
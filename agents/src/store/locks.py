@@ -0,0 +1,90 @@
+"""
+Keyed Locks
+
+Per-key async locks so requests for one conversation run one at a time, in
+arrival order, while requests for different conversations run in parallel.
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable
+import structlog
+
+logger = structlog.get_logger()
+
+
+class _KeyLock:
+    __slots__ = ('lock', 'users')
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        # Holders plus waiters; the entry is dropped when this reaches zero
+        self.users = 0
+
+
+class KeyedLockManager:
+    """
+    Hands out one FIFO lock per key.
+
+    Lock objects only exist while someone holds or waits for them, so the
+    number of entries is bounded by the number of in-flight requests rather
+    than the number of conversations ever seen. Duplicate requests are
+    coalesced by the job queue before they get here.
+    """
+
+    def __init__(self):
+        self.logger = logger.bind(component="KeyedLockManager")
+        self._locks: Dict[Hashable, _KeyLock] = {}
+        self._stats = {'acquired': 0, 'contended': 0, 'wait_seconds_total': 0.0,
+                       'wait_seconds_max': 0.0}
+
+    @asynccontextmanager
+    async def lock(self, key: Hashable) -> AsyncIterator[None]:
+        """Hold the lock for *key* for the duration of the block"""
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = _KeyLock()
+        entry.users += 1
+        try:
+            if entry.lock.locked():
+                self._stats['contended'] += 1
+            started = time.perf_counter()
+            await entry.lock.acquire()
+            waited = time.perf_counter() - started
+            self._stats['acquired'] += 1
+            self._stats['wait_seconds_total'] += waited
+            if waited > self._stats['wait_seconds_max']:
+                self._stats['wait_seconds_max'] = waited
+            try:
+                yield
+            finally:
+                entry.lock.release()
+        finally:
+            entry.users -= 1
+            if entry.users == 0 and self._locks.get(key) is entry:
+                del self._locks[key]
+
+    async def run(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run *call* under the lock for *key*
+
+        Args:
+            key: Serialization key, e.g. a conversation ID
+            call: Coroutine factory to run while holding the lock
+
+        Returns:
+            The result of *call*
+        """
+        async with self.lock(key):
+            return await call()
+
+    def stats(self) -> Dict[str, Any]:
+        acquired = self._stats['acquired']
+        return {
+            **self._stats,
+            'wait_seconds_total': round(self._stats['wait_seconds_total'], 6),
+            'wait_seconds_max': round(self._stats['wait_seconds_max'], 6),
+            'wait_seconds_avg': round(self._stats['wait_seconds_total'] / acquired, 6) if acquired else 0.0,
+            'active_keys': len(self._locks)
+        }
@@ -0,0 +1,234 @@
+"""
+Shared Conversation State
+
+Conversation contexts kept in a key-value store shared by every worker
+process, with versioned compare-and-swap updates so concurrent writers on
+different workers never silently overwrite each other.
+"""
+
+import asyncio
+import json
+import random
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+import structlog
+
+logger = structlog.get_logger()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversation_kv (
+    key TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    value TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+class ConversationConflictError(RuntimeError):
+    """Raised when a conversation keeps changing underneath an update"""
+
+    def __init__(self, conversation_id: str, attempts: int):
+        super().__init__(f"Conversation {conversation_id} was modified concurrently ({attempts} attempts)")
+        self.conversation_id = conversation_id
+
+
+class InMemoryKV:
+    """
+    Process-local stand-in for a shared KV store.
+
+    Implements the same synchronous ``get`` / ``compare_and_swap`` /
+    ``delete`` / ``count`` / ``close`` interface as :class:`SQLiteKV`.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data: Dict[str, Tuple[int, str]] = {}
+
+    def get(self, key: str) -> Optional[Tuple[int, str]]:
+        with self._lock:
+            return self._data.get(key)
+
+    def compare_and_swap(self, key: str, expected_version: Optional[int], value: str) -> Optional[int]:
+        """
+        Write *value* if the stored version equals *expected_version*
+
+        ``expected_version`` 0 means the key must not exist yet; None writes
+        unconditionally.
+
+        Returns:
+            The new version, or None if the expected version did not match
+        """
+        with self._lock:
+            current = self._data.get(key, (0, None))[0]
+            if expected_version is not None and current != expected_version:
+                return None
+            self._data[key] = (current + 1, value)
+            return current + 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def count(self) -> int:
+        return len(self._data)
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteKV:
+    """
+    Versioned KV store in a SQLite database in WAL mode.
+
+    Every worker process opens its own connection to the same file. Each
+    compare-and-swap is a single conditional statement, so it is atomic
+    across processes without holding a transaction open.
+    """
+
+    def __init__(self, path: str, busy_timeout: float = 5.0):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=busy_timeout, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def get(self, key: str) -> Optional[Tuple[int, str]]:
+        with self._lock:
+            row = self._conn.execute("SELECT version, value FROM conversation_kv WHERE key = ?", (key,)).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def compare_and_swap(self, key: str, expected_version: Optional[int], value: str) -> Optional[int]:
+        """See :meth:`InMemoryKV.compare_and_swap`"""
+        now = time.time()
+        with self._lock:
+            if expected_version is None:
+                row = self._conn.execute(
+                    "INSERT INTO conversation_kv (key, version, value, updated_at) VALUES (?, 1, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET version = version + 1, value = excluded.value, "
+                    "updated_at = excluded.updated_at RETURNING version",
+                    (key, value, now)
+                ).fetchone()
+                return row[0]
+            if expected_version == 0:
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO conversation_kv (key, version, value, updated_at) VALUES (?, 1, ?, ?)",
+                    (key, value, now)
+                )
+            else:
+                cursor = self._conn.execute(
+                    "UPDATE conversation_kv SET version = version + 1, value = ?, updated_at = ? "
+                    "WHERE key = ? AND version = ?",
+                    (value, now, key, expected_version)
+                )
+        return expected_version + 1 if cursor.rowcount else None
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM conversation_kv WHERE key = ?", (key,))
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM conversation_kv").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class SharedConversationStore:
+    """
+    Conversation store backed by a shared versioned KV.
+
+    Offers the same ``get`` / ``put`` / ``update`` / ``delete`` interface as
+    :class:`~store.conversations.ConversationStore`, so any worker can serve
+    any request of a conversation. Use :meth:`update` for read-modify-write
+    changes; it retries on version conflicts instead of losing writes.
+    """
+
+    def __init__(self, kv, max_attempts: int = 20, backoff_base: float = 0.002, backoff_max: float = 0.1):
+        self.kv = kv
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.logger = logger.bind(component="SharedConversationStore")
+        self._stats = {'reads': 0, 'misses': 0, 'writes': 0, 'conflicts': 0}
+        # Keys in the KV, refreshed off the event loop by refresh_counts()
+        self._entries = 0
+
+    async def get(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        """Return the latest context of a conversation, or None if unknown"""
+        versioned = await self._read(conversation_id)
+        return versioned[1] if versioned else None
+
+    async def put(self, conversation_id: str, context: Dict[str, Any]) -> None:
+        """Overwrite a conversation unconditionally"""
+        await asyncio.to_thread(self.kv.compare_and_swap, conversation_id, None, json.dumps(context, default=str))
+        self._stats['writes'] += 1
+
+    async def update(
+        self,
+        conversation_id: str,
+        mutate: Callable[[Dict[str, Any]], None],
+        default: Optional[Callable[[], Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        """
+        Apply *mutate* to the latest context and store it with compare-and-swap
+
+        Args:
+            conversation_id: The conversation to update
+            mutate: Function changing the context in place; may run more than once
+            default: Factory for the context of a new conversation
+
+        Returns:
+            The stored context
+
+        Raises:
+            KeyError: If the conversation is unknown and no default is given
+            ConversationConflictError: If every attempt lost a race
+        """
+        for attempt in range(self.max_attempts):
+            versioned = await self._read(conversation_id)
+            if versioned is None:
+                if default is None:
+                    raise KeyError(conversation_id)
+                version, context = 0, default()
+            else:
+                version, context = versioned
+            mutate(context)
+            stored = await asyncio.to_thread(
+                self.kv.compare_and_swap, conversation_id, version, json.dumps(context, default=str)
+            )
+            if stored is not None:
+                self._stats['writes'] += 1
+                return context
+            self._stats['conflicts'] += 1
+            # Jittered backoff keeps contending writers from retrying in lockstep
+            await asyncio.sleep(random.uniform(0, min(self.backoff_base * (2 ** attempt), self.backoff_max)))
+        self.logger.warning("Conversation update kept conflicting",
+                            conversation_id=conversation_id, attempts=self.max_attempts)
+        raise ConversationConflictError(conversation_id, self.max_attempts)
+
+    async def delete(self, conversation_id: str) -> None:
+        await asyncio.to_thread(self.kv.delete, conversation_id)
+
+    async def close(self) -> None:
+        self.kv.close()
+
+    async def refresh_counts(self) -> None:
+        """Recount the KV for :meth:`stats`, in a thread"""
+        self._entries = await asyncio.to_thread(self.kv.count)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, 'entries': self._entries}
+
+    async def _read(self, conversation_id: str) -> Optional[Tuple[int, Dict[str, Any]]]:
+        self._stats['reads'] += 1
+        row = await asyncio.to_thread(self.kv.get, conversation_id)
+        if row is None:
+            self._stats['misses'] += 1
+            return None
+        return row[0], json.loads(row[1])
@@ -7,12 +7,40 @@ the TypeScript DeFi Execution Engine backend.
 
 import uuid
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, TYPE_CHECKING
 import json
 import structlog
 
+from agents.entities import EntityIndex, default_index
+from service.metrics import stage
+from service.tracing import traced
+
+if TYPE_CHECKING:
+    from api.node_catalog import NodeCatalogIndex
+
 logger = structlog.get_logger()
 
+# Node types the generator knows how to label and configure
+NODE_LABELS = {
+    'walletConnector': 'Wallet Connection',
+    'tokenSelector': 'Token Selector',
+    'chainSelector': 'Chain Selector', 
+    'oneInchQuote': '1inch Quote',
+    'oneInchSwap': '1inch Swap',
+    'priceImpactCalculator': 'Price Impact Calculator',
+    'transactionMonitor': 'Transaction Monitor',
+    'transactionStatus': 'Transaction Status',
+    'fusionPlus': 'Fusion+ Cross-Chain',
+    'portfolioAPI': 'Portfolio Tracker',
+    'limitOrder': 'Limit Order',
+    'fusionSwap': 'Fusion Swap',
+    'defiDashboard': 'DeFi Dashboard',
+    'erc20Token': 'ERC20 Token'
+}
+
+# Patterns with a predefined node sequence or config overrides
+TEMPLATE_PATTERNS = ('DEX Aggregator', 'Cross-Chain Bridge', 'Limit Order Application', 'Portfolio Dashboard')
+
 class WorkflowGenerator:
     """
     Generates workflow definitions from AI agent requirements.
@@ -21,9 +49,19 @@ class WorkflowGenerator:
     the WorkflowDefinition format expected by the TypeScript backend.
     """
     
-    def __init__(self):
+    def __init__(self, entities: Optional[EntityIndex] = None):
         self.logger = logger.bind(component="WorkflowGenerator")
-        
+        # Token and chain lists; the shared index is loaded on first use when none is given
+        self._entities = entities
+
+    @property
+    def entities(self) -> EntityIndex:
+        if self._entities is None:
+            self._entities = default_index()
+        return self._entities
+        
+    @traced("generate_workflow")
+    @stage("generate_workflow")
     async def generate_workflow(self, requirements: Dict[str, Any]) -> Dict[str, Any]:
         """
         Generate a WorkflowDefinition from AI agent requirements
@@ -73,6 +111,22 @@ class WorkflowGenerator:
         
         return workflow_definition
         
+    async def warm_up(self, node_index: Optional["NodeCatalogIndex"] = None) -> int:
+        """
+        Generate and validate a workflow for every template pattern, plus one
+        using every known node type, so first requests skip cold code paths
+
+        Returns:
+            Number of workflows generated
+        """
+        samples = [{'pattern': pattern, 'tokens': ['ETH', 'USDC']} for pattern in TEMPLATE_PATTERNS]
+        samples.append({'pattern': 'Custom DeFi Application', 'tokens': ['ETH', 'USDC'],
+                        'features': ['limit orders'], 'suggested_nodes': list(NODE_LABELS)})
+        for requirements in samples:
+            workflow = await self.generate_workflow(requirements)
+            await self.validate_workflow(workflow, node_index=node_index)
+        return len(samples)
+        
     def _generate_workflow_name(self, requirements: Dict[str, Any]) -> str:
         """Generate a human-readable name for the workflow"""
         pattern = requirements.get('pattern', 'DeFi Application')
@@ -128,7 +182,9 @@ class WorkflowGenerator:
             ]
         
         nodes = []
-        
+        # Resolved once per workflow and shared by every node's config
+        chain_ids = self._chain_ids(chains)
+
         for i, node_type in enumerate(suggested_nodes):
             node_id = f"{node_type}-{i+1}"
             
@@ -138,7 +194,7 @@ class WorkflowGenerator:
                 "position": {"x": 100 + (i * 250), "y": 100 + (i % 3) * 150},  # Simple layout
                 "data": {
                     "label": self._get_node_label(node_type),
-                    "config": self._generate_node_config(node_type, requirements)
+                    "config": self._generate_node_config(node_type, requirements, chain_ids)
                 }
             }
             
@@ -146,29 +202,31 @@ class WorkflowGenerator:
             
         return nodes
         
-    def _generate_node_config(self, node_type: str, requirements: Dict[str, Any]) -> Dict[str, Any]:
+    def _chain_ids(self, chains: List[Any]) -> List[int]:
+        """Convert chain names to chain IDs; unknown names fall back to Ethereum (1)"""
+        return [self.entities.chain_id(chain) or 1 for chain in chains]
+
+    def _token_addresses(self, symbols: List[str], chain_ids: List[int]) -> Dict[str, Dict[str, str]]:
+        """Contract address of each symbol on each chain where the token lists know it"""
+        addresses = {}
+        for symbol in symbols:
+            by_chain = {}
+            for chain_id in chain_ids:
+                token = self.entities.resolve(symbol, chain_id)
+                if token is not None:
+                    by_chain[str(chain_id)] = token.address
+            if by_chain:
+                addresses[symbol] = by_chain
+        return addresses
+
+    def _generate_node_config(self, node_type: str, requirements: Dict[str, Any],
+                              chain_ids: Optional[List[int]] = None) -> Dict[str, Any]:
         """Generate configuration for specific node types"""
         
         tokens = requirements.get('tokens', [])
         features = requirements.get('features', [])
-        chains = requirements.get('chains', ['ethereum'])
-        
-        # Convert chain names to chain IDs
-        chain_ids = []
-        chain_mapping = {
-            'ethereum': 1,
-            'polygon': 137,
-            'arbitrum': 42161,
-            'optimism': 10,
-            'bsc': 56,
-            'avalanche': 43114
-        }
-        
-        for chain in chains:
-            if isinstance(chain, str):
-                chain_ids.append(chain_mapping.get(chain.lower(), 1))
-            else:
-                chain_ids.append(chain)
+        if chain_ids is None:
+            chain_ids = self._chain_ids(requirements.get('chains', ['ethereum']))
         
         # Base config for template mode - ALL nodes need this
         config = {
@@ -192,6 +250,7 @@ class WorkflowGenerator:
                 
             config.update({
                 "default_tokens": default_tokens,
+                "token_addresses": self._token_addresses(default_tokens, chain_ids),
                 "supported_chains": chain_ids,
                 "include_metadata": True,
                 "price_source": "1inch",
@@ -335,25 +394,7 @@ class WorkflowGenerator:
         
     def _get_node_label(self, node_type: str) -> str:
         """Get human-readable label for node type"""
-        
-        labels = {
-            'walletConnector': 'Wallet Connection',
-            'tokenSelector': 'Token Selector',
-            'chainSelector': 'Chain Selector', 
-            'oneInchQuote': '1inch Quote',
-            'oneInchSwap': '1inch Swap',
-            'priceImpactCalculator': 'Price Impact Calculator',
-            'transactionMonitor': 'Transaction Monitor',
-            'transactionStatus': 'Transaction Status',
-            'fusionPlus': 'Fusion+ Cross-Chain',
-            'portfolioAPI': 'Portfolio Tracker',
-            'limitOrder': 'Limit Order',
-            'fusionSwap': 'Fusion Swap',
-            'defiDashboard': 'DeFi Dashboard',
-            'erc20Token': 'ERC20 Token'
-        }
-        
-        return labels.get(node_type, node_type.title())
+        return NODE_LABELS.get(node_type, node_type.title())
         
     def _generate_edges(self, nodes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Generate edges to connect nodes in a logical flow"""
@@ -425,12 +466,17 @@ class WorkflowGenerator:
             }
         }
         
-    async def validate_workflow(self, workflow: Dict[str, Any]) -> Dict[str, Any]:
+    @traced("validate_workflow")
+    @stage("validate_workflow")
+    async def validate_workflow(self, workflow: Dict[str, Any],
+                                node_index: Optional["NodeCatalogIndex"] = None) -> Dict[str, Any]:
         """
         Validate a generated workflow definition
         
         Args:
             workflow: The workflow definition to validate
+            node_index: Optional backend node catalog index; when given, node types
+                and configs are checked against the backend's plugin schemas
             
         Returns:
             Validation result with any errors
@@ -450,6 +496,13 @@ class WorkflowGenerator:
                 node_errors = self._validate_node(node, i)
                 errors.extend(node_errors)
                 
+                if node_index is not None and not node_errors:
+                    schema_errors, schema_warnings = node_index.validate_node(
+                        node['type'], node['data']['config']
+                    )
+                    errors.extend(f"Node {i} ({node['id']}): {e}" for e in schema_errors)
+                    warnings.extend(f"Node {i} ({node['id']}): {w}" for w in schema_warnings)
+                
         # Validate edges
         if 'edges' in workflow and 'nodes' in workflow:
             edge_errors = self._validate_edges(workflow['edges'], workflow['nodes'])
@@ -0,0 +1,1027 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the agent service's state and request handling infrastructure.
+Runs entirely offline.
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+# Add src to path for imports
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from store.conversations import ConversationStore, SQLiteConversationTier
+
+
+def test_conversation_store_evicts_lru_and_reloads_from_tier(tmp_path):
+    """Conversations over capacity spill to SQLite and come back on access"""
+
+    async def run():
+        store = ConversationStore(max_entries=2, idle_ttl=None,
+                                  tier=SQLiteConversationTier(str(tmp_path / 'conversations.sqlite3')))
+        for i in range(3):
+            await store.put(f'conv-{i}', {'history': [{'role': 'user', 'content': str(i)}]})
+        await store.refresh_counts()
+        evicted = store.stats()
+        reloaded = await store.get('conv-0')
+        after = store.stats()
+        await store.close()
+        return evicted, reloaded, after
+
+    evicted, reloaded, after = asyncio.run(run())
+    assert evicted['entries'] == 2 and evicted['evicted_lru'] == 1 and evicted['persisted'] == 1
+    assert reloaded == {'history': [{'role': 'user', 'content': '0'}]}
+    assert after['reloads'] == 1 and after['entries'] == 2
+
+
+def test_conversation_store_keeps_conversations_whose_spill_failed(tmp_path):
+    """A failed write to the tier keeps evicted conversations in memory and retries on the next eviction"""
+
+    class FlakyTier(SQLiteConversationTier):
+        failures = 1
+
+        def save_many(self, items):
+            if self.failures:
+                self.failures -= 1
+                raise OSError('disk full')
+            super().save_many(items)
+
+    async def run():
+        store = ConversationStore(max_entries=1, idle_ttl=None, tier=FlakyTier(str(tmp_path / 'c.sqlite3')))
+        await store.put('conv-0', {'n': 0})
+        await store.put('conv-1', {'n': 1})
+        await store.refresh_counts()
+        failed = store.stats()
+        kept = await store.get('conv-0')
+        await store.put('conv-2', {'n': 2})
+        await store.refresh_counts()
+        stats = store.stats()
+        await store.close()
+        return failed, kept, stats
+
+    failed, kept, stats = asyncio.run(run())
+    assert failed['spill_failures'] == 1 and failed['entries'] == 2 and failed['persisted'] == 0
+    assert kept == {'n': 0}
+    assert stats['spilled'] >= 1 and stats['persisted'] >= 1
+
+
+def test_conversation_store_bounds_memory_and_expires_idle_entries():
+    """Without a tier, byte cap and idle TTL evictions drop conversations"""
+
+    async def run():
+        store = ConversationStore(max_entries=100, max_bytes=200, idle_ttl=0.05)
+        for i in range(5):
+            await store.put(f'conv-{i}', {'history': ['x' * 60]})
+        capped = store.stats()
+        await asyncio.sleep(0.06)
+        expired = await store.get('conv-4')
+        return capped, expired, store.stats()
+
+    capped, expired, stats = asyncio.run(run())
+    assert capped['bytes'] <= 200 and capped['evicted_memory'] >= 3
+    assert expired is None
+    assert stats['entries'] == 0 and stats['evicted_ttl'] >= 1 and stats['misses'] == 1
+
+
+
+def test_conversation_history_keeps_a_fixed_window_and_archives_the_rest(tmp_path):
+    """Contexts hold the last N messages; older ones are read back from the JSONL archive"""
+    from store.history import ConversationHistory, JSONLHistoryArchive
+
+    async def run():
+        history = ConversationHistory(JSONLHistoryArchive(str(tmp_path / 'history')), window=4)
+        context = {'history': []}
+        sizes = []
+        for i in range(10):
+            first_seq, overflow = history.append(context, [{'role': 'user', 'content': str(i)}])
+            await history.archive('conv', first_seq, overflow)
+            sizes.append(len(context['history']))
+        # A batch archived twice (e.g. a retried commit) is read back once
+        await history.archive('conv', 2, [{'role': 'user', 'content': '2'}])
+        everything = await history.read('conv', context)
+        page = await history.read('conv', context, offset=4, limit=4)
+        return context, sizes, everything, page, history.stats()
+
+    context, sizes, everything, page, stats = asyncio.run(run())
+    assert max(sizes) == 4 and context['history_offset'] == 6
+    assert everything[0] == 0 and [m['content'] for m in everything[1]] == [str(i) for i in range(10)]
+    assert page[0] == 4 and [m['content'] for m in page[1]] == ['4', '5', '6', '7']
+    assert stats['archived'] == 7 and stats['archive_reads'] == 2
+
+
+def test_conversation_history_pages_never_span_messages_missing_from_the_archive(tmp_path):
+    """A short archive moves the page start forward or ends the page early instead of leaving a gap"""
+    from store.history import ConversationHistory, JSONLHistoryArchive
+
+    async def run():
+        history = ConversationHistory(JSONLHistoryArchive(str(tmp_path / 'history')), window=2)
+        context = {'history': [{'content': '6'}, {'content': '7'}], 'history_offset': 6}
+        # Messages 0-1 were never archived and message 4 was lost to a failed write
+        await history.archive('conv', 2, [{'content': '2'}, {'content': '3'}])
+        await history.archive('conv', 5, [{'content': '5'}])
+        pages = [await history.read('conv', context, offset=offset, limit=limit)
+                 for offset, limit in ((0, 10), (4, 10), (4, 2), (6, 10))]
+        pages.append(await ConversationHistory(window=2).read('conv', context, offset=0, limit=10))
+        return [(start, [m['content'] for m in messages]) for start, messages in pages]
+
+    assert asyncio.run(run()) == [
+        (2, ['2', '3']),
+        (5, ['5', '6', '7']),
+        (5, ['5', '6']),
+        (6, ['6', '7']),
+        # Without an archive the page starts at the window
+        (6, ['6', '7'])
+    ]
+
+
+def test_conversation_history_archives_follow_dropped_conversations_and_retention(tmp_path):
+    """Dropped conversations lose their archives, idle archives are pruned, write errors are counted"""
+    from store.history import ConversationHistory, JSONLHistoryArchive
+
+    class FailingArchive(JSONLHistoryArchive):
+        def append(self, conversation_id, first_seq, messages):
+            if conversation_id == 'broken':
+                raise OSError('disk full')
+            super().append(conversation_id, first_seq, messages)
+
+    archive = FailingArchive(str(tmp_path / 'history'))
+    history = ConversationHistory(archive, window=1, retention=60, prune_interval=0)
+
+    async def run():
+        store = ConversationStore(max_entries=1, idle_ttl=None, on_drop=history.delete)
+        await history.archive('conv-0', 0, [{'content': 'old'}])
+        await history.archive('conv-1', 0, [{'content': 'old'}])
+        await store.put('conv-0', {})
+        await store.put('conv-1', {})  # evicts conv-0, which has no tier to go to
+        dropped = await history.read('conv-0', {'history_offset': 1})
+        await store.delete('conv-1')
+        deleted = await history.read('conv-1', {'history_offset': 1})
+        await history.archive('stale', 0, [{'content': 'old'}])
+        os.utime(archive._path('stale'), (0, 0))
+        await history.archive('broken', 0, [{'content': 'lost'}])  # logged, not raised
+        await history.archive('fresh', 0, [{'content': 'new'}])
+        return dropped, deleted, await history.read('stale', {'history_offset': 1}), history.stats()
+
+    dropped, deleted, stale, stats = asyncio.run(run())
+    assert dropped == deleted == stale == (1, [])
+    assert stats['deleted'] == 2 and stats['pruned'] == 1
+    assert stats['archive_failures'] == 1 and stats['dropped'] == 1
+
+def test_shared_store_compare_and_swap_loses_no_updates(tmp_path):
+    """Two workers updating one conversation through the shared KV keep every turn"""
+    from store.shared import SharedConversationStore, SQLiteKV
+
+    path = str(tmp_path / 'shared.sqlite3')
+
+    async def run():
+        workers = [SharedConversationStore(SQLiteKV(path)) for _ in range(2)]
+        new = lambda: {'history': []}
+
+        async def turn(store, i):
+            await store.update('conv-1', lambda c: c['history'].append(i), default=new)
+
+        await asyncio.gather(*[turn(workers[i % 2], i) for i in range(40)])
+        context = await workers[1].get('conv-1')
+        stats = [store.stats() for store in workers]
+        for store in workers:
+            await store.close()
+        return context, stats
+
+    context, stats = asyncio.run(run())
+    assert sorted(context['history']) == list(range(40))
+    assert sum(s['writes'] for s in stats) == 40
+
+
+def test_kv_compare_and_swap_rejects_stale_versions():
+    """A write based on an outdated version is refused"""
+    from store.shared import InMemoryKV
+
+    kv = InMemoryKV()
+    assert kv.compare_and_swap('k', 0, 'a') == 1
+    assert kv.compare_and_swap('k', 0, 'b') is None
+    assert kv.compare_and_swap('k', 1, 'b') == 2
+    assert kv.compare_and_swap('k', 1, 'c') is None
+    assert kv.get('k') == (2, 'b')
+
+
+def test_keyed_locks_serialize_per_key_and_parallelize_across_keys():
+    """Same-key calls run one at a time in order; other keys are not blocked"""
+    from store.locks import KeyedLockManager
+
+    locks = KeyedLockManager()
+    events = []
+
+    async def call(key, i):
+        async def body():
+            events.append(('start', key, i))
+            await asyncio.sleep(0.02)
+            events.append(('end', key, i))
+            return i
+        return await locks.run(key, body)
+
+    async def run():
+        started = asyncio.get_running_loop().time()
+        results = await asyncio.gather(*[call('a', i) for i in range(3)], *[call(f'b{i}', i) for i in range(3)])
+        return results, asyncio.get_running_loop().time() - started
+
+    results, elapsed = asyncio.run(run())
+    a_events = [e for e in events if e[1] == 'a']
+    assert a_events == [(kind, 'a', i) for i in range(3) for kind in ('start', 'end')]
+    assert elapsed < 0.06 + 0.05 and results[:3] == [0, 1, 2]
+    stats = locks.stats()
+    assert stats['active_keys'] == 0 and stats['contended'] == 2 and stats['wait_seconds_max'] > 0
+
+
+def test_job_queue_runs_by_priority_and_rejects_when_full():
+    """Higher priority jobs run first and overflow is refused with a retry hint"""
+    from service.jobs import JobQueue, JobQueueConfig, QueueFullError
+
+    order = []
+
+    async def handler(payload):
+        order.append(payload)
+        await asyncio.sleep(0.01)
+        return payload * 2
+
+    async def run():
+        queue = JobQueue(handler, JobQueueConfig(workers=1, max_queue=3))
+        await queue.start()
+        blocker = queue.submit('first')
+        await asyncio.sleep(0)  # let the single worker pick it up
+        low = queue.submit('low')
+        high = queue.submit('high', priority=5)
+        queue.submit('mid', priority=1)
+        try:
+            queue.submit('overflow')
+        except QueueFullError as e:
+            rejected = e
+        else:
+            rejected = None
+        done = [await queue.wait(job.id) for job in (blocker, low, high)]
+        stats = queue.stats()
+        await queue.stop()
+        return done, rejected, stats
+
+    done, rejected, stats = asyncio.run(run())
+    assert order == ['first', 'high', 'mid', 'low']
+    assert [job.result for job in done] == ['firstfirst', 'lowlow', 'highhigh']
+    assert rejected is not None and rejected.retry_after >= 1
+    assert stats['rejected'] == 1 and stats['completed'] == 4 and stats['max_depth'] == 3
+    assert stats['wait_seconds_max'] > 0
+
+
+def test_job_queue_wait_times_out_and_records_failures():
+    """A short wait returns the job still running; handler errors mark it failed"""
+    from service.jobs import JobQueue
+
+    async def handler(payload):
+        await asyncio.sleep(0.05)
+        raise ValueError(payload)
+
+    async def run():
+        queue = JobQueue(handler)
+        await queue.start()
+        job = queue.submit('boom')
+        early = (await queue.wait(job.id, timeout=0.01)).status
+        final = await queue.wait(job.id)
+        await queue.stop()
+        return early, final
+
+    early, final = asyncio.run(run())
+    assert early in ('queued', 'running')
+    assert final.status == 'failed' and final.error == 'boom'
+
+
+
+def test_job_queue_chains_jobs_with_a_key_without_holding_workers():
+    """Jobs of one key run one at a time and leave the other workers free; held duplicates coalesce"""
+    from service.jobs import JobQueue, JobQueueConfig
+
+    running, order = set(), []
+
+    async def handler(payload):
+        key, name = payload
+        assert key not in running
+        running.add(key)
+        order.append(name)
+        await asyncio.sleep(0.05 if key == 'conv' else 0.01)
+        running.discard(key)
+        return name
+
+    async def run():
+        queue = JobQueue(handler, JobQueueConfig(workers=2))
+        await queue.start()
+        jobs = [queue.submit(('conv', f'turn-{i}'), key='conv', dedupe=f'turn-{i}') for i in range(3)]
+        duplicate = queue.submit(('conv', 'turn-2'), key='conv', dedupe='turn-2')
+        held = queue.stats()['held']
+        await asyncio.sleep(0.005)
+        other = queue.submit(('other', 'other'), key='other')
+        await queue.wait(other.id)
+        # The other conversation finished while the first was still working through its turns
+        progress = list(order)
+        for job in jobs:
+            await queue.wait(job.id)
+        stats = queue.stats()
+        await queue.stop()
+        return jobs, duplicate, held, progress, stats
+
+    jobs, duplicate, held, progress, stats = asyncio.run(run())
+    assert duplicate is jobs[2] and held == 2
+    assert progress == ['turn-0', 'other']
+    assert [job.result for job in jobs] == ['turn-0', 'turn-1', 'turn-2']
+    assert stats['coalesced'] == 1 and stats['completed'] == 4 and stats['held'] == 0
+
+
+
+def test_fair_scheduler_shares_workers_by_weight_and_serves_interactive_first():
+    """A bulk backlog doesn't delay interactive jobs; backlogged tenants split workers by weight"""
+    from service.fairshare import FairScheduler, FairShareConfig, TenantPolicy
+    from service.jobs import JobQueue, JobQueueConfig
+
+    order = []
+
+    async def handler(payload):
+        order.append(payload)
+        await asyncio.sleep(0.005)
+
+    async def run():
+        config = FairShareConfig(tenants={'heavy': TenantPolicy(weight=2.0), 'capped': TenantPolicy(max_concurrency=1)})
+        queue = JobQueue(handler, JobQueueConfig(workers=1, max_queue=1000, max_queue_wait=1000),
+                         scheduler=FairScheduler(config))
+        await queue.start()
+        jobs = [queue.submit(('batch', i), tenant='importer', traffic_class='bulk') for i in range(20)]
+        jobs += [queue.submit(('heavy', i), tenant='heavy') for i in range(20)]
+        jobs += [queue.submit(('light', i), tenant='light') for i in range(20)]
+        for job in jobs:
+            await queue.wait(job.id)
+        await queue.stop()
+
+    asyncio.run(run())
+    # Every interactive job ran before the bulk backlog, and 'heavy' got twice the share of 'light'
+    assert all(tenant != 'batch' for tenant, _ in order[:40])
+    first = [tenant for tenant, _ in order[:30]]
+    assert first.count('heavy') == 20 and first.count('light') == 10
+    # Within a tenant, submission order is kept
+    assert [i for tenant, i in order if tenant == 'light'] == list(range(20))
+
+
+def test_fair_scheduler_enforces_tenant_concurrency_and_quota():
+    """Concurrency caps hold under load and a drained token bucket refuses with Retry-After"""
+    from service.fairshare import FairScheduler, FairShareConfig, TenantPolicy
+    from service.jobs import JobQueue, JobQueueConfig, QueueFullError
+
+    running = {'capped': 0, 'other': 0}
+    peak = {'capped': 0, 'other': 0}
+
+    async def handler(tenant):
+        running[tenant] += 1
+        peak[tenant] = max(peak[tenant], running[tenant])
+        await asyncio.sleep(0.01)
+        running[tenant] -= 1
+
+    async def run():
+        config = FairShareConfig(tenants={'capped': TenantPolicy(max_concurrency=1),
+                                          'metered': TenantPolicy(rate=0.5, burst=2)})
+        queue = JobQueue(handler, JobQueueConfig(workers=4), scheduler=FairScheduler(config))
+        await queue.start()
+        jobs = [queue.submit(tenant, tenant=tenant) for tenant in ['capped', 'other'] * 8]
+        for job in jobs:
+            await queue.wait(job.id)
+        admitted = [queue.submit('other', tenant='metered') for _ in range(2)]
+        try:
+            queue.submit('other', tenant='metered')
+            refused = None
+        except QueueFullError as e:
+            refused = e
+        for job in admitted:
+            await queue.wait(job.id)
+        stats = queue.stats()
+        await queue.stop()
+        return refused, stats
+
+    refused, stats = asyncio.run(run())
+    assert peak['capped'] == 1 and peak['other'] > 1
+    assert refused is not None and refused.retry_after >= 1.0
+    assert stats['rejected'] == 1 and stats['scheduler']['depth'] == {'interactive': 0, 'bulk': 0}
+
+def test_metrics_render_prometheus_text():
+    """Histograms render cumulative buckets; collectors become gauges"""
+    from service.metrics import MetricsRegistry, timed
+
+    registry = MetricsRegistry(namespace='test')
+    latency = registry.histogram('stage_seconds', 'Stage latency', ['stage'], buckets=(0.1, 1.0))
+    calls = registry.counter('calls_total', 'Calls', ['kind'])
+    registry.register_collector('store', lambda: {'entries': 3, 'nested': {'hit_ratio': 0.5}, 'name': 'x'})
+    registry.register_collector('broken', lambda: {}['missing'])
+
+    @timed(latency.labels('parse'))
+    def parse():
+        return 42
+
+    assert parse() == 42
+    latency.labels('llm').observe(0.5)
+    latency.labels('llm').observe(5.0)
+    calls.labels('a"b').inc()
+
+    text = registry.render()
+    assert 'test_stage_seconds_bucket{stage="llm",le="0.1"} 0' in text
+    assert 'test_stage_seconds_bucket{stage="llm",le="1"} 1' in text
+    assert 'test_stage_seconds_bucket{stage="llm",le="+Inf"} 2' in text
+    assert 'test_stage_seconds_count{stage="parse"} 1' in text
+    assert 'test_calls_total{kind="a\\"b"} 1' in text
+    assert 'test_store_entries 3' in text and 'test_store_nested_hit_ratio 0.5' in text
+    assert 'test_store_name' not in text
+    # A failing collector is counted, not silently dropped
+    assert 'test_collector_errors_total{collector="broken"} 1' in text
+
+
+def test_metrics_instrumentation_overhead_is_under_5us():
+    """A timed call costs less than 5 microseconds more than a plain call"""
+    import time
+    from service.metrics import MetricsRegistry, timed
+
+    child = MetricsRegistry(namespace='test').histogram('overhead_seconds', 'Overhead').labels()
+
+    def plain():
+        return None
+
+    instrumented = timed(child)(plain)
+    n = 20000
+
+    def per_call(func):
+        best = float('inf')
+        for _ in range(5):
+            started = time.perf_counter()
+            for _ in range(n):
+                func()
+            best = min(best, (time.perf_counter() - started) / n)
+        return best
+
+    overhead = per_call(instrumented) - per_call(plain)
+    assert overhead < 5e-6, f"{overhead * 1e6:.2f}us per call"
+
+
+def test_trace_propagates_through_job_queue_and_backend_headers():
+    """Spans opened in a job and backend requests join the request's trace"""
+    import httpx
+    from api.backend_client import DeFiBackendClient
+    from service.jobs import JobQueue
+    from service.tracing import InMemoryExporter, TRACER, traced
+
+    seen_headers = []
+
+    def backend(request):
+        seen_headers.append(dict(request.headers))
+        return httpx.Response(200, json={'status': 'healthy'})
+
+    @traced('work')
+    async def work(client):
+        return await client.health_check()
+
+    async def run():
+        client = DeFiBackendClient(transport=httpx.MockTransport(backend))
+        queue = JobQueue(work)
+        await queue.start()
+        with TRACER.span('POST /process', request_id='req-1') as root:
+            job = queue.submit(client)
+        await queue.wait(job.id)
+        await queue.stop()
+        await client.close()
+        return root
+
+    TRACER.exporter = InMemoryExporter()
+    root = asyncio.run(run())
+    spans = {span.name: span for span in TRACER.exporter.spans(request_id='req-1')}
+    assert set(spans) == {'POST /process', 'work', 'backend.health'}
+    assert spans['work'].parent_id == root.span_id
+    assert spans['backend.health'].parent_id == spans['work'].span_id
+    assert seen_headers[0]['x-request-id'] == 'req-1'
+    assert seen_headers[0]['traceparent'] == spans['backend.health'].traceparent
+
+
+def test_sampling_profiler_returns_collapsed_stacks():
+    """The profiler sees a busy thread's frames and renders flamegraph lines"""
+    import threading
+    import time
+    from service.profiler import SamplingProfiler, format_collapsed
+
+    stop = threading.Event()
+
+    def busy_loop():
+        while not stop.is_set():
+            sum(range(1000))
+
+    worker = threading.Thread(target=busy_loop, name='busy')
+    worker.start()
+    try:
+        counts = SamplingProfiler().profile(0.2, interval=0.005)
+    finally:
+        stop.set()
+        worker.join()
+
+    text = format_collapsed(counts)
+    busy = [line for line in text.splitlines() if line.startswith('busy;')]
+    assert busy and any('busy_loop (test_agent_service.py:' in line for line in busy)
+    assert all(line.rsplit(' ', 1)[1].isdigit() for line in text.splitlines())
+
+
+def test_service_import_skips_llm_stack_and_fits_time_budget():
+    """Importing the service loads no provider SDK and stays within the cold-start budget"""
+    import subprocess
+
+    budget = float(os.getenv('IMPORT_TIME_BUDGET', '1.0'))
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import main'],
+                            cwd=os.path.join(os.path.dirname(__file__), 'src'),
+                            capture_output=True, text=True, check=True)
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, microseconds, name = line.split('|')
+        cumulative[name.strip()] = int(microseconds) / 1e6
+
+    heavy = [name for name in cumulative if name.split('.')[0] in ('agno', 'openai', 'anthropic')]
+    assert heavy == []
+    assert cumulative['main'] < budget, f"import main took {cumulative['main']:.2f}s"
+
+
+def test_analysis_falls_back_to_rules_until_llm_loads():
+    """Requests are analyzed by the rule-based path before initialize() completes"""
+    from agents.architecture_mapper import ArchitectureMapperAgent
+
+    agent = ArchitectureMapperAgent(provider='openai', model_id='gpt-4o-mini')
+    assert not agent.ready
+    requirements = asyncio.run(agent.analyze_request('Create a swap application for ETH and USDC'))
+    assert requirements['pattern'] == agent._fallback_analysis('Create a swap application for ETH and USDC')['pattern']
+
+
+
+def test_model_routing_sends_simple_requests_to_fast_model_and_escalates_bad_answers():
+    """Simple prompts use the fast model; complex ones and rejected fast answers use the strong model"""
+    from agents.architecture_mapper import ArchitectureMapperAgent
+    from agents.routing import RoutingConfig
+
+    class StandInModel:
+        def __init__(self, answer):
+            self.answer = answer
+            self.prompts = []
+
+        async def arun(self, prompt):
+            self.prompts.append(prompt)
+            return self.answer(prompt)
+
+    swap = {'pattern': 'DEX Aggregator', 'tokens': ['ETH'], 'features': [], 'chains': ['ethereum'],
+            'user_intent': 'swap', 'suggested_nodes': ['walletConnector', 'oneInchSwap']}
+    agent = ArchitectureMapperAgent(model_id='strong', routing=RoutingConfig(fast_model_id='fast'))
+    agent._agent = StandInModel(lambda prompt: json.dumps(swap))
+    # The fast model invents a node type for anything mentioning limit orders
+    agent._fast_agent = StandInModel(lambda prompt: json.dumps(
+        {**swap, 'suggested_nodes': ['limitOrderBot']} if 'limit' in prompt else swap))
+
+    simple = 'make a portfolio tracker'
+    complex_request = ('Bridge USDC from Ethereum to Arbitrum, swap half of it to WBTC, then place a limit '
+                       'order to sell ETH on Polygon with MEV protection')
+    assert asyncio.run(agent.analyze_request(simple)) == swap
+    assert asyncio.run(agent.analyze_request(complex_request)) == swap
+    assert agent._fast_agent.prompts == [simple]
+    assert agent._agent.prompts == [complex_request]
+
+    assert asyncio.run(agent.analyze_request('create a limit order app')) == swap
+    assert agent._fast_agent.prompts[-1] == agent._agent.prompts[-1] == 'create a limit order app'
+
+    stats = agent.router.stats()
+    assert stats['routed'] == {'fast': 2, 'strong': 1}
+    assert stats['escalated'] == 1 and stats['escalation_rate'] == 0.5
+
+    # Without a fast model everything goes to the strong one
+    single = ArchitectureMapperAgent(model_id='strong')
+    single._agent = StandInModel(lambda prompt: json.dumps(swap))
+    asyncio.run(single.analyze_request(simple))
+    assert single.router.stats()['routed'] == {'fast': 0, 'strong': 1}
+
+    # Suggested nodes are checked against the backend catalog when one is loaded, else the known list
+    from api.node_catalog import NodeCatalogIndex
+    catalog = NodeCatalogIndex(['walletConnector'])
+    checked = ArchitectureMapperAgent(node_index=lambda: catalog)
+    assert checked._validation_error(swap) == "unknown node types ['oneInchSwap']"
+    catalog = None
+    assert checked._validation_error(swap) is None
+
+
+def test_standin_llm_provider_answers_with_rule_based_analysis(monkeypatch):
+    """AI_PROVIDER=standin loads without an SDK and analyzes only the user message, after a delay"""
+    from agents.architecture_mapper import ArchitectureMapperAgent
+
+    monkeypatch.setenv('STANDIN_LLM_LATENCY', '0.01,0.01')
+    agent = ArchitectureMapperAgent(provider='standin')
+
+    async def run():
+        await agent.initialize()
+        context = {'history': [{'role': 'user', 'content': 'hello'}]}
+        started = asyncio.get_running_loop().time()
+        requirements = await agent.analyze_request('Create a swap application for ETH and USDC', context)
+        return requirements, asyncio.get_running_loop().time() - started
+
+    requirements, elapsed = asyncio.run(run())
+    assert agent.ready and agent._agent.calls == 1
+    assert elapsed >= 0.01
+    assert requirements == agent._fallback_analysis('Create a swap application for ETH and USDC')
+
+def test_warmup_gates_readiness_and_primes_caches_with_standin_backend():
+    """Readiness waits for every warm-up step; failed or slow steps are reported, not fatal"""
+    from api.backend_client import DeFiBackendClient
+    from api.standin import StandInConfig, standin_transport
+    from service.warmup import Warmup
+    from workflow.generator import WorkflowGenerator
+
+    async def run():
+        client = DeFiBackendClient(transport=standin_transport(StandInConfig()))
+        generator = WorkflowGenerator()
+        generated = []
+
+        async def warm_backend():
+            await client.health_check()
+            await client.get_node_index()
+
+        async def warm_generator():
+            generated.append(await generator.warm_up(await client.get_node_index()))
+
+        async def unavailable():
+            raise ConnectionError('provider unreachable')
+
+        warmup = Warmup(timeout=0.2)
+        warmup.add('backend', warm_backend)
+        warmup.add('workflow_generator', warm_generator)
+        warmup.add('llm', unavailable)
+        warmup.add('slow', lambda: asyncio.sleep(5))
+        before = warmup.status()
+        task = asyncio.create_task(warmup.run())
+        early = await warmup.wait(timeout=0.01)
+        ready = await warmup.wait()
+        await task
+        catalog = client.node_catalog.stats()
+        await client.close()
+        return before, early, ready, warmup.status(), catalog, generated
+
+    before, early, ready, status, catalog, generated = asyncio.run(run())
+    assert before['ready'] is False and early is False and ready is True
+    steps = status['steps']
+    assert steps['backend']['status'] == 'ok' and steps['workflow_generator']['status'] == 'ok'
+    assert steps['llm'] == {'status': 'failed', 'duration': steps['llm']['duration'], 'error': 'provider unreachable'}
+    assert steps['slow']['status'] == 'timeout'
+    # The node catalog was fetched once and served from cache afterwards
+    assert catalog['fetched'] == 1 and catalog['hits'] >= 1
+    assert generated == [5]
+
+    # Without a node catalog the service still warms the generator, validating structure only
+    import types
+    import main
+
+    class Unreachable:
+        async def get_node_index(self):
+            raise ConnectionError('backend down')
+
+    class Recording(WorkflowGenerator):
+        async def warm_up(self, node_index=None):
+            generated.append(node_index)
+            return await super().warm_up(node_index)
+
+    asyncio.run(main.AppState._warm_generator(
+        types.SimpleNamespace(backend_client=Unreachable(), workflow_generator=Recording())))
+    assert generated == [5, None]
+
+
+def test_warmup_retries_failed_steps_in_the_background_and_reports_them_degraded():
+    """A retried step is listed as degraded until an attempt succeeds; cancelling run() stops retrying"""
+    from service.warmup import Warmup
+
+    async def run():
+        attempts = []
+
+        async def flaky():
+            attempts.append(len(attempts))
+            if len(attempts) < 3:
+                raise ConnectionError('provider unreachable')
+
+        warmup = Warmup(timeout=0.2, retry_interval=0.01, retry_max=0.02)
+        warmup.add('llm', flaky, retry=True)
+        warmup.add('once', lambda: asyncio.sleep(5))
+        task = asyncio.create_task(warmup.run())
+        await warmup.wait()
+        degraded = warmup.status()
+        await asyncio.wait_for(task, 1)
+        recovered = warmup.status()
+
+        async def down():
+            raise ConnectionError('still down')
+
+        stuck = Warmup(timeout=0.2, retry_interval=0.01)
+        stuck.add('llm', down, retry=True)
+        task = asyncio.create_task(stuck.run())
+        await stuck.wait()
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return degraded, recovered, stuck.status(), len(attempts)
+
+    degraded, recovered, stuck, calls = asyncio.run(run())
+    assert degraded['ready'] is True and degraded['degraded'] == ['llm', 'once']
+    assert degraded['steps']['llm']['status'] == 'retrying'
+    # Only the step registered with retry is attempted again
+    assert calls == 3 and recovered['degraded'] == ['once']
+    assert recovered['steps']['llm'] == {'status': 'ok', 'duration': recovered['steps']['llm']['duration'],
+                                         'error': None, 'attempts': 3}
+    assert recovered['steps']['once']['status'] == 'timeout' and 'attempts' not in recovered['steps']['once']
+    assert stuck['degraded'] == ['llm'] and stuck['steps']['llm']['attempts'] > 1
+    assert stuck['steps']['llm']['error'] == 'still down'
+
+
+
+def test_log_pipeline_writes_off_thread_samples_and_drops_when_full():
+    """Log calls only enqueue; a full queue drops and counts events instead of blocking"""
+    import threading
+    import structlog
+    from service.logs import LogConfig, LogPipeline
+
+    class BlockingStream:
+        def __init__(self):
+            self.lines, self.entered, self.release = [], threading.Event(), threading.Event()
+            self.threads = set()
+
+        def write(self, text):
+            self.threads.add(threading.current_thread().name)
+            self.entered.set()
+            self.release.wait(5)
+            self.lines.extend(text.splitlines())
+
+        def flush(self):
+            pass
+
+    stream = BlockingStream()
+    pipeline = LogPipeline(LogConfig(format='json', queue_size=3, sample_rates={'noisy': 0.5},
+                                     flush_interval=0), stream=stream)
+    pipeline.install()
+    try:
+        pipeline.start()
+        log = structlog.get_logger().bind(component='test')
+        log.info('first')
+        assert stream.entered.wait(5)  # the writer is now stuck in write()
+        log.debug('below level')
+        for i in range(4):
+            log.info('noisy', i=i)  # 2 kept
+        steps = ['queued']
+        for i in range(3):
+            log.info('burst', i=i, steps=steps)  # 1 fits in the queue, 2 dropped
+        steps.append('changed after logging')  # the queued event keeps what was logged
+        assert stream.threads == {'log-writer'}
+        stream.release.set()
+        pipeline.stop()  # writes what is still queued
+    finally:
+        structlog.reset_defaults()
+
+    assert [json.loads(line)['event'] for line in stream.lines] == ['first', 'noisy', 'noisy', 'burst']
+    assert json.loads(stream.lines[-1])['steps'] == ['queued']
+    stats = pipeline.stats()
+    assert stats['dropped'] == 2 and stats['written'] == 4 and stats['sampled_out'] == {'noisy': 2}
+
+def test_entity_index_matches_whole_words_and_resolves_addresses():
+    """Tokens and chains are found as whole words from the token lists; the generator gets addresses"""
+    from agents.entities import NATIVE_ADDRESS, EntityIndex, default_index
+    from workflow.generator import WorkflowGenerator
+
+    index = default_index()
+    found = index.recognize('Swap ETH to USDC on Arbitrum One, then bridge $link to BNB Smart Chain')
+    assert found.tokens == ['ETH', 'USDC', 'LINK'] and found.chains == ['arbitrum', 'bsc']
+    # No substring matches, and everyday words need a capital to count as a token or chain
+    assert index.recognize('a method to check whether ethereum is up').tokens == []
+    assert index.recognize('link my wallet to the base layer').tokens == []
+    usdc = index.recognize('send 0xa0b86991c6218b36c1d19d4a2e9eb0ce3606eb48 now')
+    assert usdc.tokens == ['USDC'] and usdc.addresses[0].chain_id == 1
+
+    assert index.chain_id('Polygon') == 137 and index.chain_id('optimism') == 10 and index.chain_id('nowhere') is None
+    assert index.resolve('usdc', 'arbitrum').address == '0xaf88d065e77c8cC2239327C5EDb3A432268e5831'
+    assert index.resolve('ETH', 42161).address == NATIVE_ADDRESS
+
+    workflow = asyncio.run(WorkflowGenerator(index).generate_workflow(
+        {'pattern': 'Custom DeFi Application', 'tokens': ['ETH', 'USDC'], 'chains': ['ethereum', 'polygon'],
+         'suggested_nodes': ['tokenSelector']}))
+    config = workflow['nodes'][0]['data']['config']
+    assert config['supported_chains'] == [1, 137]
+    assert config['token_addresses']['USDC'] == {'1': '0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48',
+                                                 '137': '0x3c499c542cEF5E3811e1192ce70d8cC03d5c3359'}
+
+    # Ten thousand listed tokens still leave the real ones recognizable, with the same answer
+    large = EntityIndex.load()
+    large.add_tokens([{'chainId': 1, 'address': '0x%040x' % i, 'symbol': f'TKN{i}', 'name': f'Token Number {i}',
+                       'decimals': 18} for i in range(10000)])
+    assert large.stats()['tokens'] >= 10000
+    assert large.recognize('Swap ETH for TKN9999 and Token Number 42').tokens == ['ETH', 'TKN9999', 'TKN42']
+
+
+def test_default_entity_index_falls_back_to_bundled_lists_once(monkeypatch, tmp_path):
+    """A missing TOKEN_LISTS file is reported once; requests are served from the bundled lists"""
+    from agents import entities
+
+    loads = []
+    load = entities.EntityIndex.load.__func__
+    monkeypatch.setattr(entities.EntityIndex, 'load',
+                        classmethod(lambda cls, *args: loads.append(args) or load(cls, *args)))
+    monkeypatch.setattr(entities, '_default', None)
+    monkeypatch.setenv('TOKEN_LISTS', str(tmp_path / 'missing.json'))
+
+    index = entities.default_index()
+    assert entities.default_index() is index and len(loads) == 2  # the configured lists, then the bundled ones
+    assert 'missing.json' in index.load_error
+    assert index.recognize('Swap ETH to USDC').tokens == ['ETH', 'USDC']
+
+
+def _standin_service(tmp_path, monkeypatch, step_duration):
+    """The service module, set up to start against the stand-in LLM and backend with files under tmp_path"""
+    import functools
+    import main
+    from api.standin import StandInConfig, standin_transport
+
+    for name, value in {'AI_PROVIDER': 'standin', 'STANDIN_LLM_LATENCY': '0,0', 'OUTBOX_APPROVE_WAIT': '0',
+                        'OUTBOX_PATH': str(tmp_path / 'outbox.sqlite3'),
+                        'CONVERSATION_STORE_PATH': str(tmp_path / 'conversations.sqlite3'),
+                        'CONVERSATION_HISTORY_DIR': str(tmp_path / 'history')}.items():
+        monkeypatch.setenv(name, value)
+    backend = standin_transport(StandInConfig(step_duration=step_duration, seed=1))
+    monkeypatch.setattr(main, 'AppState', functools.partial(main.AppState, backend_transport=backend))
+    return main
+
+
+def _receive_until(ws, kind, **match):
+    frames = []
+    while True:
+        frames.append(ws.receive_json())
+        if frames[-1]['type'] == kind and all(frames[-1].get(k) == v for k, v in match.items()):
+            return frames
+
+
+def test_websocket_session_streams_turns_approvals_and_errors(tmp_path, monkeypatch):
+    """One socket carries a turn, its approval and execution events, and errors for bad frames"""
+    import structlog
+    from fastapi.testclient import TestClient
+
+    main = _standin_service(tmp_path, monkeypatch, step_duration=(0.01, 0.02))
+    try:
+        with TestClient(main.app) as client, client.websocket_connect('/ws?conversation_id=conv-ws') as ws:
+            assert ws.receive_json() == {'type': 'session', 'conversation_id': 'conv-ws'}
+            ws.send_text('not json')
+            assert ws.receive_json() == {'type': 'error', 'error': 'Frames must be JSON objects'}
+            ws.send_json({'type': 'message'})
+            assert ws.receive_json()['status_code'] == 400
+
+            ws.send_json({'type': 'message', 'request': 'Create a swap application for ETH and USDC'})
+            turn = _receive_until(ws, 'workflow_update')
+            assert [f['type'] for f in turn] == ['assistant_message', 'workflow_update']
+            assert turn[0]['needs_approval'] and turn[1]['workflow']['nodes']
+
+            ws.send_json({'type': 'approve'})
+            events = _receive_until(ws, 'execution_event', event='status')
+            assert events[0]['type'] == 'approval' and events[0]['trackingId']
+            started = [f for f in events if f.get('event') == 'started']
+            assert started and events[-1]['executionId'] == started[0]['executionId']
+            assert events[-1]['status'] == 'completed'
+    finally:
+        structlog.reset_defaults()
+
+    class Socket:
+        headers = {}
+
+    async def limits():
+        session = main.ConversationSession(Socket(), 'conv-cap', max_in_flight=1)
+        blocker = asyncio.Event()
+        assert session.spawn(blocker.wait())
+        assert not session.spawn(blocker.wait())
+        blocker.set()
+        await asyncio.sleep(0.01)
+
+        async def fails():
+            raise RuntimeError('log stream broke')
+
+        # Failures in spawned work, such as following an execution, reach the client
+        assert session.spawn(fails())
+        await asyncio.sleep(0.01)
+        return session.outgoing.get_nowait()
+
+    assert asyncio.run(limits()) == {'type': 'error', 'error': 'log stream broke'}
+
+
+def test_tenants_come_from_configured_keys_or_a_trusted_header(monkeypatch):
+    """Unknown API keys are refused, and the tenant header counts only when configured"""
+    import types
+    import main
+    from fastapi import HTTPException
+
+    monkeypatch.setattr(main, 'state', types.SimpleNamespace(tenant_keys={'key-abc': 'acme'}, tenant_header=''),
+                        raising=False)
+    assert main.resolve_tenant({'x-api-key': 'key-abc'}) == ('acme', 'interactive')
+    try:
+        main.resolve_tenant({'x-api-key': 'made-up'})
+    except HTTPException as e:
+        assert e.status_code == 401
+    else:
+        raise AssertionError('unknown key was accepted')
+    assert main.resolve_tenant({'X-Tenant-ID': 'spoofed', 'x-request-class': 'bulk'}) == ('default', 'bulk')
+
+    main.state.tenant_header = 'X-Tenant-ID'
+    assert main.resolve_tenant({'X-Tenant-ID': 'team-a'})[0] == 'team-a'
+    main.state.tenant_keys = {}
+    # Without a key mapping, keys identify nobody
+    assert main.resolve_tenant({'x-api-key': 'anything'})[0] == 'default'
+
+
+def test_admin_endpoints_are_closed_without_a_token(monkeypatch):
+    """Without ADMIN_TOKEN the admin routes don't exist; with it, a matching header is required"""
+    import main
+    from fastapi.testclient import TestClient
+
+    client = TestClient(main.app)  # no lifespan: admin checks run before any state is used
+    monkeypatch.delenv('ADMIN_TOKEN', raising=False)
+    assert client.get('/admin/traces/abc', headers={'X-Admin-Token': ''}).status_code == 404
+    assert client.post('/admin/profile?seconds=0').status_code == 404
+
+    monkeypatch.setenv('ADMIN_TOKEN', 'secret')
+    assert client.get('/admin/traces/abc').status_code == 403
+    assert client.post('/admin/profile?seconds=0', headers={'X-Admin-Token': 'wrong'}).status_code == 403
+    assert client.get('/admin/traces/abc', headers={'X-Admin-Token': 'secret'}).status_code == 404
+
+
+def test_websocket_cancel_reports_success_and_the_cancelled_status(tmp_path, monkeypatch):
+    """A cancel frame for a running execution is confirmed, and the final status is cancelled"""
+    import structlog
+    from fastapi.testclient import TestClient
+
+    main = _standin_service(tmp_path, monkeypatch, step_duration=(0.5, 0.5))
+    try:
+        with TestClient(main.app) as client, client.websocket_connect('/ws?conversation_id=conv-cancel') as ws:
+            ws.receive_json()
+            ws.send_json({'type': 'message', 'request': 'Create a swap application for ETH and USDC'})
+            _receive_until(ws, 'workflow_update')
+            ws.send_json({'type': 'approve'})
+            started = _receive_until(ws, 'execution_event', event='started')[-1]
+            ws.send_json({'type': 'cancel'})
+            cancelled = _receive_until(ws, 'execution_event', event='cancel_requested')[-1]
+            assert cancelled == {'type': 'execution_event', 'event': 'cancel_requested',
+                                 'executionId': started['executionId'], 'success': True}
+            assert _receive_until(ws, 'execution_event', event='status')[-1]['status'] == 'cancelled'
+    finally:
+        structlog.reset_defaults()
+
+
+def test_compression_negotiation_and_etag_revalidation():
+    """Large JSON and streamed bodies are gzipped when accepted; matching ETags answer 304"""
+    from fastapi import FastAPI, Request
+    from fastapi.responses import StreamingResponse
+    from fastapi.testclient import TestClient
+    from service.encoding import CompressionConfig, CompressionMiddleware, conditional_json, negotiate_encoding
+
+    assert negotiate_encoding('gzip;q=0.5, br', ('br', 'gzip')) == 'br'
+    assert negotiate_encoding('br;q=0, *;q=0.1', ('br', 'gzip')) == 'gzip'
+    assert negotiate_encoding('identity', ('br', 'gzip')) is None
+
+    payload = {'nodes': [{'id': f'node-{i}', 'config': {'supported_chains': [1], 'mode': 'template'}}
+                         for i in range(50)]}
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, config=CompressionConfig(encodings=('gzip',)))
+
+    @app.get('/workflow')
+    async def workflow(request: Request):
+        return conditional_json(request, payload)
+
+    @app.get('/small')
+    async def small(request: Request):
+        return conditional_json(request, {'status': 'running'})
+
+    @app.get('/logs')
+    async def logs():
+        return StreamingResponse((f'{{"line": {i}}}\n' * 100 for i in range(3)), media_type='application/x-ndjson')
+
+    with TestClient(app) as client:
+        first = client.get('/workflow', headers={'Accept-Encoding': 'gzip'})
+        assert first.headers['content-encoding'] == 'gzip'
+        assert int(first.headers['content-length']) < len(first.content)
+        assert first.json() == payload and first.headers['etag'].endswith('-gzip"')
+
+        assert first.headers['vary'] == 'Accept-Encoding'
+
+        repeat = client.get('/workflow', headers={'Accept-Encoding': 'gzip', 'If-None-Match': first.headers['etag']})
+        assert repeat.status_code == 304 and repeat.content == b''
+        # The 304 names the representation the client holds, exactly as its 200 did
+        assert repeat.headers['etag'] == first.headers['etag'] and repeat.headers['vary'] == 'Accept-Encoding'
+
+        plain = client.get('/workflow', headers={'Accept-Encoding': 'identity'})
+        assert 'content-encoding' not in plain.headers and plain.headers['vary'] == 'Accept-Encoding'
+        revalidated = client.get('/workflow', headers={'If-None-Match': plain.headers['etag']})
+        assert revalidated.status_code == 304 and revalidated.headers['etag'] == plain.headers['etag']
+
+        small = client.get('/small', headers={'Accept-Encoding': 'gzip'})
+        assert 'content-encoding' not in small.headers and small.headers['vary'] == 'Accept-Encoding'
+
+        streamed = client.get('/logs', headers={'Accept-Encoding': 'gzip'})
+        assert streamed.headers['content-encoding'] == 'gzip' and 'content-length' not in streamed.headers
+        assert streamed.text.count('\n') == 300
@@ -0,0 +1,500 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the DeFi backend client and its helpers.
+Runs entirely offline against in-process fakes.
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+# Add src to path for imports
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+import httpx
+
+from api.backend_client import DeFiBackendClient
+from api.poller import ExecutionPoller, PollerConfig
+from api.transport import RetryPolicy, TransportConfig
+
+
+def test_poller_multiplexes_waiters():
+    """Many waiters on one execution share a single poll loop"""
+    calls = []
+
+    async def fetch(execution_id):
+        calls.append(execution_id)
+        status = 'completed' if len(calls) >= 3 else 'running'
+        return {'execution': {'id': execution_id, 'status': status}}
+
+    async def run():
+        poller = ExecutionPoller(fetch, PollerConfig(initial_interval=0.01, max_interval=0.02,
+                                                     max_requests_per_second=1000))
+        results = await asyncio.gather(*[poller.wait('exec-1', timeout=2) for _ in range(50)])
+        await poller.close()
+        return results
+
+    results = asyncio.run(run())
+    assert len(calls) == 3
+    assert all(r['execution']['status'] == 'completed' for r in results)
+
+
+def test_poller_respects_global_rate_cap():
+    """Request rate stays under the cap regardless of watched executions"""
+
+    async def fetch(execution_id):
+        return {'status': 'running'}
+
+    async def run():
+        poller = ExecutionPoller(fetch, PollerConfig(initial_interval=0.001, max_interval=0.001,
+                                                     max_requests_per_second=50))
+        for i in range(200):
+            poller.watch(f'exec-{i}')
+        await asyncio.sleep(0.5)
+        sent = poller.stats()['polls_sent']
+        await poller.close()
+        return sent
+
+    sent = asyncio.run(run())
+    assert sent <= 30
+
+
+def test_poller_timeout_drops_waiter():
+    """A timed-out waiter stops the execution from being polled"""
+
+    async def fetch(execution_id):
+        return {'status': 'running'}
+
+    async def run():
+        poller = ExecutionPoller(fetch, PollerConfig(initial_interval=0.01))
+        try:
+            await poller.wait('exec-1', timeout=0.05)
+        except asyncio.TimeoutError:
+            pass
+        stats = poller.stats()
+        await poller.close()
+        return stats
+
+    assert asyncio.run(run())['watched_executions'] == 0
+
+
+def test_poller_rewatch_does_not_revive_the_old_schedule():
+    """Heap entries of an unwatched execution are dropped even after it is watched again"""
+    calls = []
+
+    async def fetch(execution_id):
+        calls.append(execution_id)
+        return {'status': 'running'}
+
+    async def run():
+        poller = ExecutionPoller(fetch, PollerConfig(initial_interval=0.1, max_interval=0.1, jitter=0,
+                                                     max_requests_per_second=1000))
+        poller.watch('exec-1')
+        await asyncio.sleep(0.03)
+        poller.unwatch('exec-1')
+        poller.watch('exec-1')
+        await asyncio.sleep(0.45)
+        await poller.close()
+
+    asyncio.run(run())
+    # One chain after the re-watch: polls at 0, 0.03, 0.13, 0.23, 0.33 and 0.43s (two chains would add four)
+    assert 5 <= len(calls) <= 7
+
+
+def _fast_retry_config(**kwargs):
+    return TransportConfig(retry=RetryPolicy(backoff_base=0.001, backoff_max=0.001, **kwargs))
+
+
+def test_execute_workflow_is_retried_only_when_the_request_was_not_sent():
+    """Workflow submission is not idempotent: a 502 is returned as is, a refused connection is retried"""
+    seen_keys = []
+
+    def gateway_error(request):
+        seen_keys.append(request.headers.get('Idempotency-Key'))
+        return httpx.Response(502, text='bad gateway')
+
+    def refused_then_ok(request):
+        seen_keys.append(request.headers.get('Idempotency-Key'))
+        if len(seen_keys) < 3:
+            raise httpx.ConnectError('connection refused', request=request)
+        return httpx.Response(200, json={'executionId': 'exec-1', 'status': 'running'})
+
+    def read_timeout(request):
+        seen_keys.append(request.headers.get('Idempotency-Key'))
+        raise httpx.ReadTimeout('timed out', request=request)
+
+    async def run(handler):
+        seen_keys.clear()
+        client = DeFiBackendClient(transport_config=_fast_retry_config(),
+                                   transport=httpx.MockTransport(handler))
+        try:
+            return await client.execute_workflow({'id': 'wf-1', 'nodes': [], 'edges': []})
+        except Exception as e:
+            return e
+        finally:
+            await client.close()
+
+    assert isinstance(asyncio.run(run(gateway_error)), Exception) and len(seen_keys) == 1
+    assert isinstance(asyncio.run(run(read_timeout)), Exception) and len(seen_keys) == 1
+    assert asyncio.run(run(refused_then_ok))['executionId'] == 'exec-1'
+    assert len(seen_keys) == 3 and len(set(seen_keys)) == 1 and seen_keys[0]
+
+
+def test_retries_are_bounded():
+    """Persistent failures surface after max_retries attempts"""
+    attempts = []
+
+    def handler(request):
+        attempts.append(request.url.path)
+        return httpx.Response(503)
+
+    async def run():
+        client = DeFiBackendClient(transport_config=_fast_retry_config(max_retries=2),
+                                   transport=httpx.MockTransport(handler))
+        try:
+            await client.get_execution_status('exec-1')
+        except RuntimeError:
+            pass
+        stats = client.stats()['transport']
+        await client.close()
+        return stats
+
+    stats = asyncio.run(run())
+    assert len(attempts) == 3
+    assert stats['retry_exhausted'] == 1
+
+
+NODES_PAYLOAD = {
+    'nodeTypes': [
+        {'type': 'walletConnector', 'inputs': []},
+        {'type': 'tokenSelector', 'inputs': [
+            {'key': 'default_tokens', 'type': 'array', 'label': 'Default Tokens', 'required': False},
+            {'key': 'max_tokens', 'type': 'number', 'label': 'Max Tokens', 'required': False,
+             'validation': [{'type': 'max', 'value': 10}]}
+        ]}
+    ],
+    'totalPlugins': 2
+}
+
+
+def test_node_catalog_revalidates_with_etag():
+    """Stale catalog entries are revalidated with If-None-Match and a 304 keeps the cache"""
+    requests = []
+
+    def handler(request):
+        requests.append(request.headers.get('If-None-Match'))
+        if request.headers.get('If-None-Match') == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, json=NODES_PAYLOAD, headers={'ETag': '"v1"'})
+
+    async def run():
+        client = DeFiBackendClient(transport=httpx.MockTransport(handler), catalog_ttl=0)
+        first = await client.get_supported_nodes()
+        second = await client.get_supported_nodes()
+        stats = client.stats()['node_catalog']
+        await client.close()
+        return first, second, stats
+
+    first, second, stats = asyncio.run(run())
+    assert first == second == NODES_PAYLOAD
+    assert requests == [None, '"v1"']
+    assert stats['revalidated'] == 1
+
+
+def test_validate_workflow_against_node_index():
+    """Unknown node types and bad configs are rejected locally"""
+    from api.node_catalog import NodeCatalogIndex
+    from workflow.generator import WorkflowGenerator
+
+    index = NodeCatalogIndex(NODES_PAYLOAD['nodeTypes'])
+    generator = WorkflowGenerator()
+    workflow = {
+        'id': 'wf-1',
+        'name': 'Test',
+        'nodes': [
+            {'id': 'walletConnector-1', 'type': 'walletConnector', 'data': {'config': {}}},
+            {'id': 'tokenSelector-2', 'type': 'tokenSelector',
+             'data': {'config': {'default_tokens': 'ETH', 'max_tokens': 50}}},
+            {'id': 'mystery-3', 'type': 'mystery', 'data': {'config': {}}}
+        ],
+        'edges': []
+    }
+
+    result = asyncio.run(generator.validate_workflow(workflow, node_index=index))
+    assert not result['valid']
+    assert len(result['errors']) == 3
+    assert asyncio.run(generator.validate_workflow(workflow))['valid']
+
+
+def test_status_cache_coalesces_and_pins_terminal_states():
+    """Concurrent lookups share one fetch and terminal states are never refetched"""
+    from api.status_cache import ExecutionStatusCache
+    fetches = []
+
+    async def fetch(execution_id):
+        fetches.append(execution_id)
+        await asyncio.sleep(0.01)
+        status = 'running' if len(fetches) == 1 else 'completed'
+        return {'execution': {'id': execution_id, 'status': status}}
+
+    async def run():
+        cache = ExecutionStatusCache(fetch, running_ttl=0.0)
+        first = await asyncio.gather(*[cache.get('exec-1') for _ in range(20)])
+        second = await cache.get('exec-1')
+        third = await cache.get('exec-1')
+        return first, second, third, cache.stats()
+
+    first, second, third, stats = asyncio.run(run())
+    assert len(fetches) == 2
+    assert all(r['execution']['status'] == 'running' for r in first)
+    assert second is third
+    assert stats['coalesced'] == 19 and stats['hits'] == 1
+
+
+def test_log_tail_yields_only_new_lines():
+    """Each poll forwards only lines added since the cursor and 304s cost nothing"""
+    snapshots = [
+        {'logs': [{'nodeId': 'a', 'nodeType': 'walletConnector', 'logs': ['one']}]},
+        {'logs': [{'nodeId': 'a', 'nodeType': 'walletConnector', 'logs': ['one', 'two']},
+                  {'nodeId': 'b', 'nodeType': 'tokenSelector', 'logs': ['three']}]},
+    ]
+    state = {'log_calls': 0, 'status_calls': 0}
+
+    def handler(request):
+        if request.url.path.endswith('/logs'):
+            state['log_calls'] += 1
+            version = min(state['log_calls'], 2)
+            etag = f'"v{version}"'
+            if request.headers.get('If-None-Match') == etag:
+                return httpx.Response(304)
+            return httpx.Response(200, json=snapshots[version - 1], headers={'ETag': etag})
+        state['status_calls'] += 1
+        status = 'running' if state['status_calls'] < 2 else 'completed'
+        return httpx.Response(200, json={'execution': {'status': status}})
+
+    async def run():
+        client = DeFiBackendClient(transport=httpx.MockTransport(handler))
+        batches = [lines async for lines, _ in client.tail_execution_logs('exec-1', poll_interval=0)]
+        await client.close()
+        return batches
+
+    batches = asyncio.run(run())
+    assert [[l['message'] for l in b] for b in batches] == [['one'], ['two', 'three']]
+
+
+def test_log_cursor_round_trip():
+    from api.log_tail import LogCursor
+
+    cursor = LogCursor(offsets={'node-1': 3}, etag='W/"abc"')
+    assert LogCursor.decode(cursor.encode()) == cursor
+
+
+def test_execute_workflows_bounds_in_flight_and_submits_each_workflow_once():
+    """Bulk submission keeps the window bounded and reports failures without resubmitting"""
+    state = {'in_flight': 0, 'peak': 0, 'attempts': {}}
+
+    async def handler(request):
+        key = request.headers['Idempotency-Key']
+        state['attempts'][key] = state['attempts'].get(key, 0) + 1
+        state['in_flight'] += 1
+        state['peak'] = max(state['peak'], state['in_flight'])
+        await asyncio.sleep(0.005)
+        state['in_flight'] -= 1
+        body = json.loads(request.content)
+        if body['workflow']['id'] == 'wf-3':
+            return httpx.Response(503, text='busy')
+        if body['workflow']['id'] == 'wf-7':
+            return httpx.Response(400, text='invalid')
+        return httpx.Response(200, json={'executionId': 'exec-' + body['workflow']['id']})
+
+    async def workflows():
+        for i in range(40):
+            yield {'id': f'wf-{i}', 'nodes': [], 'edges': []}
+
+    async def run():
+        client = DeFiBackendClient(transport=httpx.MockTransport(handler))
+        report = await client.execute_workflows(workflows(), max_in_flight=4, queue_size=4)
+        await client.close()
+        return report
+
+    report = asyncio.run(run())
+    assert [r.workflow_id for r in report.results] == [f'wf-{i}' for i in range(40)]
+    assert report.failed == 2 and not report.results[3].ok and not report.results[7].ok
+    assert len(state['attempts']) == 40 and set(state['attempts'].values()) == {1}
+    assert state['peak'] <= 4 and report.max_queue_depth <= 4
+
+
+def test_client_against_standin_backend():
+    """The client drives a full execution lifecycle against the in-process stand-in"""
+    from api.standin import StandInConfig, create_standin_app, standin_transport
+
+    app = create_standin_app(StandInConfig(step_duration=(0.01, 0.02), seed=1))
+
+    async def run():
+        client = DeFiBackendClient(transport=standin_transport(app=app),
+                                   poller_config=PollerConfig(initial_interval=0.01))
+        await client.health_check()
+        workflow = {'id': 'wf-1', 'nodes': [{'id': 'walletConnector-1', 'type': 'walletConnector'},
+                                            {'id': 'tokenSelector-2', 'type': 'tokenSelector'}],
+                    'edges': []}
+        started = await client.execute_workflow(workflow, idempotency_key='key-1')
+        # Like the real backend, a repeated key starts another execution; it is only counted
+        again = await client.execute_workflow(workflow, idempotency_key='key-1')
+        await client.cancel_execution(again['executionId'])
+        final = await client.wait_for_completion(started['executionId'], timeout=5)
+        batches = [lines async for lines, _ in client.tail_execution_logs(started['executionId'])]
+        index = await client.get_node_index()
+        await client.close()
+        return started, again, final, batches, index
+
+    started, again, final, batches, index = asyncio.run(run())
+    backend = app.state.backend
+    assert started['executionId'] != again['executionId'] and backend.duplicate_submissions == 1
+    assert [e['type'] for e in backend.events if e['executionId'] == again['executionId']][-1] == \
+        'execution.cancelled'
+    assert final['execution']['status'] == 'completed'
+    assert sum(len(b) for b in batches) == 6
+    assert 'tokenSelector' in index
+
+
+def test_outbox_dedupes_and_retries_until_submitted(tmp_path):
+    """Approvals are stored durably, deduplicated and retried with backoff"""
+    from api.outbox import ApprovalOutbox
+
+    calls = []
+
+    async def submit(workflow, key):
+        calls.append(key)
+        if len(calls) < 3:
+            raise httpx.ConnectError('backend down')
+        return {'executionId': 'exec-' + workflow['id']}
+
+    async def run():
+        outbox = ApprovalOutbox(str(tmp_path / 'outbox.sqlite3'), submit,
+                                poll_interval=0.01, backoff_base=0.01, backoff_max=0.01)
+        workflow = {'id': 'wf-1', 'nodes': [], 'edges': []}
+        first = await outbox.enqueue('conv-1', workflow)
+        second = await outbox.enqueue('conv-1', workflow)
+        await outbox.start()
+        final = await outbox.wait(first.tracking_id, timeout=2)
+        await outbox.stop()
+        outbox.close()
+        return first, second, final
+
+    first, second, final = asyncio.run(run())
+    assert first.tracking_id == second.tracking_id
+    assert final.status == 'submitted' and final.execution_id == 'exec-wf-1'
+    assert final.attempts == 3 and set(calls) == {first.tracking_id}
+
+
+def test_outbox_leases_claims_across_workers_and_retries_only_unsent_failures(tmp_path):
+    """A second worker on the same file leaves leased entries alone until the lease expires"""
+    from api.backend_client import WorkflowSubmissionError
+    from api.outbox import ApprovalOutbox, is_retryable_error
+
+    assert is_retryable_error(httpx.ConnectError('refused'))
+    assert is_retryable_error(WorkflowSubmissionError('slow down', status_code=429))
+    assert not is_retryable_error(WorkflowSubmissionError('bad gateway', status_code=502))
+    assert not is_retryable_error(httpx.ReadTimeout('timed out'))
+
+    path = str(tmp_path / 'outbox.sqlite3')
+    calls = {'a': 0, 'b': 0}
+
+    async def run():
+        release = asyncio.Event()
+
+        async def stuck(workflow, key):
+            calls['a'] += 1
+            await release.wait()
+            return {'executionId': 'exec-a'}
+
+        async def submit(workflow, key):
+            calls['b'] += 1
+            return {'executionId': 'exec-b'}
+
+        first = ApprovalOutbox(path, stuck, poll_interval=0.01, lease_seconds=0.3)
+        second = ApprovalOutbox(path, submit, poll_interval=0.01)
+        entry = await first.enqueue('conv-1', {'id': 'wf-1'})
+        await first.start()
+        await asyncio.sleep(0.05)
+        await second.start()
+        await asyncio.sleep(0.1)
+        leased = calls['b']
+        final = await second.wait(entry.tracking_id, timeout=2)
+        release.set()
+        await asyncio.sleep(0.05)
+        stats = first.stats(), second.stats()
+        for outbox in (first, second):
+            await outbox.stop()
+            outbox.close()
+        return leased, final, stats
+
+    leased, final, (first_stats, second_stats) = asyncio.run(run())
+    assert leased == 0 and calls == {'a': 1, 'b': 1}
+    assert final.status == 'submitted' and final.execution_id == 'exec-b'
+    assert second_stats['reclaimed'] == 1 and first_stats['lease_lost'] == 1
+
+
+def test_outbox_worker_survives_a_failed_claim(tmp_path):
+    """A database error in the worker loop is logged and backed off; later approvals still go out"""
+    import sqlite3
+    from api.outbox import ApprovalOutbox
+
+    async def submit(workflow, key):
+        return {'executionId': 'exec-' + workflow['id']}
+
+    async def run():
+        outbox = ApprovalOutbox(str(tmp_path / 'outbox.sqlite3'), submit, poll_interval=0.01, backoff_max=0.05)
+        claim = outbox._claim_batch
+        failures = []
+
+        def locked_once():
+            if not failures:
+                failures.append(1)
+                raise sqlite3.OperationalError('database is locked')
+            return claim()
+
+        outbox._claim_batch = locked_once
+        await outbox.start()
+        await asyncio.sleep(0.05)
+        entry = await outbox.enqueue('conv-1', {'id': 'wf-1'})
+        final = await outbox.wait(entry.tracking_id, timeout=2)
+        stats = outbox.stats()
+        await outbox.stop()
+        outbox.close()
+        return failures, final, stats
+
+    failures, final, stats = asyncio.run(run())
+    assert failures == [1] and stats['worker_errors'] == 1
+    assert final.status == 'submitted' and final.execution_id == 'exec-wf-1'
+
+
+def test_outbox_survives_restart(tmp_path):
+    """Entries enqueued while the worker is down are submitted after restart"""
+    from api.outbox import ApprovalOutbox
+
+    path = str(tmp_path / 'outbox.sqlite3')
+
+    async def never(workflow, key):
+        raise AssertionError('worker should not run')
+
+    async def submit(workflow, key):
+        return {'executionId': 'exec-1'}
+
+    async def enqueue():
+        outbox = ApprovalOutbox(path, never)
+        entry = await outbox.enqueue('conv-1', {'id': 'wf-1'})
+        outbox.close()
+        return entry
+
+    async def resume(tracking_id):
+        outbox = ApprovalOutbox(path, submit, poll_interval=0.01)
+        await outbox.start()
+        entry = await outbox.wait(tracking_id, timeout=2)
+        await outbox.stop()
+        outbox.close()
+        return entry
+
+    entry = asyncio.run(enqueue())
+    assert asyncio.run(resume(entry.tracking_id)).status == 'submitted'